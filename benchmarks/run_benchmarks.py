@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Reproducible rendering benchmarks for viztools.
+
+Every scenario drives a real Viewer headless (SDL dummy video driver) along a scripted camera path and reports
+frames per second, frame time percentiles and the peak memory of the process. Each scenario runs in its own
+subprocess, so the peak memory of one scenario does not leak into the next one.
+
+Usage:
+    python benchmarks/run_benchmarks.py                       # run all default scenarios
+    python benchmarks/run_benchmarks.py points --sizes 10000  # run only points with 10k points
+    python benchmarks/run_benchmarks.py --output results.json # store the results for later comparison
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Callable
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pygame as pg
+
+import viztools
+from viztools.drawable import Points, Lines, Image
+from viztools.ui.elements import TextField
+from viztools.viewer import Viewer
+
+SCREEN_SIZE = (1280, 720)
+DEFAULT_FRAMES = 300
+DEFAULT_POINT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+SCENARIOS = ['points', 'lines', 'images', 'text']
+
+
+class BenchmarkViewer(Viewer):
+    def __init__(self):
+        super().__init__(screen_size=SCREEN_SIZE, title='viztools benchmark')
+
+
+def camera_path(viewer: Viewer, frame: int, num_frames: int):
+    """
+    Moves the camera of the viewer deterministically. The path zooms in for the first half, zooms out for the second
+    half and pans in a circle the whole time.
+
+    :param viewer: The viewer whose coordinate system is moved.
+    :param frame: The current frame index.
+    :param num_frames: The total number of frames in the benchmark.
+    """
+    center = np.array(SCREEN_SIZE, dtype=np.float64) / 2
+    if frame < num_frames // 2:
+        viewer.coordinate_system.zoom_in(focus_point=center, scale=1.01)
+    else:
+        viewer.coordinate_system.zoom_out(focus_point=center, scale=1.01)
+    angle = 2 * np.pi * frame / num_frames
+    viewer.coordinate_system.translate(np.array([np.cos(angle), np.sin(angle)]) * 8.0)
+
+
+def create_points_viewer(num_points: int) -> Viewer:
+    viewer = BenchmarkViewer()
+    rng = np.random.default_rng(0)
+    viewer.points = Points(rng.normal(size=(num_points, 2)) * 5, size=3, color=np.array([0, 255, 0, 50]))
+    return viewer
+
+
+def create_lines_viewer(num_vertices: int) -> Viewer:
+    viewer = BenchmarkViewer()
+    t = np.linspace(0, 200 * np.pi, num_vertices)
+    radius = np.linspace(0.01, 6, num_vertices)
+    viewer.lines = Lines(np.column_stack([radius * np.cos(t), radius * np.sin(t)]), color=np.array([0, 80, 80]))
+    return viewer
+
+
+def create_images_viewer(num_images: int) -> Viewer:
+    viewer = BenchmarkViewer()
+    rng = np.random.default_rng(0)
+    grid_width = int(np.ceil(np.sqrt(num_images)))
+    for i in range(num_images):
+        pixels = rng.integers(0, 256, size=(256, 256, 3), dtype=np.uint8)
+        position = np.array([i % grid_width, i // grid_width], dtype=np.float64) * 1.2
+        setattr(viewer, f'image_{i}', Image(pixels, position, size=np.array([1.0, 1.0])))
+    return viewer
+
+
+def create_text_viewer(num_lines: int) -> Viewer:
+    viewer = BenchmarkViewer()
+    line = 'The quick brown fox jumps over the lazy dog, again and again and again. '
+    text = '\n'.join(f'{i:06d} {line * (1 + i % 3)}' for i in range(num_lines))
+    viewer.text_field = TextField(pg.Rect(40, 40, 800, 640), text)
+    return viewer
+
+
+def text_scroll_path(viewer: Viewer, frame: int, num_frames: int):
+    """
+    Scrolls down the text field for the first half of the benchmark and up again for the second half.
+    """
+    pg.event.post(pg.event.Event(pg.MOUSEMOTION, pos=(400, 300), rel=(0, 0), buttons=(0, 0, 0)))
+    direction = -1 if frame < num_frames // 2 else 1
+    pg.event.post(pg.event.Event(pg.MOUSEWHEEL, x=0, y=direction * 3, flipped=False))
+
+
+SCENARIO_FACTORIES: Dict[str, Callable[[int], Viewer]] = {
+    'points': create_points_viewer,
+    'lines': create_lines_viewer,
+    'images': create_images_viewer,
+    'text': create_text_viewer,
+}
+
+SCENARIO_PATHS: Dict[str, Callable[[Viewer, int, int], None]] = {
+    'points': camera_path,
+    'lines': camera_path,
+    'images': camera_path,
+    'text': text_scroll_path,
+}
+
+SCENARIO_DEFAULT_SIZES: Dict[str, List[int]] = {
+    'points': DEFAULT_POINT_SIZES,
+    'lines': [1_000_000],
+    'images': [500],
+    'text': [20_000],
+}
+
+
+def peak_memory_mb() -> Optional[float]:
+    """
+    Returns the peak resident memory of this process in MiB or None, if it can not be determined on this platform.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports KiB, macOS reports bytes
+    if sys.platform == 'darwin':
+        return max_rss / 2 ** 20
+    return max_rss / 2 ** 10
+
+
+def run_scenario(name: str, size: int, num_frames: int) -> Dict:
+    """
+    Runs a single scenario in this process and returns the measurements.
+
+    :param name: The name of the scenario. One of SCENARIOS.
+    :param size: The problem size (number of points, vertices, images or text lines).
+    :param num_frames: The number of frames to render.
+    :return: A dictionary containing the measurements.
+    """
+    setup_start = time.perf_counter()
+    viewer = SCENARIO_FACTORIES[name](size)
+    setup_time = time.perf_counter() - setup_start
+    path = SCENARIO_PATHS[name]
+
+    frame_times = np.zeros(num_frames, dtype=np.float64)
+    for frame in range(num_frames):
+        path(viewer, frame, num_frames)
+        frame_start = time.perf_counter()
+        viewer.handle_events()
+        viewer.update()
+        viewer.render()
+        frame_times[frame] = time.perf_counter() - frame_start
+    pg.quit()
+
+    return {
+        'scenario': name,
+        'size': size,
+        'frames': num_frames,
+        'setup_s': setup_time,
+        'fps': float(num_frames / np.sum(frame_times)),
+        'mean_ms': float(np.mean(frame_times) * 1000),
+        'p50_ms': float(np.percentile(frame_times, 50) * 1000),
+        'p99_ms': float(np.percentile(frame_times, 99) * 1000),
+        'max_ms': float(np.max(frame_times) * 1000),
+        'peak_memory_mb': peak_memory_mb(),
+    }
+
+
+def run_in_subprocess(name: str, size: int, num_frames: int) -> Dict:
+    command = [sys.executable, __file__, '--single', name, '--sizes', str(size), '--frames', str(num_frames)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {'scenario': name, 'size': size, 'error': completed.stderr.strip().splitlines()[-1:]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def format_result(result: Dict) -> str:
+    if 'error' in result:
+        return f'{result["scenario"]:<8} {result["size"]:>10}  failed: {result["error"]}'
+    memory = result['peak_memory_mb']
+    memory_str = f'{memory:10.1f}' if memory is not None else f'{"-":>10}'
+    return (
+        f'{result["scenario"]:<8} {result["size"]:>10} {result["fps"]:8.1f} {result["mean_ms"]:9.2f} '
+        f'{result["p99_ms"]:9.2f} {result["max_ms"]:9.2f} {memory_str} {result["setup_s"]:8.2f}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless rendering benchmarks for viztools.')
+    parser.add_argument('scenarios', nargs='*', help=f'scenarios to run, any of {", ".join(SCENARIOS)}')
+    parser.add_argument('--sizes', type=int, nargs='+', help='problem sizes, overrides the scenario defaults')
+    parser.add_argument('--frames', type=int, default=DEFAULT_FRAMES, help='number of frames per scenario')
+    parser.add_argument('--output', type=Path, help='write results as json to this file')
+    parser.add_argument('--single', choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_scenario(args.single, args.sizes[0], args.frames)))
+        return
+
+    scenarios = args.scenarios or SCENARIOS
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error(f'unknown scenario {name!r}, choose from {", ".join(SCENARIOS)}')
+    print(f'viztools {viztools.version}, {args.frames} frames per run, screen {SCREEN_SIZE[0]}x{SCREEN_SIZE[1]}')
+    print(f'{"scenario":<8} {"size":>10} {"fps":>8} {"mean ms":>9} {"p99 ms":>9} {"max ms":>9} {"peak MiB":>10} '
+          f'{"setup s":>8}')
+    results = []
+    for name in scenarios:
+        for size in args.sizes or SCENARIO_DEFAULT_SIZES[name]:
+            result = run_in_subprocess(name, size, args.frames)
+            print(format_result(result), flush=True)
+            results.append(result)
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({'version': viztools.version, 'frames': args.frames, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
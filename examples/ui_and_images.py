@@ -76,7 +76,6 @@ class SimpleViewer(Viewer):
                 create_line_points(self.menu.slider.value),
                 color=np.array([0, 80, 80]),
             )
-            self.update_drawables()
 
 
 def main():
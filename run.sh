@@ -17,6 +17,10 @@ case "$1" in
 		shift
 		python3 examples/minimal.py "$@"
 		;;
+	b)
+		shift
+		python3 benchmarks/run_benchmarks.py "$@"
+		;;
 	*)
 		echo "invalid option for run.sh"
 		;;
@@ -4,12 +4,13 @@ import numbers
 import pygame as pg
 import numpy as np
 
-from viztools.utils import to_np_array
+from viztools.utils import to_np_array, RenderContext
 
 
 TARGET_NUM_POINTS = 12
 TARGET_DIVIDENDS = [1, 2.5, 5, 10]
 DEFAULT_SCREEN_SIZE = (1280, 720)
+TICK_LABEL_COLOR = (120, 120, 120)
 
 
 class CoordinateSystem:
@@ -211,7 +212,7 @@ def create_affine_transformation(
 
 
 def draw_coordinate_system(
-        screen: pg.Surface, coordinate_system: CoordinateSystem, render_font: pg.font.Font, draw_numbers=True
+        screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext, draw_numbers=True
 ):
     screen.fill((0, 0, 0))
 
@@ -274,9 +275,7 @@ def draw_coordinate_system(
             for x in x_points:
                 if abs(x) > 10 ** -5:
                     float_format = '{:.2f}' if abs(x) > 1 else '{:.2}'
-                    font = render_font.render(
-                        float_format.format(x), True, np.array([120, 120, 120]), np.array([0, 0, 0, 0])
-                    )
+                    font = render_context.render_text(float_format.format(x), TICK_LABEL_COLOR)
                     pos = coordinate_system.space_to_screen(np.array([x, 0]))
                     pos += 10
                     # noinspection PyTypeChecker
@@ -287,9 +286,7 @@ def draw_coordinate_system(
             for y in y_points:
                 if abs(y) > 10 ** -5:
                     float_format = '{:.2f}' if abs(y) > 1 else '{:.2}'
-                    font = render_font.render(
-                        float_format.format(y), True, np.array([120, 120, 120]), np.array([0, 0, 0, 0])
-                    )
+                    font = render_context.render_text(float_format.format(y), TICK_LABEL_COLOR)
                     pos = coordinate_system.space_to_screen(np.array([0, y]))
                     pos += 10
                     # noinspection PyTypeChecker
@@ -1,7 +1,9 @@
 from .base_drawable import Drawable
 from .implementations.image import Image
+from .implementations.image_collection import ImageCollection
+from .implementations.labels import Labels
 from .implementations.lines import Lines
 from .implementations.overlay_text import OverlayText
 from .implementations.points import Points
 
-__all__ = ['Drawable', 'Image', 'Lines', 'OverlayText', 'Points']
+__all__ = ['Drawable', 'Image', 'ImageCollection', 'Labels', 'Lines', 'OverlayText', 'Points']
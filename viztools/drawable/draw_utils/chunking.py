@@ -3,6 +3,9 @@ from typing import Self, Tuple, Optional, Dict
 import numpy as np
 import pygame as pg
 
+# status of a chunk, that does not need to be rendered again
+STATUS_OK = 3
+
 
 class ChunkGrid:
     def __init__(
@@ -127,6 +130,23 @@ class ChunkGrid:
         Accessing viewport[0] gives the left top corner of the viewport in world coordinates. Accessing viewport[1]
         gives the right bottom corner of the viewport in world coordinates.
         """
+        next_update = self.get_next_update(viewport)
+        if next_update is None:
+            return None
+        return next_update[0]
+
+    def get_next_update(self, viewport: np.ndarray) -> Optional[Tuple[int, int]]:
+        """
+        Calculates the chunk index of the next chunk to draw together with its priority.
+        Chunks in the viewport have a priority equal to their status (not rendered chunks are the most urgent).
+        Chunks outside the viewport, that are rendered in advance, are less urgent than every visible chunk.
+
+        :param viewport: Numpy array of shape (2, 2) with the viewport coordinates in world coordinates.
+        Accessing viewport[0] gives the left top corner of the viewport in world coordinates. Accessing viewport[1]
+        gives the right bottom corner of the viewport in world coordinates.
+        :return: A tuple (chunk_index, priority) or None, if all chunks are up to date. Lower priorities are more
+        urgent.
+        """
         update_chunk = self._get_next_update_chunk_impl(viewport)
         if update_chunk is not None:
             return update_chunk
@@ -138,11 +158,14 @@ class ChunkGrid:
                 [viewport[0, 0] - width * viewport_extension, viewport[0, 1] + height * viewport_extension],
                 [viewport[1, 0] + width * viewport_extension, viewport[1, 1] - height * viewport_extension]
             ])
-            return self._get_next_update_chunk_impl(extended_viewport)
+            update_chunk = self._get_next_update_chunk_impl(extended_viewport)
+            if update_chunk is None:
+                return None
+            return update_chunk[0], update_chunk[1] + STATUS_OK
 
-    def _get_next_update_chunk_impl(self, viewport: np.ndarray) -> Optional[int]:
+    def _get_next_update_chunk_impl(self, viewport: np.ndarray) -> Optional[Tuple[int, int]]:
         """
-        Calculates the chunk index of the next chunk to draw.
+        Calculates the chunk index and status of the next chunk to draw.
 
         :param viewport: Numpy array of shape (2, 2) with the viewport coordinates in world coordinates.
         Accessing viewport[0] gives the top left corner of the viewport in world coordinates. Accessing viewport[1]
@@ -151,9 +174,9 @@ class ChunkGrid:
         chunk_indices = self.get_in_viewport_chunk_indices(viewport)
         chunk_status = self.status.flat[chunk_indices]
         most_needed_index = np.argmin(chunk_status)
-        if chunk_status[most_needed_index] == 3:
+        if chunk_status[most_needed_index] == STATUS_OK:
             return None
-        return int(chunk_indices[most_needed_index])
+        return int(chunk_indices[most_needed_index]), int(chunk_status[most_needed_index])
 
     def set_status(self, chunk_index: int, status: int):
         self.status[self.chunk_index_tuple(chunk_index)] = status
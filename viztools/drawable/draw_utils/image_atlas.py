@@ -0,0 +1,89 @@
+from typing import List, Tuple, Optional
+
+import numpy as np
+import pygame as pg
+
+from viztools.utils import surface_bytes
+
+ATLAS_PAGE_SIZE = 1024
+
+
+class ImageAtlas:
+    """
+    Packs many small surfaces into a few large pages, so they can be drawn with a single call of Surface.blits().
+    Items are identified by an integer index and placed row by row (shelf packing). Items can not be removed
+    individually, instead the whole atlas is cleared.
+    """
+    def __init__(self, num_items: int, page_size: int = ATLAS_PAGE_SIZE):
+        """
+        Creates a new empty ImageAtlas.
+
+        :param num_items: The number of items, that can be stored. Valid indices are 0 to num_items - 1.
+        :param page_size: The width and height of a page in pixels.
+        """
+        self.page_size = page_size
+        self.pages: List[pg.Surface] = []
+        # page index and (left, top, width, height) of each item in its page. The page index is -1 for missing items
+        self.item_pages = np.full(num_items, -1, dtype=np.int32)
+        self.item_areas = np.zeros((num_items, 4), dtype=np.int32)
+        self._shelf_x = 0
+        self._shelf_y = 0
+        self._shelf_height = 0
+
+    def __contains__(self, index: int) -> bool:
+        return self.item_pages[index] >= 0
+
+    def nbytes(self) -> int:
+        return sum(surface_bytes(page) for page in self.pages)
+
+    def fits(self, size: Tuple[int, int]) -> bool:
+        """
+        Returns True, if an item of the given size can be stored in this atlas.
+        """
+        return size[0] <= self.page_size and size[1] <= self.page_size
+
+    def add(self, index: int, surface: pg.Surface):
+        """
+        Copies the given surface into the atlas.
+
+        :param index: The index of the item.
+        :param surface: The surface of the item. Must fit into a page.
+        """
+        width, height = surface.get_size()
+        if not self.fits((width, height)):
+            raise ValueError(f'surface of size {(width, height)} does not fit into page of size {self.page_size}.')
+        if self._shelf_x + width > self.page_size:
+            self._shelf_x = 0
+            self._shelf_y += self._shelf_height
+            self._shelf_height = 0
+        if not self.pages or self._shelf_y + height > self.page_size:
+            self.pages.append(_create_page(self.page_size))
+            self._shelf_x, self._shelf_y, self._shelf_height = 0, 0, 0
+        page_index = len(self.pages) - 1
+        self.pages[page_index].blit(surface, (self._shelf_x, self._shelf_y))
+        self.item_pages[index] = page_index
+        self.item_areas[index] = (self._shelf_x, self._shelf_y, width, height)
+        self._shelf_x += width
+        self._shelf_height = max(self._shelf_height, height)
+
+    def get(self, index: int) -> Optional[Tuple[pg.Surface, pg.Rect]]:
+        """
+        Returns the page and the area in the page of the given item or None, if the item is not stored.
+        """
+        page_index = self.item_pages[index]
+        if page_index < 0:
+            return None
+        return self.pages[page_index], pg.Rect(self.item_areas[index])
+
+    def clear(self):
+        self.pages.clear()
+        self.item_pages[:] = -1
+        self._shelf_x, self._shelf_y, self._shelf_height = 0, 0, 0
+
+
+def _create_page(page_size: int) -> pg.Surface:
+    page = pg.Surface((page_size, page_size))
+    if pg.display.get_surface() is not None:
+        # pages in display format are blitted faster
+        page = page.convert()
+    return page
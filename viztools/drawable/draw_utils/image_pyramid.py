@@ -0,0 +1,297 @@
+import functools
+import math
+from typing import Tuple, Optional, List
+
+import numpy as np
+import pygame as pg
+
+from viztools.drawable.draw_utils.image_storage import ImageStorage, reduce_pixels
+from viztools.render_scheduler import PRIORITY_VISIBLE, PRIORITY_REFINE
+from viztools.utils import LRUCache, RenderContext, Color, surface_bytes
+
+TILE_SIZE = 256
+# time in seconds after which a tile is built, even if the frame budget is exhausted
+TILE_DEADLINE = 0.2
+# scaled tiles are only reused, while the zoom does not change, so a few screens of them are enough
+SCALED_TILE_CACHE_ITEMS = 128
+SCALED_TILE_CACHE_BYTES = 32 * 2 ** 20
+
+TileKey = Tuple[int, int, int]  # (level, tile_x, tile_y)
+
+
+class ImagePyramid:
+    """
+    A multi-resolution pyramid of square tiles for large images.
+    Level 0 contains the image in full resolution, every following level halves the resolution. Tiles are built lazily,
+    when they become visible, by reading only their area from the image storage. Coarser levels are downscaled with a
+    box filter, from the four tiles of the finer level, if these are cached, so zoomed out views do not alias.
+
+    Tiles are kept in the surface cache of the render context, so all images share one memory budget. Tiles scaled to
+    the screen are only kept in a small cache of the pyramid, so zooming does not evict tiles from the surface cache.
+    Drawing an image only touches the visible tiles of the level, that matches the current zoom, so the cost does not
+    depend on the size of the image.
+    """
+    def __init__(self, storage: ImageStorage, tile_size: int = TILE_SIZE):
+        """
+        Creates a new ImagePyramid.
+
+        :param storage: The storage to read the pixels of the tiles from.
+        :param tile_size: The width and height of a tile in pixels.
+        """
+        self.storage = storage
+        self.tile_size = tile_size
+        self.num_levels = max(1, math.ceil(math.log2(max(storage.size()) / tile_size)) + 1)
+        self._scaled_tiles = LRUCache(
+            max_items=SCALED_TILE_CACHE_ITEMS, max_bytes=SCALED_TILE_CACHE_BYTES, size_func=surface_bytes
+        )
+
+    def size(self) -> Tuple[int, int]:
+        """
+        The size of the source image as (width, height).
+        """
+        return self.storage.size()
+
+    def num_tiles(self, level: int) -> Tuple[int, int]:
+        """
+        The number of tiles in x and y direction at the given level.
+        """
+        source_tile_size = self.tile_size << level
+        width, height = self.size()
+        return math.ceil(width / source_tile_size), math.ceil(height / source_tile_size)
+
+    def get_level(self, scale: float) -> int:
+        """
+        Returns the coarsest level, that still has at least one pixel per screen pixel.
+
+        :param scale: The number of screen pixels per pixel of the source image.
+        """
+        if scale <= 0:
+            return self.num_levels - 1
+        level = int(math.floor(math.log2(1 / scale))) if scale < 1 else 0
+        return min(max(level, 0), self.num_levels - 1)
+
+    def build_tile(self, key: TileKey) -> pg.Surface:
+        """
+        Builds the surface for the given tile by reading its area from the storage. Does not access the display, so it
+        can be called from worker threads.
+        """
+        pixels = self.storage.read_region(self._source_rect(key), 1 << key[0])
+        return pg.surfarray.make_surface(pixels)
+
+    def build_tile_from_children(self, children: List[List[pg.Surface]]) -> pg.Surface:
+        """
+        Builds the surface of a tile by halving the resolution of the four tiles of the next finer level.
+
+        :param children: The finer tiles as columns of rows. Tiles at the right and bottom border of the image can have
+            less than two columns or rows.
+        """
+        pixels = np.concatenate([
+            np.concatenate([pg.surfarray.pixels3d(child) for child in column], axis=1) for column in children
+        ], axis=0)
+        return pg.surfarray.make_surface(reduce_pixels(pixels, 2))
+
+    def _get_children(self, key: TileKey, surface_cache: LRUCache) -> Optional[List[List[pg.Surface]]]:
+        """
+        Returns the cached tiles of the next finer level, that cover the given tile, or None if one of them is missing.
+        """
+        level, tile_x, tile_y = key
+        if level == 0:
+            return None
+        num_tiles_x, num_tiles_y = self.num_tiles(level - 1)
+        children = []
+        for child_x in range(2 * tile_x, min(2 * tile_x + 2, num_tiles_x)):
+            column = []
+            for child_y in range(2 * tile_y, min(2 * tile_y + 2, num_tiles_y)):
+                child = surface_cache.get((self, (level - 1, child_x, child_y)))
+                if child is None:
+                    return None
+                column.append(child)
+            children.append(column)
+        return children
+
+    def _add_tile(self, surface_cache: LRUCache, key: TileKey, tile: pg.Surface):
+        surface_cache.put((self, key), tile)
+
+    def clear_scaled_tiles(self):
+        """
+        Removes the tiles scaled to the screen. Built tiles stay in the surface cache.
+        """
+        self._scaled_tiles.clear()
+
+    def _source_rect(self, key: TileKey) -> Tuple[int, int, int, int]:
+        """
+        The area covered by the given tile in source pixels as (left, top, right, bottom).
+        """
+        level, tile_x, tile_y = key
+        source_tile_size = self.tile_size << level
+        width, height = self.size()
+        left, top = tile_x * source_tile_size, tile_y * source_tile_size
+        return left, top, min(left + source_tile_size, width), min(top + source_tile_size, height)
+
+    def visible_tiles(self, target_rect: pg.Rect, clip_rect: pg.Rect) -> List[Tuple[TileKey, pg.Rect]]:
+        """
+        Returns the tiles, that are visible, if the whole image is drawn into target_rect.
+
+        :param target_rect: The screen rect of the whole image.
+        :param clip_rect: The visible area of the screen.
+        :return: A list of tile keys together with the screen rect of the tile.
+        """
+        visible_rect = target_rect.clip(clip_rect)
+        width, height = self.size()
+        if visible_rect.width == 0 or visible_rect.height == 0 or target_rect.width == 0 or target_rect.height == 0:
+            return []
+        scale_x = target_rect.width / width
+        scale_y = target_rect.height / height
+        level = self.get_level(min(scale_x, scale_y))
+        source_tile_size = self.tile_size << level
+        num_tiles_x, num_tiles_y = self.num_tiles(level)
+
+        first_x = int((visible_rect.left - target_rect.left) / scale_x) // source_tile_size
+        last_x = int((visible_rect.right - 1 - target_rect.left) / scale_x) // source_tile_size
+        first_y = int((visible_rect.top - target_rect.top) / scale_y) // source_tile_size
+        last_y = int((visible_rect.bottom - 1 - target_rect.top) / scale_y) // source_tile_size
+
+        tiles = []
+        for tile_x in range(max(first_x, 0), min(last_x, num_tiles_x - 1) + 1):
+            for tile_y in range(max(first_y, 0), min(last_y, num_tiles_y - 1) + 1):
+                key = (level, tile_x, tile_y)
+                left, top, right, bottom = self._source_rect(key)
+                # rounding the edges instead of the sizes avoids gaps between tiles
+                screen_left = target_rect.left + round(left * scale_x)
+                screen_top = target_rect.top + round(top * scale_y)
+                screen_rect = pg.Rect(
+                    screen_left, screen_top,
+                    target_rect.left + round(right * scale_x) - screen_left,
+                    target_rect.top + round(bottom * scale_y) - screen_top,
+                )
+                tiles.append((key, screen_rect))
+        return tiles
+
+    def request_tiles(self, target_rect: pg.Rect, clip_rect: pg.Rect, render_context: RenderContext):
+        """
+        Submits tasks to build the visible tiles, that are not cached yet. Tiles, whose finer tiles are cached, are
+        downscaled from them in the main thread, as that is cheap. Other tiles are read from the storage on worker
+        threads.
+        """
+        surface_cache = render_context.surface_cache
+        for key, _screen_rect in self.visible_tiles(target_rect, clip_rect):
+            if (self, key) in surface_cache:
+                continue
+            priority = PRIORITY_REFINE if self._find_cached_ancestor(key, surface_cache) is not None \
+                else PRIORITY_VISIBLE
+            children = self._get_children(key, surface_cache)
+            if children is not None:
+                func = functools.partial(self.build_tile_from_children, children)
+            else:
+                func = functools.partial(self.build_tile, key)
+            render_context.scheduler.submit(
+                (self, key), func, priority=priority, deadline=TILE_DEADLINE, threaded=children is None,
+                callback=functools.partial(self._add_tile, surface_cache, key)
+            )
+
+    def _find_cached_ancestor(
+            self, key: TileKey, surface_cache: LRUCache
+    ) -> Optional[Tuple[pg.Surface, pg.Rect]]:
+        """
+        Searches the tile of a coarser level, that contains the given tile.
+
+        :return: The coarser tile together with the area of the given tile inside it, or None if no such tile is cached.
+        """
+        level, tile_x, tile_y = key
+        for parent_level in range(level + 1, self.num_levels):
+            level_diff = parent_level - level
+            parent_key = (parent_level, tile_x >> level_diff, tile_y >> level_diff)
+            parent = surface_cache.get((self, parent_key))
+            if parent is not None:
+                left, top, right, bottom = self._source_rect(key)
+                parent_left, parent_top, _, _ = self._source_rect(parent_key)
+                step = 1 << parent_level
+                area = pg.Rect(
+                    (left - parent_left) // step, (top - parent_top) // step,
+                    max(math.ceil((right - left) / step), 1), max(math.ceil((bottom - top) / step), 1)
+                )
+                return parent, area.clip(parent.get_rect())
+        return None
+
+    def _get_scaled_tile(
+            self, key: TileKey, screen_rect: pg.Rect, clip_rect: pg.Rect, surface_cache: LRUCache
+    ) -> Optional[Tuple[pg.Surface, pg.Rect]]:
+        """
+        Returns the visible part of the given tile scaled to the screen together with the screen rect to blit it to.
+        Tiles, that are not built yet, are taken from a coarser level. Returns None, if no level is available.
+        """
+        tile = surface_cache.get((self, key))
+        is_placeholder = tile is None
+        if is_placeholder:
+            ancestor = self._find_cached_ancestor(key, surface_cache)
+            if ancestor is None:
+                return None
+            tile, area = ancestor
+        else:
+            area = tile.get_rect()
+        source_area, dest_rect = visible_area(area, screen_rect, clip_rect)
+        if source_area.width == 0 or source_area.height == 0 or dest_rect.width <= 0 or dest_rect.height <= 0:
+            return None
+
+        # placeholders are replaced soon, so they are not cached
+        scaled_key = (key, tuple(source_area), dest_rect.size)
+        scaled_tile = None if is_placeholder else self._scaled_tiles.get(scaled_key)
+        if scaled_tile is None:
+            scaled_tile = pg.transform.scale(tile.subsurface(source_area), dest_rect.size)
+            if not is_placeholder:
+                self._scaled_tiles.put(scaled_key, scaled_tile)
+        return scaled_tile, dest_rect
+
+    def draw(
+            self, screen: pg.Surface, target_rect: pg.Rect, surface_cache: LRUCache,
+            placeholder_color: Optional[Color] = None
+    ):
+        """
+        Draws the visible tiles of the image into the target rect. Tiles, that are not built yet, are drawn from a
+        coarser level, if available, or as placeholder rect.
+
+        :param screen: The surface to draw on.
+        :param target_rect: The screen rect of the whole image.
+        :param surface_cache: The cache containing the tiles.
+        :param placeholder_color: Color for tiles, that are not available in any resolution. If None, nothing is drawn.
+        """
+        clip_rect = screen.get_clip()
+        blits = []
+        for key, screen_rect in self.visible_tiles(target_rect, clip_rect):
+            if screen_rect.width <= 0 or screen_rect.height <= 0:
+                continue
+            scaled_tile = self._get_scaled_tile(key, screen_rect, clip_rect, surface_cache)
+            if scaled_tile is not None:
+                blits.append(scaled_tile)
+            elif placeholder_color is not None:
+                pg.draw.rect(screen, placeholder_color, screen_rect)
+        screen.blits(blits, doreturn=False)
+
+
+def visible_area(area: pg.Rect, screen_rect: pg.Rect, clip_rect: pg.Rect) -> Tuple[pg.Rect, pg.Rect]:
+    """
+    Computes the part of a surface area, that is visible, if the area is drawn scaled into screen_rect.
+    Only this part has to be scaled, which keeps the cost of scaling bounded by the size of the screen when zooming in.
+
+    :param area: The area of the source surface, that is drawn to screen_rect.
+    :param screen_rect: The screen rect, the whole area is scaled to.
+    :param clip_rect: The visible part of the screen.
+    :return: The visible part of the source area and the screen rect, it has to be scaled to.
+    """
+    visible = screen_rect.clip(clip_rect)
+    ratio_x = area.width / screen_rect.width
+    ratio_y = area.height / screen_rect.height
+    left = math.floor((visible.left - screen_rect.left) * ratio_x)
+    right = math.ceil((visible.right - screen_rect.left) * ratio_x)
+    top = math.floor((visible.top - screen_rect.top) * ratio_y)
+    bottom = math.ceil((visible.bottom - screen_rect.top) * ratio_y)
+    source_area = pg.Rect(area.left + left, area.top + top, right - left, bottom - top).clip(area)
+
+    dest_left = screen_rect.left + round(left / ratio_x)
+    dest_top = screen_rect.top + round(top / ratio_y)
+    dest_rect = pg.Rect(
+        dest_left, dest_top,
+        screen_rect.left + round((left + source_area.width) / ratio_x) - dest_left,
+        screen_rect.top + round((top + source_area.height) / ratio_y) - dest_top,
+    )
+    return source_area, dest_rect
@@ -0,0 +1,417 @@
+import functools
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Union, Optional, Tuple, Callable
+
+import numpy as np
+import pygame as pg
+from PIL import Image as PilImage
+
+# formats, that are supported by EncodedImageStorage. 'qoi' needs pillow >= 11.3 for saving.
+ENCODED_FORMATS = {'jpeg': 'JPEG', 'png': 'PNG', 'qoi': 'QOI'}
+RAW_FORMAT = 'raw'
+FILE_FORMAT = 'file'
+DEFAULT_STORAGE = 'jpeg'
+DEFAULT_THUMBNAIL_CACHE_SIZE = 256
+# png compression is slow, a low level keeps encoding and decoding fast, while still being lossless
+PNG_COMPRESS_LEVEL = 1
+# jpeg tiles downscaled by at least this factor are decoded in reduced resolution, until the full image was decoded
+MIN_DRAFT_FACTOR = 8
+
+
+class ImageStorage(ABC):
+    """
+    Keeps the pixels of an image while it is not shown on the screen and creates surfaces from it, when it becomes
+    visible again.
+    """
+    @abstractmethod
+    def size(self) -> Tuple[int, int]:
+        """
+        The size of the image in pixels as (width, height).
+        """
+        pass
+
+    @abstractmethod
+    def nbytes(self) -> int:
+        """
+        The number of bytes held in memory by this storage.
+        """
+        pass
+
+    @abstractmethod
+    def pixels(self) -> np.ndarray:
+        """
+        Returns the pixels of the image as uint8 array of shape [w, h, 3] (x-axis first, like pg.surfarray).
+        """
+        pass
+
+    def read_region(self, box: Tuple[int, int, int, int], factor: int = 1) -> np.ndarray:
+        """
+        Returns the pixels of an area of the image, downscaled with a box filter. Does not access the display, so it can
+        be called from worker threads.
+
+        :param box: The area as (left, top, right, bottom) in pixels of the image.
+        :param factor: The area is downscaled by this factor, which has to be a power of two. The size of the result is
+            rounded up.
+        :return: The pixels as uint8 array of shape [w, h, 3] (x-axis first, like pg.surfarray).
+        """
+        left, top, right, bottom = box
+        return reduce_pixels(self.pixels()[left:right, top:bottom], factor)
+
+    def load_surface(self) -> pg.Surface:
+        """
+        Creates a surface containing the image. Does not access the display, so it can be called from worker threads.
+        """
+        return pg.surfarray.make_surface(np.ascontiguousarray(self.pixels()))
+
+    def thumbnail_max_size(self) -> Optional[int]:
+        """
+        The maximal width and height of the thumbnail returned by load_thumbnail() or None, if there is no thumbnail.
+        """
+        return None
+
+    def load_thumbnail(self) -> Optional[pg.Surface]:
+        """
+        Creates a surface containing a downscaled version of the image, that is cheaper to load than the full image.
+        Returns None, if this storage has no thumbnails.
+        """
+        return None
+
+
+class EncodedImageStorage(ImageStorage):
+    """
+    Stores the image compressed in memory. JPEG has the smallest footprint, but is lossy. PNG and QOI are lossless.
+
+    Regions are read from a memory mapped copy of the raw pixels, that is decoded, when the first region is read.
+    Coarse regions of JPEG images are decoded in reduced resolution, until the raw pixels are available.
+    """
+    def __init__(self, image: PilImage.Image, image_format: str = DEFAULT_STORAGE):
+        """
+        Encodes the given image.
+
+        :param image: The image with swapped axes (see fix_image_axis_swap()).
+        :param image_format: One of 'jpeg', 'png' or 'qoi'.
+        """
+        if image_format not in ENCODED_FORMATS:
+            raise ValueError(f'image_format must be one of {", ".join(ENCODED_FORMATS)}, not {image_format!r}.')
+        self.image_format = image_format
+        # the axes of the image are swapped
+        self._size = (image.height, image.width)
+        self.data = encode_image(image, image_format)
+        # the data is passed instead of a bound method, so the storage and its decoded pixels do not form a cycle
+        self._decoded = _DecodedPixels(functools.partial(_decode_pixels, self.data))
+
+    def size(self) -> Tuple[int, int]:
+        return self._size
+
+    def nbytes(self) -> int:
+        return len(self.data)
+
+    def pixels(self) -> np.ndarray:
+        return _decode_pixels(self.data)
+
+    def read_region(self, box: Tuple[int, int, int, int], factor: int = 1) -> np.ndarray:
+        if self.image_format != 'jpeg' or factor < MIN_DRAFT_FACTOR or self._decoded.is_loaded():
+            return self._decoded.get().read_region(box, factor)
+        left, top, right, bottom = box
+        # the axes of the image are swapped, so rows of the decoded image are columns of the box
+        with decode_image(self.data) as image:
+            return np.asarray(_draft_region(image, (top, left, bottom, right), factor), dtype=np.uint8)
+
+
+class ArrayImageStorage(ImageStorage):
+    """
+    Keeps the raw pixels in memory. Uses the most memory, but needs no decoding.
+    """
+    def __init__(self, pixels: np.ndarray):
+        """
+        :param pixels: The pixels of the image as uint8 array of shape [w, h, 3] (x-axis first, like pg.surfarray).
+        """
+        if pixels.ndim != 3 or pixels.shape[2] != 3:
+            raise ValueError(f'pixels must be an array with shape (w, h, 3), not {pixels.shape}.')
+        self.data = pixels
+
+    def size(self) -> Tuple[int, int]:
+        return self.data.shape[0], self.data.shape[1]
+
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    def pixels(self) -> np.ndarray:
+        return self.data
+
+
+class MemmapImageStorage(ImageStorage):
+    """
+    Stores the raw pixels in a memory mapped file. Surfaces are created from the mapped file without decoding or
+    copying, so the operating system decides which images are kept in memory.
+    """
+    def __init__(self, image: Union[PilImage.Image, np.ndarray], path: Optional[Union[str, Path]] = None):
+        """
+        Writes the raw pixels of the given image to a file.
+
+        :param image: The image with swapped axes (see fix_image_axis_swap()) or its pixels as uint8 array of shape
+            [w, h, 3] (x-axis first, like pg.surfarray).
+        :param path: The file to store the pixels in. If None, a temporary file is created, that is removed, when this
+            storage is garbage collected.
+        """
+        if isinstance(image, np.ndarray):
+            pixels = image
+        else:
+            pixels = np.asarray(image.convert('RGB'), dtype=np.uint8)
+        # rows of the file are rows of the image, so pg.image.frombuffer() can read the file directly
+        rows = pixels.swapaxes(0, 1)
+        if path is None:
+            file_descriptor, path = tempfile.mkstemp(prefix='viztools-', suffix='.raw')
+            os.close(file_descriptor)
+            weakref.finalize(self, _remove_file, path)
+        self.path = Path(path)
+        self.data = np.memmap(self.path, dtype=np.uint8, mode='w+', shape=rows.shape)
+        self.data[:] = rows
+        self.data.flush()
+
+    def size(self) -> Tuple[int, int]:
+        return self.data.shape[1], self.data.shape[0]
+
+    def nbytes(self) -> int:
+        return 0
+
+    def pixels(self) -> np.ndarray:
+        return self.data.swapaxes(0, 1)
+
+    def load_surface(self) -> pg.Surface:
+        # the surface references the mapped memory, which stays valid as long as this storage exists
+        return pg.image.frombuffer(self.data, self.size(), 'RGB')
+
+
+class ThumbnailCache:
+    """
+    Stores downscaled versions of image files on disk, so later runs can show them without decoding the full images.
+    A thumbnail is identified by the absolute path, the modification time and the size of its image file, so changed
+    files get new thumbnails.
+    """
+    def __init__(self, directory: Union[str, Path], thumbnail_size: int = DEFAULT_THUMBNAIL_CACHE_SIZE):
+        """
+        Creates a new ThumbnailCache.
+
+        :param directory: The directory for the thumbnail files. It is created, if it does not exist.
+        :param thumbnail_size: The maximal width and height of a thumbnail in pixels.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.thumbnail_size = thumbnail_size
+
+    def get_path(self, path: Union[str, Path]) -> Path:
+        """
+        Returns the path of the thumbnail for the given image file. The thumbnail is created, if it does not exist.
+        """
+        path = Path(path).resolve()
+        stat = path.stat()
+        key = f'{path}:{stat.st_mtime_ns}:{stat.st_size}:{self.thumbnail_size}'
+        thumbnail_path = self.directory / f'{hashlib.sha1(key.encode()).hexdigest()}.png'
+        if not thumbnail_path.is_file():
+            with PilImage.open(path) as image:
+                # lets the jpeg decoder skip pixels, that are not needed for the thumbnail
+                image.draft('RGB', (self.thumbnail_size, self.thumbnail_size))
+                thumbnail = image.convert('RGB')
+            thumbnail.thumbnail((self.thumbnail_size, self.thumbnail_size))
+            # writing to a temporary file and renaming it, prevents other threads or processes from reading half
+            # written thumbnails
+            temp_path = thumbnail_path.with_name(f'{thumbnail_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp')
+            thumbnail.save(temp_path, format='PNG', compress_level=PNG_COMPRESS_LEVEL)
+            os.replace(temp_path, thumbnail_path)
+        return thumbnail_path
+
+
+class FileImageStorage(ImageStorage):
+    """
+    Reads the image from its file, whenever it is needed. Only the header of the file is read on creation, so creating
+    many images from files is fast. When the first tile of a large image is read with read_region(), the file is decoded
+    once into a memory mapped temporary file, from which all tiles are read. Coarse tiles of JPEG files are decoded in
+    reduced resolution, until the file was decoded completely.
+
+    Pillow rejects files with more than twice PIL.Image.MAX_IMAGE_PIXELS pixels as possible decompression bombs. Raise
+    that limit to show larger, trusted files.
+    """
+    def __init__(self, path: Union[str, Path], thumbnail_cache: Optional[ThumbnailCache] = None):
+        """
+        Reads the size of the given image file.
+
+        :param path: The path of the image file.
+        :param thumbnail_cache: If given, thumbnails of the image are stored in this cache.
+        """
+        self.path = Path(path)
+        with PilImage.open(self.path) as image:
+            self._size = image.size
+            self._is_jpeg = image.format == 'JPEG'
+        self.thumbnail_cache = thumbnail_cache
+        self._decoded = _DecodedPixels(functools.partial(_load_pixels, self.path))
+
+    def size(self) -> Tuple[int, int]:
+        return self._size
+
+    def nbytes(self) -> int:
+        return 0
+
+    def pixels(self) -> np.ndarray:
+        return _load_pixels(self.path)
+
+    def read_region(self, box: Tuple[int, int, int, int], factor: int = 1) -> np.ndarray:
+        if not self._is_jpeg or factor < MIN_DRAFT_FACTOR or self._decoded.is_loaded():
+            return self._decoded.get().read_region(box, factor)
+        with PilImage.open(self.path) as image:
+            return np.asarray(_draft_region(image, box, factor), dtype=np.uint8).swapaxes(0, 1)
+
+    def load_surface(self) -> pg.Surface:
+        return _load_surface(self.path)
+
+    def thumbnail_max_size(self) -> Optional[int]:
+        if self.thumbnail_cache is None:
+            return None
+        return self.thumbnail_cache.thumbnail_size
+
+    def load_thumbnail(self) -> Optional[pg.Surface]:
+        if self.thumbnail_cache is None:
+            return None
+        return _load_surface(self.thumbnail_cache.get_path(self.path))
+
+
+def create_image_storage(image: PilImage.Image, storage: Union[str, ImageStorage] = DEFAULT_STORAGE) -> ImageStorage:
+    """
+    Creates the storage for an image.
+
+    :param image: The image with swapped axes (see fix_image_axis_swap()).
+    :param storage: An ImageStorage, which is returned unchanged, or one of 'jpeg', 'png', 'qoi' or 'raw'.
+    :return: The storage containing the image.
+    """
+    if isinstance(storage, ImageStorage):
+        return storage
+    if storage == RAW_FORMAT:
+        return MemmapImageStorage(image)
+    if storage == FILE_FORMAT:
+        raise ValueError(f'storage {FILE_FORMAT!r} can only be used for images given as path.')
+    if storage in ENCODED_FORMATS:
+        return EncodedImageStorage(image, storage)
+    raise ValueError(f'storage must be an ImageStorage or one of {", ".join([*ENCODED_FORMATS, RAW_FORMAT])}, '
+                     f'not {storage!r}.')
+
+
+def encode_image(image: PilImage.Image, image_format: str = DEFAULT_STORAGE) -> bytes:
+    """
+    Encode data into bytes for small memory footprint.
+
+    :param image: The image to encode.
+    :param image_format: One of 'jpeg', 'png' or 'qoi'.
+    :return: The encoded image as bytes.
+    """
+    save_kwargs = {'compress_level': PNG_COMPRESS_LEVEL} if image_format == 'png' else {}
+    if image_format == 'jpeg':
+        image = image.convert('RGB')
+    with io.BytesIO() as bytes_stream:
+        image.save(bytes_stream, format=ENCODED_FORMATS[image_format], **save_kwargs)
+        return bytes_stream.getvalue()
+
+
+def decode_image(data: bytes) -> PilImage.Image:
+    return PilImage.open(io.BytesIO(data))
+
+
+def reduce_pixels(pixels: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Downscales the given pixels by an integer factor. Every result pixel is the mean of a block of factor x factor
+    pixels, so fine details are averaged instead of aliased. Blocks at the border can be smaller.
+
+    :param pixels: uint8 array of shape [w, h, 3].
+    :param factor: The factor to downscale by.
+    :return: uint8 array of shape [ceil(w / factor), ceil(h / factor), 3].
+    """
+    if factor == 1:
+        return np.ascontiguousarray(pixels)
+    # pillow does not care, that the axes are swapped, as both axes are scaled by the same factor
+    return np.asarray(PilImage.fromarray(np.ascontiguousarray(pixels)).reduce(factor))
+
+
+class _DecodedPixels:
+    """
+    Decodes an image, when its pixels are needed the first time, and keeps them in a MemmapImageStorage, so regions can
+    be read without decoding the image again. Can be used from multiple threads.
+    """
+    def __init__(self, decode: Callable[[], np.ndarray]):
+        """
+        :param decode: Returns the pixels of the image as uint8 array of shape [w, h, 3].
+        """
+        self._decode = decode
+        self._storage: Optional[MemmapImageStorage] = None
+        self._lock = threading.Lock()
+
+    def is_loaded(self) -> bool:
+        return self._storage is not None
+
+    def get(self) -> MemmapImageStorage:
+        # other threads wait for the running decode instead of decoding the image again
+        with self._lock:
+            if self._storage is None:
+                self._storage = MemmapImageStorage(self._decode())
+            return self._storage
+
+
+def _draft_region(image: PilImage.Image, box: Tuple[int, int, int, int], factor: int) -> PilImage.Image:
+    """
+    Reads an area of an opened JPEG image downscaled by the given power of two. The image is decoded in a lower
+    resolution, but completely, so this is only cheap for large factors.
+
+    :param image: The opened image, that is not loaded yet.
+    :param box: The area as (left, top, right, bottom) in pixels of the image.
+    :param factor: The area is downscaled by this factor.
+    :return: The area of the image in RGB mode.
+    """
+    if factor > 1:
+        width, height = image.size
+        # the decoder chooses a scale of at most 8, that keeps at least the requested size
+        image.draft('RGB', (max(width // factor, 1), max(height // factor, 1)))
+        draft_scale = round(width / image.width)
+        if draft_scale > 1:
+            left, top, right, bottom = box
+            box = (
+                left // draft_scale, top // draft_scale,
+                min(-(-right // draft_scale), image.width), min(-(-bottom // draft_scale), image.height)
+            )
+            factor //= draft_scale
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    if factor == 1:
+        return image.crop(box)
+    return image.reduce(factor, box=box)
+
+
+def _decode_pixels(data: bytes) -> np.ndarray:
+    # the encoded image has swapped axes, so its rows are the columns of the pixels
+    return np.asarray(decode_image(data).convert('RGB'), dtype=np.uint8)
+
+
+def _load_pixels(path: Path) -> np.ndarray:
+    return np.asarray(_load_rgb(path), dtype=np.uint8).swapaxes(0, 1)
+
+
+def _load_rgb(path: Path) -> PilImage.Image:
+    with PilImage.open(path) as image:
+        return image.convert('RGB')
+
+
+def _load_surface(path: Path) -> pg.Surface:
+    image = _load_rgb(path)
+    # rows of the image are rows of the surface, so no transposing is needed
+    return pg.image.frombuffer(image.tobytes(), image.size, 'RGB')
+
+
+def _remove_file(path: Union[str, Path]):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
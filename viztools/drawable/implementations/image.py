@@ -1,6 +1,7 @@
-import io
+import functools
+import math
 from pathlib import Path
-from typing import Union, Optional, Tuple
+from typing import Union, Optional, Tuple, Hashable
 
 import numpy as np
 import pygame as pg
@@ -9,19 +10,47 @@ from PIL.Image import Transpose
 
 from viztools.coordinate_system import CoordinateSystem
 from viztools.drawable.base_drawable import Drawable
-from viztools.utils import RenderContext, Align
+from viztools.drawable.draw_utils.image_pyramid import ImagePyramid
+from viztools.drawable.draw_utils.image_storage import ImageStorage, ArrayImageStorage, FileImageStorage, \
+    ThumbnailCache, create_image_storage, encode_image, decode_image, DEFAULT_STORAGE, RAW_FORMAT, FILE_FORMAT
+from viztools.render_scheduler import RenderScheduler, TaskState, PRIORITY_VISIBLE, PRIORITY_REFINE, \
+    PRIORITY_PREFETCH
+from viztools.utils import RenderContext, Align, Color, LRUCache
+
+# encode_image and decode_image moved to image_storage, they are still importable from here
+__all__ = [
+    'Image', 'fix_image_axis_swap', 'get_image_size', 'to_pil_image', 'encode_image', 'decode_image',
+    'bytes_to_surf_array', 'pil_to_surf_array'
+]
+
+# images with more pixels on the screen are not drawn, unless they are tiled
+MAX_DRAW_PIXELS = 30_000_000
+# images with more pixels are tiled by default
+TILED_PIXEL_THRESHOLD = 4096 * 4096
+# time in seconds after which decoding and scaling is done, even if the frame budget is exhausted. Only used, if
+# there are no worker threads.
+DECODE_DEADLINE = 0.25
+SCALE_DEADLINE = 0.1
+# scaled surfaces are cached for scales, that are powers of 2^(1 / SCALE_BUCKETS_PER_OCTAVE)
+SCALE_BUCKETS_PER_OCTAVE = 2
+ORIGINAL_BUCKET = (0, 0)
+THUMBNAIL_KEY = 'thumbnail'
+# images, that are at most this fraction of the screen size outside the screen, are decoded in advance
+PREFETCH_MARGIN = 0.5
 
 
 class Image(Drawable):
     def __init__(
             self, image: Union[np.ndarray, PilImage.Image, str, Path], position: np.ndarray,
             size: Union[np.ndarray, float] = 0.01, align: Align = Align.CENTER,
-            offset: Optional[np.ndarray] = None, offset_color: Optional[np.ndarray] = None, visible: bool = True
+            offset: Optional[np.ndarray] = None, offset_color: Optional[np.ndarray] = None, visible: bool = True,
+            placeholder_color: Optional[Color] = (60, 60, 60), tiled: Optional[bool] = None,
+            storage: Optional[Union[str, ImageStorage]] = None, thumbnail_cache: Optional[ThumbnailCache] = None
     ):
         """
         Initializes a list of lines.
 
-        :param image: Numpy array of shape [h, w, 3] or pillow image.
+        :param image: Numpy array of shape [h, w, 3], pillow image or path to an image file.
         :param position: The position of the image as a numpy array of shape [2].
         :param size: The size of the image as a numpy array or tuple (height, width) in world coordinates,
             or it can be defined as a scale factor to original size.
@@ -29,55 +58,247 @@ class Image(Drawable):
         :param offset: The offset of the image as a numpy array of shape [2].
         :param offset_color: The color of the offset as a numpy array of shape [3] or [4] (with alpha).
         :param visible: Whether the image is visible.
+        :param placeholder_color: The color of the rect, that is drawn until the image is decoded. If None, nothing is
+            drawn.
+        :param tiled: If True, the image is split into a pyramid of tiles with decreasing resolutions. Only visible
+            tiles of the resolution matching the zoom are built and drawn, which allows to display very large images.
+            If None, images with more than TILED_PIXEL_THRESHOLD pixels are tiled. Tiles are kept in the surface cache
+            of the render context.
+        :param storage: How the image is stored, while it is not decoded. 'jpeg' is small but lossy, 'png' and 'qoi'
+            are lossless. 'raw' stores the pixels in a memory mapped file, from which surfaces are created without
+            decoding. 'file' reads the image from its file, when it becomes visible, and only reads the header on
+            creation, tiled images decode the file once into a memory mapped temporary file, when the first tile is
+            read. Tiled images are kept in memory unless 'raw' or 'file' is used. Can also be an ImageStorage.
+            If None, 'file' is used for paths and 'jpeg' for other images.
+        :param thumbnail_cache: Only used with 'file' storage. If given, downscaled versions of the image are stored in
+            this cache and used for small zoom levels, so the full image does not have to be decoded.
         """
         super().__init__(visible)
 
-        image = to_pil_image(image)
-        image = fix_image_axis_swap(image)
-        self.image_data: bytes = encode_image(image)
-        self.image_surface: Optional[pg.Surface] = None
+        if storage is None:
+            storage = FILE_FORMAT if isinstance(image, (str, Path)) else DEFAULT_STORAGE
+        self.pyramid: Optional[ImagePyramid] = None
+        self.storage: Optional[ImageStorage] = None
+        if storage == FILE_FORMAT:
+            if not isinstance(image, (str, Path)):
+                raise ValueError(f'storage {FILE_FORMAT!r} can only be used for images given as path.')
+            self.storage = FileImageStorage(image, thumbnail_cache)
+            width, height = self.storage.size()
+            image_size = (height, width)
+        else:
+            image = fix_image_axis_swap(to_pil_image(image))
+            image_size = get_image_size(image)
+        if tiled is None:
+            tiled = image_size[0] * image_size[1] > TILED_PIXEL_THRESHOLD
+
+        if self.storage is None:
+            if tiled and isinstance(storage, str) and storage != RAW_FORMAT:
+                # encoding would only cost time, as tiles are read from the raw pixels
+                self.storage = ArrayImageStorage(np.asarray(image.convert('RGB')))
+            else:
+                self.storage = create_image_storage(image, storage)
+        if tiled:
+            self.pyramid = ImagePyramid(self.storage)
         self.position = position
         self.align = align
         if isinstance(size, float):
-            size = np.array(get_image_size(image)) * size
+            size = np.array(image_size) * size
         elif isinstance(size, (tuple, np.ndarray)):
             size = np.asarray(size)
         else:
             raise TypeError(f'size must be a float, tuple or numpy array, not {type(size)}.')
         self.size = size
         self.last_size = None
+        self._requested_size = None
         self.scaled_surface = None
         self.offset = offset
         self.offset_color = offset_color
+        self.placeholder_color = placeholder_color
+        self._view_key = None
+        self._target_rect = None
 
-    def _ensure_image_surface(self):
-        if self.image_surface is None:
-            self.image_surface = bytes_to_surf_array(self.image_data)
+    def _get_target_rect(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem
+    ) -> Tuple[pg.Rect, np.ndarray, np.ndarray]:
+        """
+        Returns the rect on the screen, the image is drawn to, and the screen positions of the anchor and the offset
+        point. The result is computed once per view and shared by update and draw.
+        """
+        view_key = (coordinate_system.coord.tobytes(), screen.get_size())
+        if view_key != self._view_key:
+            self._target_rect = self._compute_target_rect(coordinate_system)
+            self._view_key = view_key
+        return self._target_rect
 
-    def draw(self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext):
+    def _compute_target_rect(self, coordinate_system: CoordinateSystem) -> Tuple[pg.Rect, np.ndarray, np.ndarray]:
         anchor_point = coordinate_system.space_to_screen_t(self.position).flatten().astype(int)
-        pos = self.position + self.offset if self.offset is not None else self.position
-        screen_points = coordinate_system.space_to_screen_t(pos).flatten().astype(int)
+        if self.offset is not None:
+            screen_points = coordinate_system.space_to_screen_t(self.position + self.offset).flatten().astype(int)
+        else:
+            screen_points = anchor_point
         size = np.abs(coordinate_system.space_to_screen_t(self.size, translate=False).flatten().astype(int))
 
-        # get target rect
         target_rect = pg.Rect(0, 0, size[1], size[0])
         target_rect = self.align.arrange_by_anker(target_rect, screen_points)
+        return target_rect, anchor_point, screen_points
 
-        if target_rect.colliderect(screen.get_rect()) and np.prod(target_rect.size) < 30000000:
-            self._ensure_image_surface()
-            if self.last_size is None or np.any(size != self.last_size):
-                self.scaled_surface = pg.transform.scale(self.image_surface, (size[1], size[0]))
-                self.last_size = size
+    def _is_drawn(self, target_rect: pg.Rect, clip_rect: pg.Rect) -> bool:
+        if not target_rect.colliderect(clip_rect):
+            return False
+        return self.pyramid is not None or np.prod(target_rect.size) < MAX_DRAW_PIXELS
 
-            if self.offset_color is not None:
-                pg.draw.line(screen, self.offset_color, anchor_point, screen_points, 2)
-            screen.blit(self.scaled_surface, target_rect)
-        else:
+    def _get_bucket(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        """
+        Returns the scale bucket for the given screen size. Buckets are the exponents of sqrt(2) of the scale in x and
+        y direction, rounded up, so a bucket surface is at most sqrt(2) times bigger than the screen size. Images are
+        never scaled up in a bucket, so bucket (0, 0) is the decoded image itself.
+        """
+        width, height = self.storage.size()
+        return (
+            min(math.ceil(math.log2(max(size[0], 1) / width) * SCALE_BUCKETS_PER_OCTAVE), 0),
+            min(math.ceil(math.log2(max(size[1], 1) / height) * SCALE_BUCKETS_PER_OCTAVE), 0),
+        )
+
+    def _get_bucket_size(self, bucket: Tuple[int, int]) -> Tuple[int, int]:
+        width, height = self.storage.size()
+        return (
+            max(math.ceil(width * 2 ** (bucket[0] / SCALE_BUCKETS_PER_OCTAVE)), 1),
+            max(math.ceil(height * 2 ** (bucket[1] / SCALE_BUCKETS_PER_OCTAVE)), 1),
+        )
+
+    def _fits_thumbnail(self, bucket: Tuple[int, int]) -> bool:
+        thumbnail_size = self.storage.thumbnail_max_size()
+        return thumbnail_size is not None and max(self._get_bucket_size(bucket)) <= thumbnail_size
+
+    def _find_source_surface(self, surface_cache: LRUCache, bucket: Tuple[int, int]) -> Optional[pg.Surface]:
+        """
+        Returns the smallest cached surface, that is bigger than the given bucket, or None if nothing is cached.
+        """
+        source_bucket = bucket
+        while source_bucket != ORIGINAL_BUCKET:
+            source_bucket = (min(source_bucket[0] + 1, 0), min(source_bucket[1] + 1, 0))
+            if not self._fits_thumbnail(source_bucket) and self._fits_thumbnail(bucket):
+                # the thumbnail is smaller than source_bucket, but still big enough
+                source_surface = surface_cache.get((self, THUMBNAIL_KEY))
+                if source_surface is not None:
+                    return source_surface
+            source_surface = surface_cache.get((self, source_bucket))
+            if source_surface is not None:
+                return source_surface
+        return None
+
+    def _build_scaled_surfaces(
+            self, bucket: Tuple[int, int], bucket_surface: Optional[pg.Surface], source_surface: Optional[pg.Surface],
+            size: Tuple[int, int]
+    ) -> Tuple[Optional[Tuple[Hashable, pg.Surface]], Tuple[int, int], pg.Surface, pg.Surface]:
+        """
+        Scales the image to the given size. A missing bucket surface is created from the source surface or, if there is
+        none, from the thumbnail or the decoded image.
+
+        :return: The loaded thumbnail or decoded image together with its cache key (None, if nothing was loaded), the
+            bucket, the bucket surface and the scaled surface.
+        """
+        # can be executed on a worker thread, so the display surface must not be accessed
+        loaded = None
+        if bucket_surface is None:
+            if source_surface is None:
+                if bucket != ORIGINAL_BUCKET and self._fits_thumbnail(bucket):
+                    source_surface = self.storage.load_thumbnail()
+                    loaded = (THUMBNAIL_KEY, source_surface)
+                else:
+                    source_surface = self.storage.load_surface()
+                    loaded = (ORIGINAL_BUCKET, source_surface)
+            if bucket == ORIGINAL_BUCKET:
+                bucket_surface = source_surface
+            else:
+                # the source is at most a few buckets bigger, so smooth scaling stays cheap
+                bucket_surface = pg.transform.smoothscale(source_surface, self._get_bucket_size(bucket))
+        return loaded, bucket, bucket_surface, pg.transform.scale(bucket_surface, size)
+
+    def _set_scaled_surfaces(
+            self, surface_cache: LRUCache,
+            surfaces: Tuple[Optional[Tuple[Hashable, pg.Surface]], Tuple[int, int], pg.Surface, pg.Surface]
+    ):
+        loaded, bucket, bucket_surface, scaled_surface = surfaces
+        if loaded is not None:
+            surface_cache.put((self, loaded[0]), loaded[1])
+        if bucket != ORIGINAL_BUCKET and (self, bucket) not in surface_cache:
+            surface_cache.put((self, bucket), _to_display_format(bucket_surface))
+        self._set_scaled_surface(scaled_surface)
+
+    def _set_scaled_surface(self, scaled_surface: pg.Surface):
+        self.scaled_surface = _to_display_format(scaled_surface)
+        self.last_size = scaled_surface.get_size()
+
+    def _drop_surfaces(self, scheduler: RenderScheduler):
+        # decoded and bucket surfaces stay in the surface cache, until they are evicted
+        scheduler.cancel((self, 'render'))
+        if self.pyramid is not None:
+            self.pyramid.clear_scaled_tiles()
+        self.last_size = None
+        self._requested_size = None
+        self.scaled_surface = None
+
+    def update(self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext):
+        scheduler = render_context.scheduler
+        target_rect, _, _ = self._get_target_rect(screen, coordinate_system)
+        screen_rect = screen.get_rect()
+        prefetch_rect = screen_rect.inflate(
+            screen_rect.width * PREFETCH_MARGIN * 2, screen_rect.height * PREFETCH_MARGIN * 2
+        )
+        if not self._is_drawn(target_rect, prefetch_rect):
             # remove unused data
-            self.last_size = None
-            self.scaled_surface = None
-            self.image_surface = None
+            self._drop_surfaces(scheduler)
+            return
+        is_visible = target_rect.colliderect(screen_rect)
+
+        if self.pyramid is not None:
+            if is_visible:
+                self.pyramid.request_tiles(target_rect, screen_rect, render_context)
+            return
+        if self.last_size == target_rect.size:
+            return
+        # a task, that is already running for the same size, is not started again
+        if self._requested_size == target_rect.size and _is_running(scheduler, (self, 'render')):
+            return
+
+        surface_cache = render_context.surface_cache
+        bucket = self._get_bucket(target_rect.size)
+        bucket_surface = surface_cache.get((self, bucket))
+        if bucket_surface is not None and not is_visible:
+            # prefetching is done, when the bucket is available
+            return
+        source_surface = None if bucket_surface is not None else self._find_source_surface(surface_cache, bucket)
+
+        if is_visible:
+            priority = PRIORITY_VISIBLE if self.scaled_surface is None else PRIORITY_REFINE
+            deadline = SCALE_DEADLINE if bucket_surface is not None or source_surface is not None else DECODE_DEADLINE
+        else:
+            priority, deadline = PRIORITY_PREFETCH, None
+        # scaling from a cached bucket is cheap, so only decoding and building buckets is done on worker threads
+        scheduler.submit(
+            (self, 'render'),
+            functools.partial(self._build_scaled_surfaces, bucket, bucket_surface, source_surface, target_rect.size),
+            priority=priority, deadline=deadline, threaded=bucket_surface is None,
+            callback=functools.partial(self._set_scaled_surfaces, surface_cache)
+        )
+        self._requested_size = target_rect.size
+
+    def draw(self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext):
+        target_rect, anchor_point, offset_point = self._get_target_rect(screen, coordinate_system)
+        if not self._is_drawn(target_rect, screen.get_rect()):
+            return
+
+        if self.offset_color is not None:
+            pg.draw.line(screen, self.offset_color, anchor_point, offset_point, 2)
+
+        if self.pyramid is not None:
+            self.pyramid.draw(screen, target_rect, render_context.surface_cache, self.placeholder_color)
+        elif self.scaled_surface is not None:
+            # the scaled surface can have an outdated size, until rescaling is done
+            screen.blit(self.scaled_surface, self.align.arrange_in_rect(self.scaled_surface.get_rect(), target_rect))
+        elif self.placeholder_color is not None:
+            pg.draw.rect(screen, self.placeholder_color, target_rect)
 
     def handle_event(
             self, event: pg.event.Event, screen: pg.Surface, coordinate_system: CoordinateSystem,
@@ -85,10 +306,18 @@ class Image(Drawable):
     ):
         pass
 
-    def update(
-            self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext
-    ):
-        pass
+
+def _to_display_format(surface: pg.Surface) -> pg.Surface:
+    display = pg.display.get_surface()
+    if display is not None and surface.get_bitsize() != display.get_bitsize():
+        # surfaces in display format are blitted and scaled faster
+        return surface.convert()
+    return surface
+
+
+def _is_running(scheduler: RenderScheduler, key) -> bool:
+    task = scheduler.get_task(key)
+    return task is not None and task.state == TaskState.RUNNING
 
 
 def fix_image_axis_swap(image: Union[np.ndarray, PilImage.Image]) -> Union[np.ndarray, PilImage.Image]:
@@ -135,26 +364,10 @@ def to_pil_image(image: Union[np.ndarray, PilImage.Image, str, Path]) -> PilImag
         raise TypeError(f'image must be of type str, Path or np.ndarray, not {type(image)}.')
 
 
-def encode_image(image: PilImage.Image) -> bytes:
-    """
-    Encode data into bytes (jpg) for small memory footprint.
-
-    :param image: The image to encode.
-    :return: The jpg encoded image as bytes.
-    """
-    with io.BytesIO() as bytes_stream:
-        image.save(bytes_stream, format="JPEG")
-        return bytes_stream.getvalue()
-
-
 def bytes_to_surf_array(data: bytes) -> pg.Surface:
     return pil_to_surf_array(decode_image(data))
 
 
-def decode_image(data: bytes) -> PilImage.Image:
-    return PilImage.open(io.BytesIO(data))
-
-
 def pil_to_surf_array(pil_img: PilImage.Image) -> pg.Surface:
     """
     Converts a PIL Image to a Pygame Surface using surf_array.
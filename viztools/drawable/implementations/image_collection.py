@@ -0,0 +1,258 @@
+import itertools
+import math
+from pathlib import Path
+from typing import Union, Optional, Sequence, List, Tuple, Iterator
+
+import numpy as np
+import pygame as pg
+from PIL import Image as PilImage
+
+from viztools.coordinate_system import CoordinateSystem
+from viztools.drawable.base_drawable import Drawable
+from viztools.drawable.draw_utils.image_atlas import ImageAtlas, ATLAS_PAGE_SIZE
+from viztools.drawable.draw_utils.image_pyramid import visible_area
+from viztools.drawable.draw_utils.image_storage import ImageStorage, FileImageStorage, ThumbnailCache, \
+    create_image_storage, DEFAULT_STORAGE
+from viztools.drawable.implementations.image import to_pil_image, fix_image_axis_swap, get_image_size
+from viztools.render_scheduler import PRIORITY_VISIBLE
+from viztools.utils import RenderContext, Align, Color, LRUCache
+
+DEFAULT_THUMBNAIL_SIZE = 128
+DEFAULT_ATLAS_CACHE_BYTES = 128 * 2 ** 20
+# the zoom is quantized to this many levels per factor of two. Every level has its own atlas.
+LEVELS_PER_OCTAVE = 4
+# items, that are bigger on the screen, are not packed into an atlas, but scaled individually
+MAX_ATLAS_ITEM_SIZE = ATLAS_PAGE_SIZE // 4
+THUMBNAIL_SURFACE_CACHE_ITEMS = 256
+SCALED_ITEM_CACHE_ITEMS = 64
+# number of thumbnails added to an atlas in one step of progressive work
+ITEMS_PER_STEP = 16
+
+
+class _View:
+    """
+    The visible items of an ImageCollection for a specific coordinate system and screen size.
+    """
+    def __init__(self, level: int, indices: np.ndarray, rects: np.ndarray, is_big: np.ndarray):
+        self.level = level
+        self.indices = indices
+        self.rects = rects
+        self.is_big = is_big
+
+
+class ImageCollection(Drawable):
+    def __init__(
+            self, images: Sequence[Union[np.ndarray, PilImage.Image, str, Path]], positions: np.ndarray,
+            size: Union[np.ndarray, float] = 0.01, align: Align = Align.CENTER,
+            thumbnail_size: int = DEFAULT_THUMBNAIL_SIZE, storage: Union[str, ImageStorage] = DEFAULT_STORAGE,
+            placeholder_color: Optional[Color] = (60, 60, 60), atlas_cache_bytes: int = DEFAULT_ATLAS_CACHE_BYTES,
+            thumbnail_cache: Optional[ThumbnailCache] = None, visible: bool = True
+    ):
+        """
+        Drawable to display many images at once, for example the thumbnails of an image embedding.
+
+        Instead of drawing every image on its own, positions and sizes are kept in numpy arrays, visible images are
+        determined for all images at once, and the thumbnails are packed into shared atlas surfaces, that are drawn
+        with a single call of Surface.blits(). The zoom is quantized into LEVELS_PER_OCTAVE levels per factor of two,
+        so the drawn size of an image can differ slightly from its exact size.
+
+        :param images: The images as numpy arrays of shape [h, w, 3], pillow images or paths to image files.
+        :param positions: The positions of the images as a numpy array of shape [N, 2].
+        :param size: The sizes of the images as numpy array of shape [2] or [N, 2] (height, width) in world
+            coordinates, or a scale factor to the original size of the images.
+        :param align: The type of anker to use.
+        :param thumbnail_size: The maximal width and height of the stored thumbnails in pixels. Images are never drawn
+            in a higher resolution.
+        :param storage: How the thumbnails are stored. See Image.
+        :param placeholder_color: The color of the rects, that are drawn for images, that are not ready yet. If None,
+            nothing is drawn.
+        :param atlas_cache_bytes: The maximal number of bytes used by the atlases of all zoom levels.
+        :param thumbnail_cache: If given, the thumbnails of images given as paths are taken from this cache, which
+            makes creating the collection fast, once the thumbnails exist. The thumbnail size of the cache is used
+            instead of thumbnail_size and storage for these images.
+        :param visible: Whether the images are visible.
+        """
+        super().__init__(visible)
+        if not isinstance(positions, np.ndarray):
+            raise TypeError(f'positions must be a numpy array, not {type(positions)}.')
+        if positions.ndim != 2 or positions.shape[1] != 2:
+            raise ValueError(f'positions must be numpy array with shape (N, 2), not {positions.shape}.')
+        if len(images) != len(positions):
+            raise ValueError(f'got {len(images)} images, but {len(positions)} positions.')
+        num_images = len(positions)
+        self.positions = positions.astype(np.float64)
+        self.align = align
+        self.placeholder_color = placeholder_color
+
+        self.thumbnails: List[ImageStorage] = []
+        pixel_sizes = np.zeros((num_images, 2), dtype=np.float64)
+        for index, image in enumerate(images):
+            if thumbnail_cache is not None and isinstance(image, (str, Path)):
+                # only the headers of the image and its thumbnail are read
+                with PilImage.open(image) as pil_image:
+                    width, height = pil_image.size
+                pixel_sizes[index] = (height, width)
+                self.thumbnails.append(FileImageStorage(thumbnail_cache.get_path(image)))
+                continue
+            image = fix_image_axis_swap(to_pil_image(image))
+            pixel_sizes[index] = get_image_size(image)
+            thumbnail = image.convert('RGB')
+            thumbnail.thumbnail((thumbnail_size, thumbnail_size))
+            self.thumbnails.append(create_image_storage(thumbnail, storage))
+
+        if isinstance(size, float):
+            size = pixel_sizes * size
+        elif isinstance(size, (tuple, np.ndarray)):
+            size = np.broadcast_to(np.asarray(size, dtype=np.float64), (num_images, 2))
+        else:
+            raise TypeError(f'size must be a float, tuple or numpy array, not {type(size)}.')
+        self.sizes = size
+
+        self._atlases = LRUCache(max_bytes=atlas_cache_bytes, size_func=ImageAtlas.nbytes)
+        self._thumbnail_surfaces = LRUCache(max_items=THUMBNAIL_SURFACE_CACHE_ITEMS)
+        self._scaled_items = LRUCache(max_items=SCALED_ITEM_CACHE_ITEMS)
+        self._atlas_cache_bytes = atlas_cache_bytes
+        self._view_key = None
+        self._view: Optional[_View] = None
+        self._placeholder_surface: Optional[pg.Surface] = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _get_view(self, coordinate_system: CoordinateSystem, screen: pg.Surface) -> _View:
+        """
+        Computes the visible items and their screen rects. The result is cached until the coordinate system or the
+        screen size changes.
+        """
+        view_key = (coordinate_system.coord.tobytes(), screen.get_size())
+        if view_key == self._view_key:
+            return self._view
+
+        scale = np.abs(coordinate_system.space_to_screen_t(np.ones((1, 2)), translate=False).flatten())
+        level = round(math.log2(max(scale[0], 1e-12)) * LEVELS_PER_OCTAVE)
+        level_scale = scale * (2 ** (level / LEVELS_PER_OCTAVE) / max(scale[0], 1e-12))
+        # sizes are stored as (height, width), screen sizes are (width, height)
+        screen_sizes = np.maximum(np.round(self.sizes[:, ::-1] * level_scale), 1).astype(np.int64)
+        anchors = coordinate_system.space_to_screen_t(self.positions)
+        top_left = np.round(anchors - np.array(self.align.get_anker_fraction()) * screen_sizes).astype(np.int64)
+
+        screen_width, screen_height = screen.get_size()
+        is_visible = (top_left[:, 0] < screen_width) & (top_left[:, 1] < screen_height) & \
+            (top_left[:, 0] + screen_sizes[:, 0] > 0) & (top_left[:, 1] + screen_sizes[:, 1] > 0)
+        indices = np.flatnonzero(is_visible)
+        rects = np.concatenate([top_left[indices], screen_sizes[indices]], axis=1)
+        is_big = np.max(rects[:, 2:], axis=1) > MAX_ATLAS_ITEM_SIZE
+
+        self._view_key = view_key
+        self._view = _View(level, indices, rects, is_big)
+        return self._view
+
+    def _get_atlas(self, level: int) -> ImageAtlas:
+        atlas = self._atlases.get(level)
+        if atlas is None:
+            atlas = ImageAtlas(len(self))
+            self._atlases.put(level, atlas)
+        return atlas
+
+    def _get_thumbnail_surface(self, index: int) -> pg.Surface:
+        surface = self._thumbnail_surfaces.get(index)
+        if surface is None:
+            surface = self.thumbnails[index].load_surface()
+            self._thumbnail_surfaces.put(index, surface)
+        return surface
+
+    def _add_to_atlas(self, level: int, index: int, size: Tuple[int, int]):
+        atlas = self._get_atlas(level)
+        if atlas.nbytes() > self._atlas_cache_bytes:
+            # the visible items always fit, but panning around can fill the atlas of a single level
+            atlas.clear()
+        num_pages = len(atlas.pages)
+        atlas.add(index, pg.transform.smoothscale(self._get_thumbnail_surface(index), size))
+        if len(atlas.pages) != num_pages:
+            # updates the size of the atlas in the cache
+            self._atlases.put(level, atlas)
+
+    def _missing_items(self, view: _View) -> Iterator[Tuple[int, Tuple[int, int], bool]]:
+        atlas = self._get_atlas(view.level)
+        for index, rect, is_big in zip(view.indices.tolist(), view.rects.tolist(), view.is_big.tolist()):
+            if is_big:
+                if index not in self._thumbnail_surfaces:
+                    yield index, (rect[2], rect[3]), True
+            elif index not in atlas:
+                yield index, (rect[2], rect[3]), False
+
+    def update(self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext):
+        view = self._get_view(coordinate_system, screen)
+        missing_items = self._missing_items(view)
+
+        def render_step() -> Optional[float]:
+            batch = list(itertools.islice(missing_items, ITEMS_PER_STEP))
+            for index, size, is_big in batch:
+                if is_big:
+                    self._get_thumbnail_surface(index)
+                else:
+                    self._add_to_atlas(view.level, index, size)
+            return PRIORITY_VISIBLE if len(batch) == ITEMS_PER_STEP else None
+
+        render_context.scheduler.schedule_progressive(render_step, PRIORITY_VISIBLE)
+
+    def draw(self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext):
+        view = self._get_view(coordinate_system, screen)
+        atlas = self._atlases.get(view.level)
+        if atlas is not None:
+            item_pages = atlas.item_pages[view.indices].tolist()
+            item_areas = atlas.item_areas[view.indices].tolist()
+        else:
+            item_pages = [-1] * len(view.indices)
+            item_areas = item_pages
+        placeholder = self._get_placeholder_surface()
+        clip_rect = screen.get_clip()
+        blits = []
+        for index, rect, is_big, page_index, area in zip(
+                view.indices.tolist(), view.rects.tolist(), view.is_big.tolist(), item_pages, item_areas
+        ):
+            if is_big:
+                scaled_item = self._get_scaled_item(index, pg.Rect(rect), clip_rect)
+                if scaled_item is not None:
+                    blits.append(scaled_item)
+                elif placeholder is not None:
+                    screen.fill(self.placeholder_color, rect)
+            elif page_index >= 0:
+                blits.append((atlas.pages[page_index], (rect[0], rect[1]), area))
+            elif placeholder is not None:
+                # blitting a part of a prepared surface is faster than filling many small rects
+                blits.append((placeholder, (rect[0], rect[1]), (0, 0, rect[2], rect[3])))
+        screen.blits(blits, doreturn=False)
+
+    def _get_placeholder_surface(self) -> Optional[pg.Surface]:
+        if self.placeholder_color is None:
+            return None
+        if self._placeholder_surface is None or self._placeholder_surface.get_at((0, 0)) != self.placeholder_color:
+            self._placeholder_surface = pg.Surface((MAX_ATLAS_ITEM_SIZE, MAX_ATLAS_ITEM_SIZE))
+            self._placeholder_surface.fill(self.placeholder_color)
+        return self._placeholder_surface
+
+    def _get_scaled_item(
+            self, index: int, screen_rect: pg.Rect, clip_rect: pg.Rect
+    ) -> Optional[Tuple[pg.Surface, pg.Rect]]:
+        """
+        Scales the visible part of a big item. Returns None, if the thumbnail is not loaded yet.
+        """
+        thumbnail = self._thumbnail_surfaces.get(index)
+        if thumbnail is None:
+            return None
+        source_area, dest_rect = visible_area(thumbnail.get_rect(), screen_rect, clip_rect)
+        if source_area.width == 0 or source_area.height == 0 or dest_rect.width <= 0 or dest_rect.height <= 0:
+            return None
+        scaled_key = (index, tuple(source_area), dest_rect.size)
+        scaled_item = self._scaled_items.get(scaled_key)
+        if scaled_item is None:
+            scaled_item = pg.transform.scale(thumbnail.subsurface(source_area), dest_rect.size)
+            self._scaled_items.put(scaled_key, scaled_item)
+        return scaled_item, dest_rect
+
+    def handle_event(
+            self, event: pg.event.Event, screen: pg.Surface, coordinate_system: CoordinateSystem,
+            render_context: RenderContext
+    ):
+        pass
@@ -0,0 +1,273 @@
+import math
+import os
+from typing import Sequence, Optional, Dict, List, Tuple, Hashable
+
+import numpy as np
+import pygame as pg
+
+from viztools.coordinate_system import CoordinateSystem
+from viztools.drawable.base_drawable import Drawable
+from viztools.render_scheduler import PRIORITY_VISIBLE, PRIORITY_REFINE
+from viztools.text_rendering import quantize_font_size, color_key, render_text_block
+from viztools.utils import RenderContext, Align, LRUCache
+
+# labels with bigger font sizes on the screen are not drawn
+MAX_FONT_SIZE = 4000
+# label sizes are measured once with this font size and scaled to other font sizes
+MEASURE_FONT_SIZE = 32
+# decluttering is done for quantized zoom levels, with this many levels per factor of two
+LEVELS_PER_OCTAVE = 4
+DECLUTTER_CACHE_LEVELS = 8
+# number of font sizes, for which the keys of the rendered labels are cached
+TEXT_KEY_CACHE_SIZES = 8
+# number of labels placed or rendered in one step of progressive work
+DECLUTTER_STEP_SIZE = 1000
+RENDER_STEP_SIZE = 32
+
+
+class _Declutter:
+    """
+    Greedy placement of labels for one zoom level. Labels are placed in the order of their priority and are only
+    accepted, if they do not overlap with an already accepted label. Accepted labels are stored in a grid of buckets,
+    so only labels in the same buckets have to be checked. The placement is done progressively, every prefix of the
+    placement is a valid result.
+    """
+    def __init__(self, order: np.ndarray, centers: np.ndarray, half_sizes: np.ndarray):
+        """
+        :param order: The indices of the labels ordered by descending priority.
+        :param centers: The centers of all labels in pixels for this zoom level as array of shape [N, 2].
+        :param half_sizes: The half widths and heights of all labels in pixels as array of shape [N, 2].
+        """
+        self.order = order.tolist()
+        self.centers = centers.tolist()
+        self.half_sizes = half_sizes.tolist()
+        self.cell_size = max(float(np.max(half_sizes)) * 2, 1.0) if len(half_sizes) else 1.0
+        self.accepted = np.zeros(len(centers), dtype=bool)
+        self.next_index = 0
+        self.grid: Dict[Tuple[int, int], List[int]] = {}
+
+    def is_done(self) -> bool:
+        return self.next_index >= len(self.order)
+
+    def step(self, num_labels: int):
+        """
+        Places the next num_labels labels.
+        """
+        centers, half_sizes, grid, cell_size = self.centers, self.half_sizes, self.grid, self.cell_size
+        end_index = min(self.next_index + num_labels, len(self.order))
+        for index in self.order[self.next_index:end_index]:
+            center_x, center_y = centers[index]
+            half_width, half_height = half_sizes[index]
+            min_cell_x = int((center_x - half_width) // cell_size)
+            max_cell_x = int((center_x + half_width) // cell_size)
+            min_cell_y = int((center_y - half_height) // cell_size)
+            max_cell_y = int((center_y + half_height) // cell_size)
+            cells = [
+                (cell_x, cell_y)
+                for cell_x in range(min_cell_x, max_cell_x + 1) for cell_y in range(min_cell_y, max_cell_y + 1)
+            ]
+            if not any(
+                    abs(center_x - centers[other][0]) < half_width + half_sizes[other][0] and
+                    abs(center_y - centers[other][1]) < half_height + half_sizes[other][1]
+                    for cell in cells for other in grid.get(cell, ())
+            ):
+                self.accepted[index] = True
+                for cell in cells:
+                    grid.setdefault(cell, []).append(index)
+        self.next_index = end_index
+
+
+class Labels(Drawable):
+    def __init__(
+            self, positions: np.ndarray, texts: Sequence[str], priorities: Optional[np.ndarray] = None,
+            font_name: str = '', font_size: int | float = 16, color: Optional[np.ndarray] = None,
+            align: Align = Align.CENTER, declutter: bool = True, padding: int = 2, visible: bool = True
+    ):
+        """
+        Drawable to display many text labels, for example to label the points of a scatter plot.
+
+        Positions are kept in a numpy array and labels outside the screen are culled for all labels at once. If
+        declutter is set, overlapping labels are hidden, so that labels with higher priority are shown. Rendered texts
+        are cached and drawn with a single call of Surface.blits().
+
+        :param positions: The positions of the labels as numpy array of shape [N, 2].
+        :param texts: The texts of the labels.
+        :param priorities: Numpy array of shape [N]. Labels with higher priority are shown first, if labels overlap. If
+            None, labels earlier in the list have higher priority.
+        :param font_name: The font name to use for rendering the text. If not provided, defaults to a system font.
+        :param font_size: The size of the font. If an integer is provided, it is interpreted as pixels. If a float is
+            provided, it is interpreted as size in world coordinates.
+        :param color: The color of the text as a NumPy array. If None, defaults to white.
+        :param align: Which point of a label is placed at its position.
+        :param declutter: If True, labels overlapping with a label of higher priority are not drawn.
+        :param padding: Minimal distance between two labels in pixels, when decluttering.
+        :param visible: Whether the labels are visible.
+        """
+        super().__init__(visible)
+        if not isinstance(positions, np.ndarray):
+            raise TypeError(f'positions must be a numpy array, not {type(positions)}.')
+        if positions.ndim != 2 or positions.shape[1] != 2:
+            raise ValueError(f'positions must be numpy array with shape (N, 2), not {positions.shape}.')
+        if len(texts) != len(positions):
+            raise ValueError(f'got {len(texts)} texts, but {len(positions)} positions.')
+        if priorities is not None and priorities.shape != (len(positions),):
+            raise ValueError(
+                f'priorities must be a numpy array with shape ({len(positions)},), not {priorities.shape}.'
+            )
+        self.positions = positions.astype(np.float64)
+        self.texts = list(texts)
+        if priorities is None:
+            self.order = np.arange(len(positions))
+        else:
+            self.order = np.argsort(-priorities, kind='stable')
+        if font_name:
+            if not os.path.isfile(font_name):
+                font_name = pg.font.match_font(font_name)
+        else:
+            font_name = pg.font.get_default_font()
+        self.font_name = font_name
+        self.font_size = font_size
+        self.color = color if color is not None else np.array([255, 255, 255], dtype=np.uint8)
+        self.align = align
+        self.declutter = declutter
+        self.padding = padding
+
+        self._measured_sizes: Optional[np.ndarray] = None
+        self._declutters = LRUCache(max_items=DECLUTTER_CACHE_LEVELS)
+        self._text_keys = LRUCache(max_items=TEXT_KEY_CACHE_SIZES)
+        self._view_key = None
+        self._visible_labels: List[Tuple[int, int, int, Hashable]] = []
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _get_font_size(self, zoom_factor: float) -> int:
+        if isinstance(self.font_size, float):
+            return quantize_font_size(self.font_size * zoom_factor)
+        return self.font_size
+
+    def _get_label_sizes(self, render_context: RenderContext, font_size: int) -> np.ndarray:
+        """
+        Returns the sizes of all labels in pixels as array of shape [N, 2] for the given font size.
+        """
+        if self._measured_sizes is None:
+            font = render_context.get_font(self.font_name, MEASURE_FONT_SIZE)
+            line_height = font.get_linesize()
+            self._measured_sizes = np.array([
+                (max(font.size(line)[0] for line in lines), line_height * len(lines))
+                for lines in (text.split('\n') for text in self.texts)
+            ], dtype=np.float64).reshape(-1, 2)
+        return np.ceil(self._measured_sizes * (font_size / MEASURE_FONT_SIZE))
+
+    def _get_text_keys(self, font_size: int, color: Tuple[int, ...]) -> Dict[int, Hashable]:
+        """
+        Returns the keys of the rendered labels in RenderContext.text_cache by label index for the given font size and
+        color. Keys are added, when a label becomes visible for the first time.
+        """
+        text_keys = self._text_keys.get((font_size, color))
+        if text_keys is None:
+            text_keys = {}
+            self._text_keys.put((font_size, color), text_keys)
+        return text_keys
+
+    def _get_declutter(self, render_context: RenderContext, zoom_factor: float) -> _Declutter:
+        """
+        Returns the placement for the zoom level closest to the given zoom factor. Placements only depend on the zoom,
+        not on the translation, so labels do not appear and disappear while panning.
+        """
+        level = round(math.log2(max(zoom_factor, 1e-12)) * LEVELS_PER_OCTAVE)
+        declutter = self._declutters.get(level)
+        if declutter is None:
+            level_zoom = 2 ** (level / LEVELS_PER_OCTAVE)
+            sizes = self._get_label_sizes(render_context, self._get_font_size(level_zoom)) + self.padding
+            centers = self.positions * np.array([level_zoom, -level_zoom])
+            centers += (0.5 - np.array(self.align.get_anker_fraction())) * sizes
+            declutter = _Declutter(self.order, centers, sizes / 2)
+            self._declutters.put(level, declutter)
+        return declutter
+
+    def update(self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext):
+        zoom_factor = coordinate_system.zoom_factor
+        font_size = self._get_font_size(zoom_factor)
+        if font_size > MAX_FONT_SIZE or font_size < 1 or len(self) == 0:
+            self._visible_labels = []
+            return
+
+        declutter = self._get_declutter(render_context, zoom_factor) if self.declutter else None
+        if declutter is not None and not declutter.is_done():
+            def declutter_step() -> Optional[float]:
+                declutter.step(DECLUTTER_STEP_SIZE)
+                return None if declutter.is_done() else PRIORITY_VISIBLE
+            render_context.scheduler.schedule_progressive(declutter_step, PRIORITY_VISIBLE)
+
+        color = color_key(self.color)
+        view_key = (
+            coordinate_system.coord.tobytes(), screen.get_size(), declutter, declutter and declutter.next_index, color
+        )
+        if view_key != self._view_key:
+            self._view_key = view_key
+            self._visible_labels = self._get_visible_labels(screen, coordinate_system, render_context, declutter, color)
+
+        text_cache = render_context.text_cache
+        missing = [(index, key) for index, _, _, key in self._visible_labels if key not in text_cache]
+        if missing:
+            def render_step() -> Optional[float]:
+                font = render_context.get_font(self.font_name, font_size)
+                for index, key in missing[:RENDER_STEP_SIZE]:
+                    if key not in text_cache:
+                        text_cache.put(key, render_text_block(font, self.texts[index], self.color))
+                del missing[:RENDER_STEP_SIZE]
+                return PRIORITY_REFINE if missing else None
+            render_context.scheduler.schedule_progressive(render_step, PRIORITY_REFINE)
+
+    def _get_visible_labels(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext,
+            declutter: Optional[_Declutter], color: Tuple[int, ...]
+    ) -> List[Tuple[int, int, int, Hashable]]:
+        """
+        Returns the labels, that are on the screen and accepted by the declutter placement, as list of
+        (index, anchor_x, anchor_y, text_key) in priority order.
+        """
+        font_size = self._get_font_size(coordinate_system.zoom_factor)
+        sizes = self._get_label_sizes(render_context, font_size)
+        anchors = coordinate_system.space_to_screen_t(self.positions)
+        top_left = anchors - np.array(self.align.get_anker_fraction()) * sizes
+        screen_width, screen_height = screen.get_size()
+        is_visible = (top_left[:, 0] < screen_width) & (top_left[:, 1] < screen_height) & \
+            (top_left[:, 0] + sizes[:, 0] > 0) & (top_left[:, 1] + sizes[:, 1] > 0)
+        if declutter is not None:
+            is_visible &= declutter.accepted
+        order = self.order[is_visible[self.order]]
+        anchors = np.round(anchors[order]).astype(np.int64)
+        order = order.tolist()
+
+        text_keys = self._get_text_keys(font_size, color)
+        keys = []
+        for index in order:
+            key = text_keys.get(index)
+            if key is None:
+                # the same key as text_key() returns, without converting the color for every label
+                key = text_keys[index] = (self.texts[index], self.font_name, font_size, color)
+            keys.append(key)
+        return list(zip(order, anchors[:, 0].tolist(), anchors[:, 1].tolist(), keys))
+
+    def draw(self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext):
+        font_size = self._get_font_size(coordinate_system.zoom_factor)
+        if font_size > MAX_FONT_SIZE or font_size < 1:
+            return
+        fraction_x, fraction_y = self.align.get_anker_fraction()
+        text_cache = render_context.text_cache
+        blits = []
+        # labels with higher priority are drawn last, so they are on top
+        for _index, anchor_x, anchor_y, key in reversed(self._visible_labels):
+            surface = text_cache.get(key)
+            if surface is not None:
+                width, height = surface.get_size()
+                blits.append((surface, (anchor_x - int(width * fraction_x), anchor_y - int(height * fraction_y))))
+        screen.blits(blits, doreturn=False)
+
+    def handle_event(
+            self, event: pg.event.Event, screen: pg.Surface, coordinate_system: CoordinateSystem,
+            render_context: RenderContext
+    ):
+        pass
@@ -1,11 +1,23 @@
+import functools
+import math
 import os
+from typing import Optional, Hashable, Tuple
 
 import pygame as pg
 import numpy as np
 
 from viztools.coordinate_system import CoordinateSystem
 from viztools.drawable.base_drawable import Drawable
-from viztools.utils import RenderContext
+from viztools.render_scheduler import PRIORITY_VISIBLE, PRIORITY_REFINE
+from viztools.text_rendering import quantize_font_size, text_key, render_text_block, color_key, compose_label
+from viztools.utils import RenderContext, LRUCache
+
+# texts with bigger font sizes on the screen are not drawn
+MAX_FONT_SIZE = 4000
+# time in seconds after which text is rasterized, even if the frame budget is exhausted
+TEXT_DEADLINE = 0.1
+# the size of the text is measured once with this font size and scaled to other font sizes
+MEASURE_FONT_SIZE = 32
 
 
 class OverlayText(Drawable):
@@ -54,59 +66,126 @@ class OverlayText(Drawable):
         self.background_color = background_color
         self.border_color = border_color
         self.border_width = border_width
+        self._text_block: Optional[pg.Surface] = None
+        self._text_block_key: Optional[Hashable] = None
+        self._text_block_font_size: Optional[int] = None
+        self._label: Optional[pg.Surface] = None
+        self._label_key: Optional[Hashable] = None
+        self._measured_text: Optional[str] = None
+        self._measured_size: Tuple[int, int] = (0, 0)
 
-    def draw(self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext):
-        text_lines = self.text.split('\n')
-        font_size = self.font_size
-        if isinstance(font_size, float):
-            font_size = int(self.font_size * coordinate_system.zoom_factor)
-        if font_size > 4000:
-            return
-        font = pg.font.Font(self.font_name, font_size)
-        line_dimensions = [font.size(line) for line in text_lines]
-        total_height = sum(d[1] for d in line_dimensions)
-        max_width = max(d[0] for d in line_dimensions)
+    def _get_font_size(self, coordinate_system: CoordinateSystem) -> int:
+        """
+        Returns the font size in pixels, in which the text is rendered. World sized fonts are quantized, so the text is
+        not rasterized again for every zoom step.
+        """
+        if isinstance(self.font_size, float):
+            return quantize_font_size(self.font_size * coordinate_system.zoom_factor)
+        return self.font_size
 
-        combined_rect = pg.Rect(0, 0, max_width, total_height)
+    def _get_label_rect(
+            self, coordinate_system: CoordinateSystem, render_context: RenderContext, font_size: int
+    ) -> pg.Rect:
+        """
+        Estimates the screen rect of the label without rasterizing the text. The text is measured once and the size is
+        scaled to the given font size.
+        """
+        if self._measured_text != self.text:
+            font = render_context.get_font(self.font_name, MEASURE_FONT_SIZE)
+            lines = self.text.split('\n')
+            self._measured_size = (max(font.size(line)[0] for line in lines), font.get_linesize() * len(lines))
+            self._measured_text = self.text
+        scale = font_size / MEASURE_FONT_SIZE
         padding = self.border_width * 2 if self.border_color is not None else 0
-
+        # glyphs do not scale exactly with the font size, the margin keeps labels at the border of the screen
+        margin = font_size
+        label_rect = pg.Rect(
+            0, 0, math.ceil(self._measured_size[0] * scale) + padding + margin,
+            math.ceil(self._measured_size[1] * scale) + padding + margin
+        )
         pos = coordinate_system.space_to_screen(self.position.reshape(2, 1)).reshape(2)
-        combined_rect.center = (int(pos[0]), int(pos[1]))
+        label_rect.center = (int(pos[0]), int(pos[1]))
+        return label_rect
 
-        # Add padding for border
-        combined_rect.width += padding
-        combined_rect.height += padding
+    def _render_text_block(self, render_context: RenderContext, font_size: int) -> pg.Surface:
+        return render_text_block(render_context.get_font(self.font_name, font_size), self.text, self.color)
 
-        # skip if out of screen
-        if not combined_rect.colliderect(screen.get_rect()):
+    def _add_text_block(self, text_cache: LRUCache, key: Hashable, font_size: int, text_block: pg.Surface):
+        text_cache.put(key, text_block)
+        self._set_text_block(key, font_size, text_block)
+
+    def _set_text_block(self, key: Hashable, font_size: int, text_block: pg.Surface):
+        self._text_block_key = key
+        self._text_block_font_size = font_size
+        self._text_block = text_block
+
+    def _get_label(self, render_context: RenderContext) -> pg.Surface:
+        """
+        Returns the text block together with background and border. The composed label is cached until text or style
+        change.
+        """
+        border_color = color_key(self.border_color)
+        label_key = (
+            self._text_block_key, color_key(self.background_color), border_color,
+            self.border_width if border_color is not None else 0
+        )
+        if label_key != self._label_key:
+            label = render_context.text_cache.get(label_key)
+            if label is None:
+                label = compose_label(self._text_block, self.background_color, self.border_color, self.border_width)
+                if label is not self._text_block:
+                    render_context.text_cache.put(label_key, label)
+            self._label_key = label_key
+            self._label = label
+        return self._label
+
+    def update(
+            self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext
+    ):
+        font_size = self._get_font_size(coordinate_system)
+        if font_size > MAX_FONT_SIZE or font_size < 1:
+            return
+        key = text_key(self.text, self.font_name, font_size, self.color)
+        if key == self._text_block_key:
+            return
+        text_block = render_context.text_cache.get(key)
+        if text_block is not None:
+            # the same text was rendered by another drawable or before
+            self._set_text_block(key, font_size, text_block)
+            return
+        if not self._get_label_rect(coordinate_system, render_context, font_size).colliderect(screen.get_rect()):
+            # text outside the screen is rasterized, when it becomes visible
+            render_context.scheduler.cancel((self, 'text'))
+            return
+        priority = PRIORITY_VISIBLE if self._text_block is None else PRIORITY_REFINE
+        render_context.scheduler.submit(
+            (self, 'text'), functools.partial(self._render_text_block, render_context, font_size), priority=priority,
+            deadline=TEXT_DEADLINE,
+            callback=functools.partial(self._add_text_block, render_context.text_cache, key, font_size)
+        )
+
+    def draw(self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext):
+        font_size = self._get_font_size(coordinate_system)
+        if font_size > MAX_FONT_SIZE or font_size < 1 or self._text_block is None:
             return
 
-        if self.background_color is not None:
-            background = pg.Surface(combined_rect.size, pg.SRCALPHA)
-            background.fill(self.background_color)
-            screen.blit(background, combined_rect)
-
-        if self.border_color is not None:
-            border_surface = pg.Surface(screen.get_size(), pg.SRCALPHA)
-            pg.draw.rect(border_surface, self.border_color, combined_rect, self.border_width)
-            screen.blit(border_surface, (0, 0))
-
-        current_y = combined_rect.y + (padding // 2)
-        line_surfaces = [font.render(line, True, self.color) for line in text_lines]
-        for surface in line_surfaces:
-            line_rect = surface.get_rect()
-            line_rect.centerx = combined_rect.centerx
-            line_rect.y = current_y
-            screen.blit(surface, line_rect)
-            current_y += line_rect.height
+        label = self._get_label(render_context)
+        rendered_font_size = self._text_block_font_size
+        if rendered_font_size != font_size:
+            # placeholder until the text is rasterized with the new font size
+            scale = font_size / rendered_font_size
+            label = pg.transform.scale(
+                label, (max(int(label.get_width() * scale), 1), max(int(label.get_height() * scale), 1))
+            )
+
+        label_rect = label.get_rect()
+        pos = coordinate_system.space_to_screen(self.position.reshape(2, 1)).reshape(2)
+        label_rect.center = (int(pos[0]), int(pos[1]))
+        if label_rect.colliderect(screen.get_rect()):
+            screen.blit(label, label_rect)
 
     def handle_event(
             self, event: pg.event.Event, screen: pg.Surface, coordinate_system: CoordinateSystem,
             render_context: RenderContext
     ):
         pass
-
-    def update(
-            self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext
-    ):
-        pass
@@ -1,4 +1,3 @@
-import time
 from typing import Iterable, Tuple, Dict, Optional, Union
 
 import pygame as pg
@@ -7,6 +6,7 @@ import numpy as np
 from viztools.coordinate_system import CoordinateSystem
 from viztools.drawable.base_drawable import Drawable
 from viztools.drawable.draw_utils.chunking import ChunkGrid
+from viztools.render_scheduler import RenderScheduler
 from viztools.utils import RenderContext, normalize_color
 
 
@@ -132,22 +132,61 @@ class Points(Drawable):
         draw_sizes[is_relative_size] *= zoom_factor
         return np.maximum(draw_sizes.astype(int), 1)
 
-    def update_chunks(self, coordinate_system: CoordinateSystem, screen_size: Tuple[int, int]) -> bool:
-        point_surfaces = self._create_point_surfaces(coordinate_system.zoom_factor)
-
+    def update_chunks(
+            self, coordinate_system: CoordinateSystem, screen_size: Tuple[int, int],
+            scheduler: Optional[RenderScheduler] = None
+    ) -> bool:
+        """
+        Schedules the rendering of chunks, that are outdated. Visible chunks, that were not rendered yet, are rendered
+        first. The work is executed by the scheduler within the time budget of the frame, that is shared with all
+        other drawables.
+
+        :param coordinate_system: The coordinate system, the points are rendered in.
+        :param screen_size: The size of the screen.
+        :param scheduler: The scheduler executing the work. If None, the work is done immediately with the budget of a
+            single frame.
+        :return: True, if there were chunks to update.
+        """
         if self.last_zoom_factor is None or self.last_zoom_factor != coordinate_system.zoom_factor:
             self.last_zoom_factor = coordinate_system.zoom_factor
             viewport = coordinate_system.get_viewport(screen_size)
             new_sizes = _get_world_sizes(self._size[:, 0], self._size[:, 1], coordinate_system.zoom_factor)
             self.current_chunks.resize_chunks(coordinate_system.zoom_factor, viewport, new_sizes)
 
-        start_time = time.perf_counter()
-        while True:
-            update_needed = self.render_next_chunk(coordinate_system, point_surfaces, screen_size)
-            if not update_needed:
-                return False
-            if time.perf_counter() - start_time > 1 / 60:
-                break
+        viewport = coordinate_system.get_viewport(screen_size)
+        next_update = self.current_chunks.get_next_update(viewport)
+        if next_update is None:
+            return False
+
+        run_immediately = scheduler is None
+        if run_immediately:
+            scheduler = RenderScheduler()
+            scheduler.begin_frame()
+
+        chunk_index, priority = next_update
+        zoom_factor = coordinate_system.zoom_factor
+        render_data = {}
+
+        def render_step() -> Optional[float]:
+            nonlocal chunk_index
+            # created lazily, so frames without time left for this drawable do not pay for it
+            if not render_data:
+                render_data['sizes'] = _get_world_sizes(self._size[:, 0], self._size[:, 1], zoom_factor)
+                render_data['surf_params'] = self._get_surf_params()
+                render_data['point_surfaces'] = self._create_point_surfaces(zoom_factor)
+            self.current_chunks.render_chunk(
+                chunk_index, self._points, render_data['sizes'], render_data['surf_params'], zoom_factor,
+                render_data['point_surfaces']
+            )
+            step_update = self.current_chunks.get_next_update(viewport)
+            if step_update is None:
+                return None
+            chunk_index, step_priority = step_update
+            return step_priority
+
+        scheduler.schedule_progressive(render_step, priority)
+        if run_immediately:
+            scheduler.run()
         return True
 
     def render_next_chunk(self, coordinate_system, point_surfaces, screen_size):
@@ -163,7 +202,7 @@ class Points(Drawable):
         return False
 
     def update(self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext) -> bool:
-        return self.update_chunks(coordinate_system, screen.get_size())
+        return self.update_chunks(coordinate_system, screen.get_size(), render_context.scheduler)
 
     def draw(self, screen: pg.Surface, coordinate_system: CoordinateSystem, render_context: RenderContext):
         # draw points in chunks
@@ -0,0 +1,167 @@
+from typing import Dict, List, Tuple, Optional, Iterable, Any, Iterator
+
+DEFAULT_LAYER = 0
+
+
+class Registry:
+    """
+    Ordered collection of the drawables or ui elements of a viewer or container. Items are drawn ordered by their layer,
+    items with a higher layer are drawn on top. Items of the same layer are drawn in the order they were added.
+
+    Adding and removing items is O(1). Iterating returns a list, that is only built again after changes, so items can be
+    added or removed while iterating.
+
+    Items, that are assigned to attributes of the owner, are added automatically (see replace()). An item, that replaces
+    another item in an attribute, takes its place in the draw order. An item can be added multiple times, for example if
+    it is assigned to two attributes. It stays in the registry until it was discarded as often as it was added or until
+    it is removed.
+    """
+    def __init__(self, item_types: Tuple[type, ...], items: Iterable[Any] = ()):
+        """
+        :param item_types: Only objects of these types are added by replace().
+        :param items: Objects to add to the registry, if they are of one of the item types.
+        """
+        self.item_types = item_types
+        # items of every layer by their slot, slots are increasing, so the dicts keep the draw order
+        self._layers: Dict[int, Dict[int, Any]] = {}
+        self._sorted_layers: List[int] = []
+        # layer, number of additions and slot of every item by its id
+        self._entries: Dict[int, Tuple[int, int, int]] = {}
+        self._next_slot = 0
+        self._items: Optional[List[Any]] = None
+        for item in items:
+            self.replace(None, item)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, item: Any) -> bool:
+        return id(item) in self._entries
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.items())
+
+    def items(self) -> List[Any]:
+        """
+        Returns all items ordered by layer. The returned list must not be modified.
+        """
+        if self._items is None:
+            self._items = [item for layer in self._sorted_layers for item in self._layers[layer].values()]
+        return self._items
+
+    def add(self, item: Any, layer: Optional[int] = None):
+        """
+        Adds an item. If the item is already registered, only its layer is changed, if a layer is given.
+
+        :param item: The item to add.
+        :param layer: The layer of the item. Defaults to DEFAULT_LAYER for new items.
+        """
+        entry = self._entries.get(id(item))
+        if entry is None:
+            layer = DEFAULT_LAYER if layer is None else layer
+            self._entries[id(item)] = (layer, 1, self._insert(item, layer))
+            return
+        old_layer, count, slot = entry
+        self._entries[id(item)] = (old_layer, count + 1, slot)
+        if layer is not None and layer != old_layer:
+            self.set_layer(item, layer)
+
+    def remove(self, item: Any):
+        """
+        Removes an item, regardless of how often it was added. Raises KeyError, if the item is not registered.
+        """
+        layer, _count, slot = self._entries.pop(id(item))
+        items = self._layers[layer]
+        del items[slot]
+        if not items:
+            del self._layers[layer]
+            self._sorted_layers.remove(layer)
+        self._items = None
+
+    def discard(self, item: Any):
+        """
+        Reverts one addition of the item. The item is removed, if it was not added another time.
+        """
+        entry = self._entries.get(id(item))
+        if entry is None:
+            return
+        layer, count, slot = entry
+        if count > 1:
+            self._entries[id(item)] = (layer, count - 1, slot)
+        else:
+            self.remove(item)
+
+    def set_layer(self, item: Any, layer: int):
+        """
+        Moves an item to the given layer. The item is drawn after all items, that are already in that layer.
+        """
+        _old_layer, count, _slot = self._entries[id(item)]
+        self.remove(item)
+        self._entries[id(item)] = (layer, count, self._insert(item, layer))
+
+    def get_layer(self, item: Any) -> int:
+        return self._entries[id(item)][0]
+
+    def replace(self, old_value: Any, new_value: Any):
+        """
+        Called, when an attribute of the owner changes from old_value to new_value. Discards the old value and adds the
+        new value, if they are of one of the item types. If the old value is removed by this and the new value is not
+        registered yet, the new value takes the layer and the position in the draw order of the old value.
+        """
+        if old_value is new_value:
+            return
+        old_entry = self._entries.get(id(old_value)) if isinstance(old_value, self.item_types) else None
+        if (
+                old_entry is not None and old_entry[1] == 1 and isinstance(new_value, self.item_types)
+                and id(new_value) not in self._entries
+        ):
+            layer, _count, slot = self._entries.pop(id(old_value))
+            self._layers[layer][slot] = new_value
+            self._entries[id(new_value)] = (layer, 1, slot)
+            self._items = None
+            return
+        if isinstance(old_value, self.item_types):
+            self.discard(old_value)
+        if isinstance(new_value, self.item_types):
+            self.add(new_value)
+
+    def _insert(self, item: Any, layer: int) -> int:
+        """
+        Appends the item to the given layer and returns its slot.
+        """
+        items = self._layers.get(layer)
+        if items is None:
+            items = self._layers[layer] = {}
+            self._sorted_layers.append(layer)
+            self._sorted_layers.sort()
+        slot = self._next_slot
+        self._next_slot += 1
+        items[slot] = item
+        self._items = None
+        return slot
+
+
+class RegistryOwner:
+    """
+    Mixin for classes, that own registries. Objects assigned to attributes are added to the registries of the owner, and
+    discarded again, when the attribute is changed or deleted.
+    """
+    # names of the attributes holding the registries
+    _registry_names: Tuple[str, ...] = ()
+
+    def __setattr__(self, name: str, value: Any):
+        old_value = self.__dict__.get(name)
+        super().__setattr__(name, value)
+        self._replace_in_registries(old_value, value)
+
+    def __delattr__(self, name: str):
+        old_value = self.__dict__.get(name)
+        super().__delattr__(name)
+        self._replace_in_registries(old_value, None)
+
+    def _replace_in_registries(self, old_value: Any, new_value: Any):
+        for registry_name in self._registry_names:
+            # registries are created in __init__, attributes assigned before are added by the registry itself
+            registry = self.__dict__.get(registry_name)
+            if registry is not None:
+                registry.replace(old_value, new_value)
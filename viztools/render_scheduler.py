@@ -0,0 +1,349 @@
+import enum
+import heapq
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Optional, List, Tuple, Any, Dict, Hashable
+
+DEFAULT_FRAMERATE = 60.0
+# fraction of the frame time, that is always available for progressive work, even if drawing is slow
+MIN_BUDGET_FRACTION = 0.1
+# one core is left for the main thread. Without worker threads, threaded tasks are executed in the main thread.
+DEFAULT_MAX_WORKERS = min(4, (os.cpu_count() or 1) - 1)
+
+# priorities for common kinds of work, lower values are more urgent
+PRIORITY_VISIBLE = 0.0  # visible content, that is not shown at all until the work is done
+PRIORITY_REFINE = 2.0  # visible content, that is currently shown by a placeholder
+PRIORITY_PREFETCH = 4.0  # content, that is not visible yet
+
+
+class TaskState(enum.IntEnum):
+    PENDING = 0
+    RUNNING = 1
+    DONE = 2
+    FAILED = 3
+    CANCELLED = 4
+
+
+class RenderTask:
+    """
+    A deferred piece of work submitted to a RenderScheduler. The result is available in a later call of run() of the
+    scheduler. Until then the submitter should render a placeholder.
+    """
+    def __init__(
+            self, key: Hashable, func: Callable[[], Any], priority: float, deadline: Optional[float], threaded: bool,
+            callback: Optional[Callable[[Any], None]]
+    ):
+        self.key = key
+        self.func = func
+        self.priority = priority
+        self.deadline = deadline
+        self.threaded = threaded
+        self.callback = callback
+        self.state = TaskState.PENDING
+        self._result: Any = None
+        self._exception: Optional[BaseException] = None
+
+    def is_pending(self) -> bool:
+        """
+        Returns True, if the task is waiting for execution or currently executed.
+        """
+        return self.state in (TaskState.PENDING, TaskState.RUNNING)
+
+    def done(self) -> bool:
+        """
+        Returns True, if the task finished successfully.
+        """
+        return self.state == TaskState.DONE
+
+    def result(self) -> Any:
+        """
+        Returns the result of the task. Raises the exception of the task, if it failed.
+        """
+        if self.state == TaskState.FAILED:
+            raise self._exception
+        if self.state != TaskState.DONE:
+            raise RuntimeError(f'task {self.key} has no result, its state is {self.state.name}.')
+        return self._result
+
+    def cancel(self):
+        """
+        Cancels the task, if it was not executed yet. Running threaded tasks finish, but their callback is not called.
+        """
+        if self.is_pending():
+            self.state = TaskState.CANCELLED
+
+    def _finish(self, result: Any = None, exception: Optional[BaseException] = None):
+        if self.state == TaskState.CANCELLED:
+            return
+        if exception is not None:
+            self._exception = exception
+            self.state = TaskState.FAILED
+            return
+        self._result = result
+        self.state = TaskState.DONE
+        if self.callback is not None:
+            self.callback(result)
+
+
+class RenderScheduler:
+    """
+    Distributes the time of a frame between drawables, that do deferred or progressive work (like rendering chunks of
+    points, decoding images or rasterizing text).
+
+    There are two kinds of work:
+    - Progressive work is scheduled every frame in update() using schedule_progressive() and consists of many small
+      steps.
+    - Tasks are submitted once using submit() and persist until they are done. They are identified by a key, have a
+      priority and optionally a deadline, and are either executed in the main thread or on worker threads.
+
+    The viewer calls run() every frame, which executes the most urgent work first, until the frame budget is used up.
+    The frame budget is the frame time given by the framerate minus the time, that is needed to draw the frame
+    (measured over the last frames).
+    """
+    def __init__(
+            self, framerate: float = DEFAULT_FRAMERATE, render_time_smoothing: float = 0.9,
+            max_workers: int = DEFAULT_MAX_WORKERS
+    ):
+        """
+        Creates a new RenderScheduler.
+
+        :param framerate: The target framerate. If zero or negative, DEFAULT_FRAMERATE is used to compute the budget.
+        :param render_time_smoothing: Smoothing factor of the exponential moving average of the time needed to draw a
+            frame. Bigger values adapt slower to changes.
+        :param max_workers: The maximal number of worker threads executing threaded tasks. If zero, threaded tasks are
+            executed in the main thread like other tasks.
+        """
+        self.framerate = framerate
+        self.render_time_smoothing = render_time_smoothing
+        self.render_time: float = 0.0
+        self.max_workers = max_workers
+        self._frame_start: float = time.perf_counter()
+        self._run_end: Optional[float] = None
+        self._jobs: List[Tuple[float, int, Callable[[], Optional[float]]]] = []
+        self._job_counter = itertools.count()
+
+        self._tasks: Dict[Hashable, RenderTask] = {}
+        self._task_queue: List[Tuple[float, int, RenderTask]] = []
+        self._thread_queue: List[Tuple[float, int, RenderTask]] = []
+        self._running: List[Tuple[RenderTask, Future]] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def frame_time(self) -> float:
+        """
+        The target time of a single frame in seconds.
+        """
+        framerate = self.framerate if self.framerate > 0 else DEFAULT_FRAMERATE
+        return 1 / framerate
+
+    def begin_frame(self, framerate: Optional[float] = None):
+        """
+        Starts a new frame. Work scheduled in the last frame, that was not executed, is dropped.
+
+        :param framerate: If given, updates the target framerate.
+        """
+        if framerate is not None:
+            self.framerate = framerate
+        self._frame_start = time.perf_counter()
+        self._jobs.clear()
+
+    def end_frame(self):
+        """
+        Ends the current frame. The time between run() and end_frame() is used to estimate the time needed for drawing.
+        """
+        if self._run_end is not None:
+            elapsed = time.perf_counter() - self._run_end
+            self.render_time = self.render_time_smoothing * self.render_time + \
+                (1 - self.render_time_smoothing) * elapsed
+            self._run_end = None
+
+    def deadline(self) -> float:
+        """
+        The point in time (as given by time.perf_counter()) at which progressive work for this frame has to stop.
+        """
+        frame_time = self.frame_time()
+        budget = max(frame_time - self.render_time, frame_time * MIN_BUDGET_FRACTION)
+        return self._frame_start + budget
+
+    def remaining_time(self) -> float:
+        """
+        The time in seconds, that is left for progressive work in this frame. Can be negative.
+        """
+        return self.deadline() - time.perf_counter()
+
+    def schedule_progressive(self, step: Callable[[], Optional[float]], priority: float):
+        """
+        Schedules progressive work for this frame.
+
+        :param step: A function doing a small piece of work. It returns the priority of the next piece of work or None,
+            if there is nothing left to do in this frame.
+        :param priority: The priority of the first step. Lower values are more urgent.
+        """
+        heapq.heappush(self._jobs, (priority, next(self._job_counter), step))
+
+    def submit(
+            self, key: Hashable, func: Callable[[], Any], priority: float = PRIORITY_VISIBLE,
+            deadline: Optional[float] = None, threaded: bool = False, callback: Optional[Callable[[Any], None]] = None
+    ) -> RenderTask:
+        """
+        Submits a task. If a task with the same key is still waiting for execution, it is replaced by the new function,
+        priority and callback, so only the most recent request for the same work is executed. The earlier deadline of
+        both is kept, so submitting the same task every frame does not postpone it. A running task with the same key is
+        cancelled, so its outdated result is not passed to its callback.
+
+        :param key: Identifies the task, for example (drawable, 'decode').
+        :param func: The work to do. Threaded tasks must not access the display surface.
+        :param priority: The priority of the task. Lower values are more urgent.
+        :param deadline: Time in seconds from now. A task, that is not executed before its deadline, is executed even if
+            the frame budget is used up.
+        :param threaded: If True, the task is executed on a worker thread, if there are any. Otherwise, it is executed
+            in the main thread within the frame budget.
+        :param callback: Called with the result of func in the main thread, when the task is done.
+        :return: The submitted task.
+        """
+        absolute_deadline = time.perf_counter() + deadline if deadline is not None else None
+        threaded = threaded and self.max_workers > 0
+        task = self._tasks.get(key)
+        if task is not None and task.state == TaskState.PENDING and task.threaded == threaded:
+            task.func = func
+            task.priority = priority
+            if task.deadline is None or (absolute_deadline is not None and absolute_deadline < task.deadline):
+                task.deadline = absolute_deadline
+            task.callback = callback
+        else:
+            if task is not None:
+                task.cancel()
+            task = RenderTask(key, func, priority, absolute_deadline, threaded, callback)
+            self._tasks[key] = task
+        queue = self._thread_queue if threaded else self._task_queue
+        heapq.heappush(queue, (priority, next(self._job_counter), task))
+        return task
+
+    def get_task(self, key: Hashable) -> Optional[RenderTask]:
+        """
+        Returns the task with the given key, if it is still waiting for execution or running. Otherwise, returns None.
+        """
+        return self._tasks.get(key)
+
+    def cancel(self, key: Hashable):
+        """
+        Cancels the task with the given key, if there is one.
+        """
+        task = self._tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def run(self):
+        """
+        Executes scheduled work ordered by priority until the frame budget is used up. At least one step is executed
+        per frame, so progress is guaranteed even if the budget is exhausted. Tasks, whose deadline is over, are
+        executed regardless of the budget.
+        """
+        deadline = self.deadline()
+        self._collect_threaded_tasks()
+        self._dispatch_threaded_tasks()
+
+        first = True
+        while True:
+            task_entry = self._peek_task()
+            if task_entry is None and not self._jobs:
+                break
+            if not first and time.perf_counter() >= deadline:
+                self._run_overdue_tasks()
+                break
+            first = False
+            if task_entry is not None and (not self._jobs or task_entry[0] <= self._jobs[0][0]):
+                heapq.heappop(self._task_queue)
+                self._execute_task(task_entry[2])
+            else:
+                _priority, _, step = heapq.heappop(self._jobs)
+                next_priority = step()
+                if next_priority is not None:
+                    heapq.heappush(self._jobs, (next_priority, next(self._job_counter), step))
+        self._jobs.clear()
+        self._run_end = time.perf_counter()
+
+    def shutdown(self):
+        """
+        Cancels all tasks and stops the worker threads.
+        """
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self._task_queue.clear()
+        self._thread_queue.clear()
+        self._running.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _peek_task(self) -> Optional[Tuple[float, int, RenderTask]]:
+        """
+        Returns the most urgent entry of the task queue, that is still valid. Invalid entries are removed.
+        """
+        while self._task_queue:
+            entry = self._task_queue[0]
+            if self._is_valid_entry(entry):
+                return entry
+            heapq.heappop(self._task_queue)
+        return None
+
+    def _is_valid_entry(self, entry: Tuple[float, int, RenderTask]) -> bool:
+        priority, _, task = entry
+        # outdated entries remain in the queue, when a task is submitted again
+        return task.state == TaskState.PENDING and task.priority == priority and self._tasks.get(task.key) is task
+
+    def _run_overdue_tasks(self):
+        now = time.perf_counter()
+        overdue = [
+            entry for entry in self._task_queue
+            if self._is_valid_entry(entry) and entry[2].deadline is not None and entry[2].deadline <= now
+        ]
+        for _priority, _, task in sorted(overdue):
+            self._execute_task(task)
+
+    def _execute_task(self, task: RenderTask):
+        self._tasks.pop(task.key, None)
+        task.state = TaskState.RUNNING
+        try:
+            result = task.func()
+        except Exception as e:
+            task._finish(exception=e)
+            raise
+        task._finish(result)
+
+    def _dispatch_threaded_tasks(self):
+        # more tasks than workers are dispatched, so the workers stay busy until the next frame collects their results
+        while self._thread_queue and len(self._running) < self.max_workers * 2:
+            entry = heapq.heappop(self._thread_queue)
+            if not self._is_valid_entry(entry):
+                continue
+            task = entry[2]
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='viztools')
+            task.state = TaskState.RUNNING
+            self._running.append((task, self._executor.submit(task.func)))
+
+    def _collect_threaded_tasks(self):
+        finished = []
+        still_running = []
+        for task, future in self._running:
+            (finished if future.done() else still_running).append((task, future))
+        self._running = still_running
+        first_exception = None
+        for task, future in finished:
+            if self._tasks.get(task.key) is not task:
+                # the task was cancelled or replaced by a newer submit, so its result is outdated
+                task.cancel()
+                continue
+            del self._tasks[task.key]
+            exception = future.exception()
+            if exception is not None:
+                task._finish(exception=exception)
+                first_exception = first_exception or exception
+            else:
+                task._finish(future.result())
+        # errors of worker threads are raised in the main thread, as if the work was done synchronously
+        if first_exception is not None:
+            raise first_exception
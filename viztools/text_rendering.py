@@ -0,0 +1,262 @@
+import math
+from typing import Hashable, Optional, Tuple, Dict, List
+
+import numpy as np
+import pygame as pg
+
+# font sizes up to this size are rendered exactly, bigger sizes are quantized
+EXACT_FONT_SIZE_LIMIT = 16
+# number of font sizes per factor of two, bigger font sizes are rounded to
+FONT_SIZE_STEPS_PER_OCTAVE = 12
+# kerning is measured for pairs of characters with codes below this value
+KERNING_TABLE_SIZE = 128
+# maximal number of words, whose widths are cached by a glyph atlas
+WORD_CACHE_SIZE = 2 ** 16
+
+
+def quantize_font_size(font_size: float) -> int:
+    """
+    Rounds a font size to a fixed set of sizes, so that text scaled with the zoom does not have to be rasterized again
+    for every zoom level. Small sizes are kept exactly, bigger sizes are rounded to FONT_SIZE_STEPS_PER_OCTAVE steps per
+    factor of two, which changes the size by at most 3%.
+
+    :param font_size: The font size in pixels.
+    :return: The quantized font size in pixels.
+    """
+    if font_size <= EXACT_FONT_SIZE_LIMIT:
+        return max(int(round(font_size)), 1)
+    step = round(math.log2(font_size) * FONT_SIZE_STEPS_PER_OCTAVE)
+    return int(round(2 ** (step / FONT_SIZE_STEPS_PER_OCTAVE)))
+
+
+def color_key(color) -> Optional[Tuple[int, ...]]:
+    """
+    Converts a color given as numpy array, tuple or list into a hashable tuple. None stays None.
+    """
+    if color is None:
+        return None
+    return tuple(int(c) for c in np.asarray(color).flatten())
+
+
+def text_key(text: str, font_name: str, font_size: int, color) -> Hashable:
+    """
+    The key of a rendered text in RenderContext.text_cache.
+    """
+    return text, font_name, font_size, color_key(color)
+
+
+def render_text_block(font: pg.font.Font, text: str, color) -> pg.Surface:
+    """
+    Renders all lines of the text centered into a single surface.
+
+    :param font: The font to render with.
+    :param text: The text. Lines are separated by newlines.
+    :param color: The color of the text.
+    :return: A surface with per pixel alpha containing the text.
+    """
+    line_surfaces = [font.render(line, True, color) for line in text.split('\n')]
+    width = max(surface.get_width() for surface in line_surfaces)
+    height = sum(surface.get_height() for surface in line_surfaces)
+
+    text_block = pg.Surface((width, height), pg.SRCALPHA)
+    current_y = 0
+    for surface in line_surfaces:
+        line_rect = surface.get_rect()
+        line_rect.centerx = width // 2
+        line_rect.y = current_y
+        text_block.blit(surface, line_rect)
+        current_y += line_rect.height
+    return text_block
+
+
+def compose_label(
+        text_block: pg.Surface, background_color=None, border_color=None, border_width: int = 0
+) -> pg.Surface:
+    """
+    Draws background, border and text of a label into one surface, so drawing the label needs a single blit.
+
+    :param text_block: The rendered text.
+    :param background_color: The color of the background or None for no background.
+    :param border_color: The color of the border or None for no border.
+    :param border_width: The width of the border in pixels. The label is padded by the border width on every side.
+    :return: The composed label or text_block itself, if there is neither background nor border.
+    """
+    if background_color is None and border_color is None:
+        return text_block
+    padding = border_width * 2 if border_color is not None else 0
+    label = pg.Surface((text_block.get_width() + padding, text_block.get_height() + padding), pg.SRCALPHA)
+    if background_color is not None:
+        label.fill(background_color)
+    if border_color is not None:
+        pg.draw.rect(label, border_color, label.get_rect(), border_width)
+    label.blit(text_block, (padding // 2, padding // 2))
+    return label
+
+
+def char_index_at(prefix_widths: np.ndarray, x: float) -> int:
+    """
+    Finds the character boundary closest to the given x-position with a binary search.
+
+    :param prefix_widths: The positions of the characters of a text, as returned by GlyphAtlas.prefix_widths().
+    :param x: The x-position relative to the start of the text.
+    :return: The index of the character before which the cursor should be placed, between 0 and len(text).
+    """
+    index = int(np.searchsorted(prefix_widths, x))
+    if index >= len(prefix_widths):
+        return len(prefix_widths) - 1
+    if index > 0 and x - prefix_widths[index - 1] < prefix_widths[index] - x:
+        return index - 1
+    return index
+
+
+class GlyphAtlas:
+    """
+    Advance widths and rendered glyphs of one font.
+
+    Text is measured by summing the cached advances of its characters with numpy, instead of calling font.size() for
+    every string. render() composes text from the cached glyphs at exactly these positions, so cursors and selections
+    computed from prefix_widths() match the rendered text.
+
+    Kerning is measured once with font.size() for pairs of characters with codes below KERNING_TABLE_SIZE and added
+    to the advances. Other pairs are placed without kerning.
+    """
+    def __init__(self, font: pg.font.Font):
+        """
+        Creates an empty atlas. Glyphs are measured when they are used for the first time.
+
+        :param font: The font of the glyphs.
+        """
+        self.font = font
+        self.height = font.get_height()
+        # advance of each character code and width of its rendered glyph, which can be bigger than the advance
+        self._advances = np.zeros(KERNING_TABLE_SIZE, dtype=np.int64)
+        self._glyph_widths = np.zeros(KERNING_TABLE_SIZE, dtype=np.int64)
+        self._is_measured = np.zeros(KERNING_TABLE_SIZE, dtype=bool)
+        self._kerning = np.zeros((KERNING_TABLE_SIZE, KERNING_TABLE_SIZE), dtype=np.int64)
+        self._is_kerning_measured = np.zeros(KERNING_TABLE_SIZE, dtype=bool)
+        self._glyphs: Dict[Tuple[str, Tuple[int, ...]], pg.Surface] = {}
+        self._word_widths: Dict[str, int] = {}
+
+    def prefix_widths(self, text: str) -> np.ndarray:
+        """
+        Returns the x-positions of all characters of the text and the position after the last character as int64 array
+        of length len(text) + 1.
+        """
+        codes = self._get_codes(text)
+        steps = self._advances[codes]
+        if len(codes) > 1:
+            firsts, seconds = codes[:-1], codes[1:]
+            is_kerned = (firsts < KERNING_TABLE_SIZE) & (seconds < KERNING_TABLE_SIZE)
+            if np.any(is_kerned):
+                firsts, seconds = firsts[is_kerned], seconds[is_kerned]
+                self._measure_kerning(firsts)
+                steps[:-1][is_kerned] += self._kerning[firsts, seconds]
+        positions = np.zeros(len(codes) + 1, dtype=np.int64)
+        np.cumsum(steps, out=positions[1:])
+        return positions
+
+    def text_width(self, text: str) -> int:
+        """
+        Returns the width of the rendered text in pixels.
+        """
+        return self._text_width(text, self.prefix_widths(text))
+
+    def word_widths(self, words: List[str]) -> List[int]:
+        """
+        Returns the advance widths of the given words. Widths are cached per word, so words, that appear again, are not
+        measured again. Kerning with the characters around the words is ignored.
+        """
+        word_widths = self._word_widths
+        missing = [word for word in dict.fromkeys(words) if word not in word_widths]
+        if missing:
+            if len(word_widths) + len(missing) > WORD_CACHE_SIZE:
+                word_widths.clear()
+                missing = list(dict.fromkeys(words))
+            # all missing words are measured at once, separated by a character without kerning
+            positions = self.prefix_widths('\0'.join(missing))
+            lengths = np.array([len(word) for word in missing], dtype=np.int64)
+            ends = np.cumsum(lengths + 1) - 1
+            widths = positions[ends] - positions[ends - lengths]
+            word_widths.update(zip(missing, widths.tolist()))
+        return [word_widths[word] for word in words]
+
+    def render(self, text: str, color) -> pg.Surface:
+        """
+        Renders a single line of text from the cached glyphs.
+
+        :param text: The text to render.
+        :param color: The color of the text.
+        :return: A surface with per pixel alpha, that is text_width(text) wide and one line high.
+        """
+        positions = self.prefix_widths(text)
+        surface = pg.Surface((self._text_width(text, positions), self.height), pg.SRCALPHA)
+        glyph_color = color_key(color)
+        surface.blits(
+            [(self._get_glyph(char, glyph_color), (x, 0)) for char, x in zip(text, positions.tolist())], doreturn=False
+        )
+        return surface
+
+    def _text_width(self, text: str, positions: np.ndarray) -> int:
+        if not text:
+            return 0
+        last_glyph_width = self._glyph_widths[ord(text[-1])]
+        return int(max(positions[-1], positions[-2] + last_glyph_width))
+
+    def _get_glyph(self, char: str, color: Tuple[int, ...]) -> pg.Surface:
+        key = (char, color)
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            glyph = self.font.render(char, True, color)
+            self._glyphs[key] = glyph
+        return glyph
+
+    def _get_codes(self, text: str) -> np.ndarray:
+        """
+        Returns the character codes of the text and measures characters, that are used for the first time.
+        """
+        codes = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32).astype(np.int64)
+        if len(codes) == 0:
+            return codes
+        max_code = int(codes.max())
+        if max_code >= len(self._is_measured):
+            new_size = 1 << max_code.bit_length()
+            self._advances = _resize(self._advances, new_size)
+            self._glyph_widths = _resize(self._glyph_widths, new_size)
+            self._is_measured = _resize(self._is_measured, new_size)
+        unmeasured = codes[~self._is_measured[codes]]
+        if len(unmeasured):
+            self._measure_glyphs(np.unique(unmeasured))
+        return codes
+
+    def _measure_glyphs(self, codes: np.ndarray):
+        for code in codes.tolist():
+            char = chr(code)
+            glyph_width = self.font.size(char)[0]
+            metrics = self.font.metrics(char)
+            # characters without glyph in the font are rendered with a replacement glyph, that has no metrics
+            self._advances[code] = metrics[0][4] if metrics and metrics[0] is not None else glyph_width
+            self._glyph_widths[code] = glyph_width
+        self._is_measured[codes] = True
+
+    def _measure_kerning(self, firsts: np.ndarray):
+        """
+        Measures the kerning of all pairs starting with one of the given characters.
+        """
+        unmeasured = firsts[~self._is_kerning_measured[firsts]]
+        if len(unmeasured) == 0:
+            return
+        self._get_codes(''.join(chr(code) for code in range(KERNING_TABLE_SIZE)))
+        seconds = [code for code in range(KERNING_TABLE_SIZE) if chr(code).isprintable()]
+        for first in np.unique(unmeasured).tolist():
+            if chr(first).isprintable():
+                first_char, advance = chr(first), self._advances[first]
+                for second in seconds:
+                    pair_width = self.font.size(first_char + chr(second))[0]
+                    self._kerning[first, second] = pair_width - advance - self._glyph_widths[second]
+            self._is_kerning_measured[first] = True
+
+
+def _resize(array: np.ndarray, size: int) -> np.ndarray:
+    result = np.zeros(size, dtype=array.dtype)
+    result[:len(array)] = array
+    return result
@@ -1,32 +1,78 @@
-from typing import Iterable, Optional, List
+from typing import Iterable, Optional, List, Union
 
 import pygame as pg
 
 from ..elements.base_element import UIElement
+from ..event_dispatch import EventDispatcher
+from viztools.registry import Registry, RegistryOwner
 from viztools.utils import RenderContext
 
 
-class UIContainer:
+class UIContainer(RegistryOwner):
+    _registry_names = ('_elements',)
+
     def __init__(self, visible: bool = True):
+        # elements assigned to attributes are registered automatically
+        self._elements = Registry((UIElement, UIContainer), self.__dict__.values())
         self.visible = visible
-        self._element_cache: Optional[List[UIElement]] = None
+        self._event_dispatcher = EventDispatcher()
+
+    def add_element(self, element: Union[UIElement, 'UIContainer'], layer: Optional[int] = None):
+        """
+        Adds an element or container, that is not assigned to an attribute, for example one stored in a list.
+
+        :param element: The element to add.
+        :param layer: Elements with a higher layer are drawn on top. Defaults to 0.
+        """
+        self._elements.add(element, layer)
+
+    def remove_element(self, element: Union[UIElement, 'UIContainer']):
+        self._elements.remove(element)
 
-    def iter_elements(self) -> Iterable[UIElement]:
+    def iter_elements(self) -> Iterable[Union[UIElement, 'UIContainer']]:
         """
-        Iter over all elements in the container.
-        :return: Iterable of BaseElement objects.
+        Iter over all elements in the container ordered by layer. Elements can be other containers.
+        :return: Iterable of UIElement and UIContainer objects.
         """
-        if self._element_cache is None:
-            self._element_cache = [elem for elem in self.__dict__.values() if isinstance(elem, UIElement)]
+        yield from self._elements.items()
 
-        yield from self._element_cache
+    def iter_visible_elements(self) -> Iterable[Union[UIElement, 'UIContainer']]:
+        """
+        Iter over the elements, that can be seen. Only these elements handle events and are rendered. Containers with a
+        rect skip elements outside their rect.
+        """
+        return self.iter_elements()
 
-    def handle_events(self, events: List[pg.event.Event], render_context: RenderContext):
+    def handle_events(
+            self, events: List[pg.event.Event], render_context: RenderContext, clip_rect: Optional[pg.Rect] = None
+    ):
+        """
+        Passes the events to the visible elements.
+
+        :param events: The events of this frame.
+        :param render_context: The render context passed to the elements.
+        :param clip_rect: The area of the screen, in which the container is visible. Pointer events outside of it do not
+            hit any element. If None, the whole screen.
+        """
         if self.visible:
-            for elem in self.iter_elements():
-                elem.handle_events(events, render_context)
+            clip_rect = self.get_clip_rect(clip_rect)
+            elements = []
+            for elem in self.iter_visible_elements():
+                if isinstance(elem, UIContainer):
+                    elem.handle_events(events, render_context, clip_rect)
+                else:
+                    elements.append(elem)
+            self._event_dispatcher.dispatch(events, elements, render_context, clip_rect)
+
+    def get_clip_rect(self, clip_rect: Optional[pg.Rect]) -> Optional[pg.Rect]:
+        """
+        Returns the area of the screen, in which the elements of this container are visible.
+
+        :param clip_rect: The area, in which the container itself is visible. None for the whole screen.
+        """
+        return clip_rect
 
     def render(self, screen: pg.Surface, render_context: RenderContext):
         if self.visible:
-            for element in self.iter_elements():
+            for element in self.iter_visible_elements():
                 element.render(screen, render_context)
@@ -0,0 +1,251 @@
+import bisect
+from abc import ABC, abstractmethod
+from typing import Iterable, List, Union, Optional, Tuple
+
+import pygame as pg
+
+from .base_container import UIContainer
+from ..elements.base_element import UIElement
+from viztools.utils import RenderContext
+
+# pixels scrolled by one step of the mouse wheel
+DEFAULT_SCROLL_STEP = 30
+
+
+class LayoutContainer(UIContainer, ABC):
+    """
+    A container, that places its children in its rect. Children are UI elements or other layout containers, so layouts
+    can be nested. The computed rects are cached and only computed again, if the rect of the container or the number of
+    children changes. After changing the children or their sizes in another way, call invalidate_layout().
+
+    Children are clipped to the rect of the container. Children outside the rect do not handle events and are not
+    rendered. Pointer events outside the rect do not hit the parts of children, that are clipped.
+    """
+    def __init__(
+            self, rect: pg.Rect, children: Iterable['LayoutChild'] = (), spacing: int = 4, padding: int = 0,
+            visible: bool = True
+    ):
+        """
+        :param rect: The rect of the container.
+        :param children: The children of the container in layout order.
+        :param spacing: The space between two children in pixels.
+        :param padding: The space between the border of the container and the children in pixels.
+        :param visible: Whether the container is visible.
+        """
+        super().__init__(visible)
+        self.rect = rect
+        self.spacing = spacing
+        self.padding = padding
+        self.children: List[LayoutChild] = []
+        self._layout_key: Optional[Tuple] = None
+        # rects of the children relative to the top left corner of the inner rect, as computed by the layout
+        self._content_rects: List[pg.Rect] = []
+        for child in children:
+            self.add(child)
+
+    def add(self, child: 'LayoutChild'):
+        if not isinstance(child, (UIElement, LayoutContainer)):
+            raise TypeError(f'children of a layout must be UIElements or LayoutContainers, not {type(child)}.')
+        self.children.append(child)
+        self.invalidate_layout()
+
+    def remove(self, child: 'LayoutChild'):
+        self.children.remove(child)
+        self.invalidate_layout()
+
+    def invalidate_layout(self):
+        """
+        The layout is computed again before the next use.
+        """
+        self._layout_key = None
+
+    def inner_rect(self) -> pg.Rect:
+        return self.rect.inflate(-2 * self.padding, -2 * self.padding)
+
+    def iter_elements(self) -> Iterable['LayoutChild']:
+        yield from self.children
+
+    def iter_visible_elements(self) -> Iterable['LayoutChild']:
+        self._ensure_layout()
+        return [child for child in self.children if child.visible and child.rect.colliderect(self.rect)]
+
+    def get_clip_rect(self, clip_rect: Optional[pg.Rect]) -> Optional[pg.Rect]:
+        return self.rect.clip(clip_rect) if clip_rect is not None else self.rect
+
+    def render(self, screen: pg.Surface, render_context: RenderContext):
+        if self.visible:
+            clip_rect = screen.get_clip()
+            screen.set_clip(clip_rect.clip(self.rect))
+            super().render(screen, render_context)
+            screen.set_clip(clip_rect)
+
+    def _ensure_layout(self):
+        layout_key = (tuple(self.rect), len(self.children))
+        if layout_key != self._layout_key:
+            self._layout_key = layout_key
+            inner_rect = self.inner_rect()
+            self._content_rects = self._compute_layout(inner_rect.size, [child.rect.size for child in self.children])
+            self._place_children(inner_rect.topleft)
+
+    def _place_children(self, origin: Tuple[int, int]):
+        for child, content_rect in zip(self.children, self._content_rects):
+            child.rect = content_rect.move(origin)
+
+    @abstractmethod
+    def _compute_layout(self, size: Tuple[int, int], child_sizes: List[Tuple[int, int]]) -> List[pg.Rect]:
+        """
+        Computes the rects of the children relative to the top left corner of the inner rect.
+
+        :param size: The size of the inner rect.
+        :param child_sizes: The current sizes of the children.
+        """
+        pass
+
+
+LayoutChild = Union[UIElement, LayoutContainer]
+
+
+class Column(LayoutContainer):
+    """
+    Places the children below each other. Children keep their height and are stretched to the width of the container.
+    """
+    def _compute_layout(self, size: Tuple[int, int], child_sizes: List[Tuple[int, int]]) -> List[pg.Rect]:
+        rects = []
+        y = 0
+        for _width, height in child_sizes:
+            rects.append(pg.Rect(0, y, size[0], height))
+            y += height + self.spacing
+        return rects
+
+
+class Row(LayoutContainer):
+    """
+    Places the children next to each other. Children keep their width and are stretched to the height of the container.
+    """
+    def _compute_layout(self, size: Tuple[int, int], child_sizes: List[Tuple[int, int]]) -> List[pg.Rect]:
+        rects = []
+        x = 0
+        for width, _height in child_sizes:
+            rects.append(pg.Rect(x, 0, width, size[1]))
+            x += width + self.spacing
+        return rects
+
+
+class Grid(LayoutContainer):
+    """
+    Places the children in cells of equal size, row by row.
+    """
+    def __init__(
+            self, rect: pg.Rect, num_columns: int, children: Iterable[LayoutChild] = (),
+            row_height: Optional[int] = None, spacing: int = 4, padding: int = 0, visible: bool = True
+    ):
+        """
+        :param rect: The rect of the container.
+        :param num_columns: The number of cells in a row. The cells share the width of the container.
+        :param children: The children of the container in layout order.
+        :param row_height: The height of the cells. If None, the height of the highest child is used.
+        :param spacing: The space between two cells in pixels.
+        :param padding: The space between the border of the container and the cells in pixels.
+        :param visible: Whether the container is visible.
+        """
+        if num_columns < 1:
+            raise ValueError(f'num_columns must be at least 1, not {num_columns}.')
+        self.num_columns = num_columns
+        self.row_height = row_height
+        super().__init__(rect, children, spacing, padding, visible)
+
+    def _compute_layout(self, size: Tuple[int, int], child_sizes: List[Tuple[int, int]]) -> List[pg.Rect]:
+        cell_width = (size[0] - self.spacing * (self.num_columns - 1)) // self.num_columns
+        cell_height = self.row_height
+        if cell_height is None:
+            cell_height = max((height for _width, height in child_sizes), default=0)
+        return [
+            pg.Rect(
+                (index % self.num_columns) * (cell_width + self.spacing),
+                (index // self.num_columns) * (cell_height + self.spacing),
+                cell_width, cell_height
+            )
+            for index in range(len(child_sizes))
+        ]
+
+
+class ScrollContainer(Column):
+    """
+    A column, that can be higher than its rect and is scrolled with the mouse wheel. Only the children in the visible
+    part of the column are placed, handle events and are rendered, so the cost per frame does not depend on the number
+    of children.
+    """
+    def __init__(
+            self, rect: pg.Rect, children: Iterable[LayoutChild] = (), spacing: int = 4, padding: int = 0,
+            scroll_step: int = DEFAULT_SCROLL_STEP, visible: bool = True
+    ):
+        """
+        :param rect: The rect of the container.
+        :param children: The children of the container in layout order.
+        :param spacing: The space between two children in pixels.
+        :param padding: The space between the border of the container and the children in pixels.
+        :param scroll_step: The number of pixels scrolled by one step of the mouse wheel.
+        :param visible: Whether the container is visible.
+        """
+        super().__init__(rect, children, spacing, padding, visible)
+        self.scroll_step = scroll_step
+        self.scroll_offset: int = 0  # in pixels
+        self._content_tops: List[int] = []
+        self._visible_children: List[LayoutChild] = []
+        self._visible_key: Optional[Tuple] = None
+        # read from pygame on the first call of handle_events(), so the wheel works before the mouse was moved
+        self._mouse_pos: Optional[Tuple[int, int]] = None
+
+    def content_height(self) -> int:
+        self._ensure_layout()
+        if not self._content_rects:
+            return 0
+        return self._content_rects[-1].bottom
+
+    def scroll_to(self, offset: int):
+        """
+        Scrolls to the given offset in pixels. The offset is clamped to the height of the content.
+        """
+        max_offset = max(self.content_height() - self.inner_rect().height, 0)
+        self.scroll_offset = max(0, min(offset, max_offset))
+
+    def _ensure_layout(self):
+        layout_key = self._layout_key
+        super()._ensure_layout()
+        if layout_key != self._layout_key:
+            self._content_tops = [rect.top for rect in self._content_rects]
+            self._visible_key = None
+
+    def _place_children(self, origin: Tuple[int, int]):
+        # children are placed, when they become visible
+        pass
+
+    def iter_visible_elements(self) -> Iterable[LayoutChild]:
+        self._ensure_layout()
+        visible_key = (self._layout_key, self.scroll_offset)
+        if visible_key != self._visible_key:
+            self._visible_key = visible_key
+            inner_rect = self.inner_rect()
+            # the first child, that ends below the top of the visible area, is found by the tops of the children
+            start = max(bisect.bisect_right(self._content_tops, self.scroll_offset) - 1, 0)
+            end = bisect.bisect_left(self._content_tops, self.scroll_offset + inner_rect.height)
+            self._visible_children = []
+            for child, content_rect in zip(self.children[start:end], self._content_rects[start:end]):
+                child.rect = content_rect.move(inner_rect.left, inner_rect.top - self.scroll_offset)
+                if content_rect.bottom > self.scroll_offset:
+                    self._visible_children.append(child)
+        return [child for child in self._visible_children if child.visible]
+
+    def handle_events(
+            self, events: List[pg.event.Event], render_context: RenderContext, clip_rect: Optional[pg.Rect] = None
+    ):
+        if self.visible:
+            visible_rect = self.get_clip_rect(clip_rect)
+            if self._mouse_pos is None:
+                self._mouse_pos = pg.mouse.get_pos()
+            for event in events:
+                if event.type == pg.MOUSEMOTION:
+                    self._mouse_pos = event.pos
+                elif event.type == pg.MOUSEWHEEL and visible_rect.collidepoint(self._mouse_pos):
+                    self.scroll_to(self.scroll_offset - event.y * self.scroll_step)
+        super().handle_events(events, render_context, clip_rect)
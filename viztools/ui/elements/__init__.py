@@ -4,5 +4,6 @@ from viztools.ui.elements.implementations.edit_field import EditField
 from viztools.ui.elements.implementations.text_field import TextField
 from viztools.ui.elements.implementations.checkbox import CheckBox
 from viztools.ui.elements.implementations.slider import Slider
+from viztools.ui.elements.implementations.table import Table
 
-__all__ = ['Label', 'Button', 'EditField', 'TextField', 'CheckBox', 'Slider']
+__all__ = ['Label', 'Button', 'EditField', 'TextField', 'CheckBox', 'Slider', 'Table']
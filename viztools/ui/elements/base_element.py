@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import final, List
+from typing import final, List, Optional, Any
 
 import pygame as pg
 
@@ -16,6 +16,8 @@ class UIElement(ABC):
         self.rect: pg.Rect = rect
         self.is_clicked: bool = False
         self.render_needed: bool = True
+        self._cached_surface: Optional[pg.Surface] = None
+        self._cached_state: Any = None
 
     @final
     def handle_events(
@@ -65,9 +67,56 @@ class UIElement(ABC):
         :param render_context: The render context to use for rendering.
         """
         if self.visible:
-            self.draw(screen, render_context)
+            state = self.render_state()
+            if state is None:
+                self.draw(screen, render_context)
+            else:
+                screen.blit(self._get_cached_surface(state, render_context), self.rect)
         self.finalize()
 
+    def render_state(self) -> Any:
+        """
+        Returns the state of the element, that changes how it looks, like hovering or its value. If None is returned
+        (default), the element is drawn every frame. Otherwise, the element is drawn once into a cached surface, that is
+        drawn every frame, until the state changes or render_needed is set. Changes of other attributes, like colors,
+        have to be signaled by setting render_needed to True.
+        """
+        return None
+
+    def has_focus(self) -> bool:
+        """
+        Returns True, if the element receives keyboard events.
+        """
+        return False
+
+    def is_opaque(self) -> bool:
+        """
+        Returns True, if draw() fills the whole rect of the element, so the cached surface needs no alpha channel.
+        """
+        return False
+
+    def _get_cached_surface(self, state: Any, render_context: RenderContext) -> pg.Surface:
+        """
+        Returns the cached surface of the element. Draws the element again, if needed.
+        """
+        state = (state, self.rect.size, self.is_opaque())
+        if not self.render_needed and self._cached_surface is not None and state == self._cached_state:
+            return self._cached_surface
+        if self._cached_surface is None or state[1:] != self._cached_state[1:]:
+            flags = 0 if self.is_opaque() else pg.SRCALPHA
+            self._cached_surface = pg.Surface(self.rect.size, flags)
+        self._cached_surface.fill((0, 0, 0, 0))
+        # draw() uses the rect of the element, so it is moved to the origin of the cached surface while drawing
+        rect = self.rect
+        self.rect = pg.Rect((0, 0), rect.size)
+        try:
+            self.draw(self._cached_surface, render_context)
+        finally:
+            self.rect = rect
+        self._cached_state = state
+        self.render_needed = False
+        return self._cached_surface
+
     @abstractmethod
     def draw(self, screen: pg.Surface, render_context: RenderContext):
         """
@@ -0,0 +1,142 @@
+import sys
+from collections import deque
+from typing import Tuple, Optional, Deque, List
+
+# memory used by all edits of an EditHistory, before the oldest edits are forgotten
+DEFAULT_HISTORY_BYTES = 16 * 2 ** 20
+# estimated memory used by an edit in addition to its text
+EDIT_OVERHEAD_BYTES = 128
+
+TextPosition = Tuple[int, int]
+
+
+class TextEdit:
+    """
+    An insertion or deletion of text. Positions are given as (line_index, char_index), where char_index counts the
+    characters of the unwrapped line, so edits stay valid, if lines are wrapped differently.
+    """
+    def __init__(self, position: TextPosition, text: str, is_insertion: bool):
+        """
+        :param position: The position at which the text is inserted or from which it is deleted.
+        :param text: The inserted or deleted text. Can contain newlines.
+        :param is_insertion: True for insertions, False for deletions.
+        """
+        self.position = position
+        self.text = text
+        self.is_insertion = is_insertion
+
+    def __repr__(self):
+        return f'TextEdit({self.position}, {self.text!r}, is_insertion={self.is_insertion})'
+
+    def end(self) -> TextPosition:
+        """
+        The position after the text, if the text is in the document.
+        """
+        num_newlines = self.text.count('\n')
+        if num_newlines == 0:
+            return self.position[0], self.position[1] + len(self.text)
+        return self.position[0] + num_newlines, len(self.text) - self.text.rfind('\n') - 1
+
+    def inverse(self) -> 'TextEdit':
+        """
+        Returns the edit, that reverts this edit.
+        """
+        return TextEdit(self.position, self.text, not self.is_insertion)
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.text) + EDIT_OVERHEAD_BYTES
+
+    def coalesce(self, edit: 'TextEdit') -> bool:
+        """
+        Merges the given edit, that directly follows this edit, into this edit, if both belong to one step of typing or
+        deleting. Returns True, if the edit was merged.
+        """
+        if edit.is_insertion != self.is_insertion or '\n' in edit.text or '\n' in self.text or len(edit.text) != 1:
+            return False
+        if self.is_insertion:
+            # typing continues at the end of the last insertion, a new word starts a new step
+            if edit.position != self.end() or (self.text.endswith(' ') and edit.text != ' '):
+                return False
+            self.text += edit.text
+            return True
+        if edit.end() == self.position:
+            # backspace
+            self.position = edit.position
+            self.text = edit.text + self.text
+            return True
+        if edit.position == self.position:
+            # delete
+            self.text += edit.text
+            return True
+        return False
+
+
+class EditHistory:
+    """
+    Undo and redo stacks of text edits. Only the inserted or deleted text of every edit is stored instead of snapshots
+    of the document. Consecutive typing and deleting is merged into one edit. If the edits use more than max_bytes of
+    memory, the oldest edits are forgotten.
+    """
+    def __init__(self, max_bytes: int = DEFAULT_HISTORY_BYTES):
+        self.max_bytes = max_bytes
+        self._undo_edits: Deque[TextEdit] = deque()
+        self._redo_edits: List[TextEdit] = []
+        self._num_bytes = 0
+        self._can_coalesce = False
+
+    def clear(self):
+        self._undo_edits.clear()
+        self._redo_edits.clear()
+        self._num_bytes = 0
+        self._can_coalesce = False
+
+    def record(self, edit: TextEdit):
+        """
+        Records an edit, that was applied to the document. Clears the redo stack.
+        """
+        self._redo_edits.clear()
+        if self._can_coalesce and self._undo_edits:
+            last_edit = self._undo_edits[-1]
+            last_num_bytes = last_edit.nbytes()
+            if last_edit.coalesce(edit):
+                self._num_bytes += last_edit.nbytes() - last_num_bytes
+                self._evict()
+                return
+        self._undo_edits.append(edit)
+        self._num_bytes += edit.nbytes()
+        self._can_coalesce = True
+        self._evict()
+
+    def break_coalescing(self):
+        """
+        The next recorded edit starts a new undo step.
+        """
+        self._can_coalesce = False
+
+    def undo(self) -> Optional[TextEdit]:
+        """
+        Returns the edit, that has to be applied to undo the last edit, or None, if there is nothing to undo.
+        """
+        if not self._undo_edits:
+            return None
+        edit = self._undo_edits.pop()
+        self._num_bytes -= edit.nbytes()
+        self._redo_edits.append(edit)
+        self._can_coalesce = False
+        return edit.inverse()
+
+    def redo(self) -> Optional[TextEdit]:
+        """
+        Returns the edit, that has to be applied to redo the last undone edit, or None, if there is nothing to redo.
+        """
+        if not self._redo_edits:
+            return None
+        edit = self._redo_edits.pop()
+        self._undo_edits.append(edit)
+        self._num_bytes += edit.nbytes()
+        self._can_coalesce = False
+        return edit
+
+    def _evict(self):
+        while len(self._undo_edits) > 1 and self._num_bytes > self.max_bytes:
+            self._num_bytes -= self._undo_edits.popleft().nbytes()
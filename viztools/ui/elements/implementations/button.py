@@ -45,8 +45,9 @@ class Button(UIElement):
         # Render text
         if self.text:
             if self.text_surface is None:
-                font = render_context.get_font(self.font_name, self.font_size)
-                self.text_surface = font.render(self.text, True, self.text_color)
+                self.text_surface = render_context.render_text(
+                    self.text, self.text_color, self.font_name, self.font_size
+                )
             text_rect = self.text_surface.get_rect(center=self.rect.center)
             screen.blit(self.text_surface, text_rect)
 
@@ -54,5 +55,11 @@ class Button(UIElement):
         self.text = text
         self.text_surface = None
 
+    def render_state(self):
+        return self.text, self.is_hovered, self.is_hovered and pg.mouse.get_pressed()[0]
+
+    def is_opaque(self) -> bool:
+        return True
+
     def update(self, render_context: RenderContext):
         pass
@@ -43,6 +43,12 @@ class CheckBox(UIElement):
             pg.draw.line(screen, (200, 200, 200), start_pos, middle_pos, 3)
             pg.draw.line(screen, (200, 200, 200), middle_pos, end_pos, 3)
 
+    def render_state(self):
+        return self.checked, self.hovered
+
+    def is_opaque(self) -> bool:
+        return True
+
     def update(self, render_context: RenderContext):
         mouse_pos = pg.mouse.get_pos()
         self.hovered = self.rect.collidepoint(mouse_pos)
@@ -1,8 +1,10 @@
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Hashable
 
+import numpy as np
 import pygame as pg
 
 from ..base_element import UIElement
+from viztools.text_rendering import GlyphAtlas, char_index_at, color_key
 from viztools.utils import RenderContext, Color
 
 SCRAP_TEXT = 'text/plain;charset=utf-8'
@@ -35,7 +37,30 @@ class EditField(UIElement):
         self.font_name = font_name
         self.font_size = font_size
 
-    def _get_char_index_at_pos(self, pos: Tuple[int, int], font: pg.font.Font) -> int:
+        # rendered text and character positions, cached until the text changes
+        self._text_surface: Optional[pg.Surface] = None
+        self._text_surface_key: Optional[Hashable] = None
+        self._prefix_widths: Optional[np.ndarray] = None
+        self._prefix_widths_key: Optional[Hashable] = None
+
+    def _get_prefix_widths(self, glyph_atlas: GlyphAtlas) -> np.ndarray:
+        """
+        Returns the x-positions of all characters of the text (see GlyphAtlas.prefix_widths()).
+        """
+        key = (self.text, glyph_atlas)
+        if key != self._prefix_widths_key:
+            self._prefix_widths = glyph_atlas.prefix_widths(self.text)
+            self._prefix_widths_key = key
+        return self._prefix_widths
+
+    def _get_text_surface(self, text: str, color: Color, render_context: RenderContext) -> pg.Surface:
+        key = (text, color_key(color), self.font_name, self.font_size)
+        if key != self._text_surface_key:
+            self._text_surface = render_context.render_text(text, color, self.font_name, self.font_size)
+            self._text_surface_key = key
+        return self._text_surface
+
+    def _get_char_index_at_pos(self, pos: Tuple[int, int], glyph_atlas: GlyphAtlas) -> int:
         """Calculate the character index in text based on mouse position."""
         # Convert screen position to relative position within edit field
         rel_x = pos[0] - self.rect.x - 5 + self.text_offset  # Add offset to account for scrolling
@@ -43,33 +68,22 @@ class EditField(UIElement):
         if not self.text:
             return 0
 
-        # If click is before text start
-        if rel_x <= 0:
-            return 0
-
         # Find the closest character position
-        for i in range(len(self.text) + 1):
-            text_width = font.size(self.text[:i])[0]
-            if rel_x <= text_width:
-                # Check if we're closer to previous or current position
-                if i > 0:
-                    prev_width = font.size(self.text[:i - 1])[0]
-                    if rel_x - prev_width < text_width - rel_x:
-                        return i - 1
-                return i
-
-        return len(self.text)
+        return char_index_at(self._get_prefix_widths(glyph_atlas), rel_x)
+
+    def has_focus(self) -> bool:
+        return self.is_focused
 
     def handle_event(self, event: pg.event.Event, render_context: RenderContext):
         super().handle_event(event, render_context)
 
         # Handle mouse button down - start selection
-        font = render_context.get_font(self.font_name, self.font_size)
+        glyph_atlas = render_context.get_glyph_atlas(self.font_name, self.font_size)
         if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
             if self.is_hovered:
                 self.is_focused = True
                 # Calculate cursor position from mouse click
-                self.cursor_pos = self._get_char_index_at_pos(event.pos, font)
+                self.cursor_pos = self._get_char_index_at_pos(event.pos, glyph_atlas)
                 self.selection_start = self.cursor_pos
                 self.mouse_down_pos = self.cursor_pos
             else:
@@ -80,7 +94,7 @@ class EditField(UIElement):
         if event.type == pg.MOUSEMOTION:
             if self.mouse_down_pos is not None and pg.mouse.get_pressed()[0]:
                 if self.is_hovered or self.is_focused:
-                    self.cursor_pos = self._get_char_index_at_pos(event.pos, font)
+                    self.cursor_pos = self._get_char_index_at_pos(event.pos, glyph_atlas)
 
         # Handle mouse button up - finish selection
         if event.type == pg.MOUSEBUTTONUP and event.button == 1:
@@ -98,34 +112,34 @@ class EditField(UIElement):
 
                 # Handle text input
                 if event.key == pg.K_BACKSPACE:
-                    self._handle_backspace(font, ctrl_pressed)
+                    self._handle_backspace(glyph_atlas, ctrl_pressed)
                 elif event.key == pg.K_DELETE:
-                    self._handle_delete(font, ctrl_pressed)
+                    self._handle_delete(glyph_atlas, ctrl_pressed)
                 elif event.key == pg.K_LEFT:
                     if ctrl_pressed:
-                        self._move_cursor_word_left(font, shift_pressed)
+                        self._move_cursor_word_left(glyph_atlas, shift_pressed)
                     else:
-                        self._move_cursor_left(font, shift_pressed)
+                        self._move_cursor_left(glyph_atlas, shift_pressed)
                 elif event.key == pg.K_RIGHT:
                     if ctrl_pressed:
-                        self._move_cursor_word_right(font, shift_pressed)
+                        self._move_cursor_word_right(glyph_atlas, shift_pressed)
                     else:
-                        self._move_cursor_right(font, shift_pressed)
+                        self._move_cursor_right(glyph_atlas, shift_pressed)
                 elif event.key == pg.K_HOME:
-                    self._move_cursor_home(font, shift_pressed)
+                    self._move_cursor_home(glyph_atlas, shift_pressed)
                 elif event.key == pg.K_END:
-                    self._move_cursor_end(font, shift_pressed)
+                    self._move_cursor_end(glyph_atlas, shift_pressed)
                 elif event.key == pg.K_a and ctrl_pressed:
                     self._select_all()
                 elif event.key == pg.K_c and ctrl_pressed:
                     self._copy_to_clipboard()
                     print('scrap')
                 elif event.key == pg.K_v and ctrl_pressed:
-                    self._paste_from_clipboard(font)
+                    self._paste_from_clipboard(glyph_atlas)
                 elif event.key == pg.K_x and ctrl_pressed:
                     self._cut_to_clipboard()
                 elif event.unicode and event.unicode.isprintable():
-                    self._insert_text(event.unicode, font)
+                    self._insert_text(event.unicode, glyph_atlas)
 
     def _find_word_start(self, pos: int) -> int:
         """Find the start position of the word at or before the given position."""
@@ -159,14 +173,13 @@ class EditField(UIElement):
 
         return pos
 
-    def _update_text_offset(self, font: pg.font.Font):
+    def _update_text_offset(self, glyph_atlas: GlyphAtlas):
         """Update text offset to keep cursor visible."""
         padding = 5
         visible_width = self.rect.width - 2 * padding
 
         # Calculate cursor position in text coordinates
-        text_before_cursor = self.text[:self.cursor_pos]
-        cursor_x = font.size(text_before_cursor)[0]
+        cursor_x = int(self._get_prefix_widths(glyph_atlas)[self.cursor_pos])
 
         # Adjust offset to keep cursor visible
         # If cursor is to the right of visible area, scroll right
@@ -181,15 +194,15 @@ class EditField(UIElement):
         if self.text_offset < 0:
             self.text_offset = 0
 
-    def _insert_text(self, char: str, font: pg.font.Font):
+    def _insert_text(self, char: str, glyph_atlas: GlyphAtlas):
         """Insert a character at the cursor position."""
         self._delete_selection()
         self.text = self.text[:self.cursor_pos] + char + self.text[self.cursor_pos:]
         self.cursor_pos += len(char)
         self.selection_start = None
-        self._update_text_offset(font)
+        self._update_text_offset(glyph_atlas)
 
-    def _move_cursor_left(self, font: pg.font.Font, shift_pressed: bool):
+    def _move_cursor_left(self, glyph_atlas: GlyphAtlas, shift_pressed: bool):
         """Move cursor left, optionally extending selection."""
         if shift_pressed:
             if self.selection_start is None:
@@ -202,9 +215,9 @@ class EditField(UIElement):
                 self.selection_start = None
             elif self.cursor_pos > 0:
                 self.cursor_pos -= 1
-        self._update_text_offset(font)
+        self._update_text_offset(glyph_atlas)
 
-    def _move_cursor_right(self, font: pg.font.Font, shift_pressed: bool):
+    def _move_cursor_right(self, glyph_atlas: GlyphAtlas, shift_pressed: bool):
         """Move cursor right, optionally extending selection."""
         if shift_pressed:
             if self.selection_start is None:
@@ -217,27 +230,27 @@ class EditField(UIElement):
                 self.selection_start = None
             elif self.cursor_pos < len(self.text):
                 self.cursor_pos += 1
-        self._update_text_offset(font)
+        self._update_text_offset(glyph_atlas)
 
-    def _move_cursor_home(self, font: pg.font.Font, shift_pressed: bool):
+    def _move_cursor_home(self, glyph_atlas: GlyphAtlas, shift_pressed: bool):
         """Move cursor to the start of the text."""
         if shift_pressed and self.selection_start is None:
             self.selection_start = self.cursor_pos
         self.cursor_pos = 0
         if not shift_pressed:
             self.selection_start = None
-        self._update_text_offset(font)
+        self._update_text_offset(glyph_atlas)
 
-    def _move_cursor_end(self, font: pg.font.Font, shift_pressed: bool):
+    def _move_cursor_end(self, glyph_atlas: GlyphAtlas, shift_pressed: bool):
         """Move cursor to the end of the text."""
         if shift_pressed and self.selection_start is None:
             self.selection_start = self.cursor_pos
         self.cursor_pos = len(self.text)
         if not shift_pressed:
             self.selection_start = None
-        self._update_text_offset(font)
+        self._update_text_offset(glyph_atlas)
 
-    def _move_cursor_word_left(self, font: pg.font.Font, shift_pressed: bool):
+    def _move_cursor_word_left(self, glyph_atlas: GlyphAtlas, shift_pressed: bool):
         """Move cursor to the start of the previous word."""
         if shift_pressed and self.selection_start is None:
             self.selection_start = self.cursor_pos
@@ -246,9 +259,9 @@ class EditField(UIElement):
 
         if not shift_pressed:
             self.selection_start = None
-        self._update_text_offset(font)
+        self._update_text_offset(glyph_atlas)
 
-    def _move_cursor_word_right(self, font: pg.font.Font, shift_pressed: bool):
+    def _move_cursor_word_right(self, glyph_atlas: GlyphAtlas, shift_pressed: bool):
         """Move cursor to the end of the current/next word."""
         if shift_pressed and self.selection_start is None:
             self.selection_start = self.cursor_pos
@@ -257,9 +270,9 @@ class EditField(UIElement):
 
         if not shift_pressed:
             self.selection_start = None
-        self._update_text_offset(font)
+        self._update_text_offset(glyph_atlas)
 
-    def _handle_backspace(self, font: pg.font.Font, ctrl_pressed: bool = False):
+    def _handle_backspace(self, glyph_atlas: GlyphAtlas, ctrl_pressed: bool = False):
         """Handle backspace key."""
         if not self._delete_selection():
             if ctrl_pressed:
@@ -271,9 +284,9 @@ class EditField(UIElement):
             elif self.cursor_pos > 0:
                 self.text = self.text[:self.cursor_pos - 1] + self.text[self.cursor_pos:]
                 self.cursor_pos -= 1
-        self._update_text_offset(font)
+        self._update_text_offset(glyph_atlas)
 
-    def _handle_delete(self, font: pg.font.Font, ctrl_pressed: bool = False):
+    def _handle_delete(self, glyph_atlas: GlyphAtlas, ctrl_pressed: bool = False):
         """Handle delete key."""
         if not self._delete_selection():
             if ctrl_pressed:
@@ -283,7 +296,7 @@ class EditField(UIElement):
                     self.text = self.text[:self.cursor_pos] + self.text[new_pos:]
             elif self.cursor_pos < len(self.text):
                 self.text = self.text[:self.cursor_pos] + self.text[self.cursor_pos + 1:]
-        self._update_text_offset(font)
+        self._update_text_offset(glyph_atlas)
 
     def _get_selection_range(self) -> tuple[int, int]:
         """Get the start and end of the current selection (ordered)."""
@@ -312,14 +325,14 @@ class EditField(UIElement):
         if start != end:
             pg.scrap.put(SCRAP_TEXT, self.text[start:end].encode('utf-8'))
 
-    def _paste_from_clipboard(self, font):
+    def _paste_from_clipboard(self, glyph_atlas: GlyphAtlas):
         """Paste text from clipboard."""
         try:
             clipboard_text = pg.scrap.get(SCRAP_TEXT).decode('utf-8')
             if clipboard_text:
                 # Remove newlines and other problematic characters
                 clipboard_text = clipboard_text.replace('\n', '').replace('\r', '')
-                self._insert_text(clipboard_text, font)
+                self._insert_text(clipboard_text, glyph_atlas)
         except pg.error:
             pass  # Clipboard might not be available
 
@@ -355,22 +368,20 @@ class EditField(UIElement):
 
         # Create a subsurface for clipping
         clip_rect = screen.get_clip()
-        screen.set_clip(text_area)
+        screen.set_clip(clip_rect.clip(text_area))
 
         text_x = text_area.left - self.text_offset
         text_y = self.rect.centery
 
         # Draw selection highlight if there's a selection
-        font = render_context.get_font(self.font_name, self.font_size)
+        glyph_atlas = render_context.get_glyph_atlas(self.font_name, self.font_size)
+        prefix_widths = self._get_prefix_widths(glyph_atlas)
         if self.selection_start is not None and self.is_focused:
             start, end = self._get_selection_range()
             if start != end:
                 # Calculate selection rectangle
-                text_before_selection = self.text[:start]
-                selected_text = self.text[start:end]
-
-                before_width = font.size(text_before_selection)[0]
-                selection_width = font.size(selected_text)[0]
+                before_width = int(prefix_widths[start])
+                selection_width = int(prefix_widths[end]) - before_width
 
                 selection_rect = pg.Rect(
                     text_x + before_width,
@@ -382,16 +393,18 @@ class EditField(UIElement):
                 pg.draw.rect(screen, (100, 150, 200), selection_rect)
 
         # Render text or placeholder
+        text_surface = None
         if self.text:
-            text_surface = font.render(self.text, True, self.text_color)
-            text_rect = text_surface.get_rect(midleft=(text_x, text_y))
-            screen.blit(text_surface, text_rect)
+            text_surface = self._get_text_surface(self.text, self.text_color, render_context)
         elif not self.is_focused and self.placeholder:
             # Draw placeholder text in a dimmer color
             placeholder_color = (100, 100, 100)
-            placeholder_surface = font.render(self.placeholder, True, placeholder_color)
-            placeholder_rect = placeholder_surface.get_rect(midleft=(text_x, text_y))
-            screen.blit(placeholder_surface, placeholder_rect)
+            text_surface = self._get_text_surface(self.placeholder, placeholder_color, render_context)
+        if text_surface is not None:
+            # only the part of the text, that is scrolled into the text area, is blitted
+            text_rect = text_surface.get_rect(midleft=(text_x, text_y))
+            visible_area = pg.Rect(self.text_offset, 0, text_area.width, text_rect.height)
+            screen.blit(text_surface, (text_area.left, text_rect.top), visible_area)
 
         # Draw cursor if focused
         if self.is_focused:
@@ -400,8 +413,7 @@ class EditField(UIElement):
 
             if cursor_visible:
                 # Calculate cursor position
-                text_before_cursor = self.text[:self.cursor_pos]
-                cursor_x = text_x + font.size(text_before_cursor)[0]
+                cursor_x = text_x + int(prefix_widths[self.cursor_pos])
 
                 cursor_height = text_area.height
                 cursor_top = text_area.top
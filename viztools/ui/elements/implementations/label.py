@@ -35,10 +35,17 @@ class Label(UIElement):
 
         if self._text:
             if self._text_surface is None:
-                font = render_context.get_font(self.font_name, self.font_size)
-                self._text_surface = font.render(self._text, True, self.text_color)
+                self._text_surface = render_context.render_text(
+                    self._text, self.text_color, self.font_name, self.font_size
+                )
             rect = self.align.arrange_in_rect(self._text_surface.get_rect(), self.rect)
             screen.blit(self._text_surface, rect)
 
+    def render_state(self):
+        return self._text, self.align
+
+    def is_opaque(self) -> bool:
+        return self.bg_color is not None
+
     def update(self, render_context: RenderContext):
         pass
@@ -83,6 +83,12 @@ class Slider(UIElement):
         # Draw cursor
         pg.draw.rect(screen, self.cursor_color, cursor_rect)
 
+    def render_state(self):
+        return self.value, self.min_val, self.max_val, self.controlled, self.is_hovered
+
+    def is_opaque(self) -> bool:
+        return True
+
     def update(self, render_context: RenderContext):
         pass
 
@@ -0,0 +1,278 @@
+from typing import Optional, Dict, Union, Sequence, Any, List
+
+import numpy as np
+import pygame as pg
+
+from ..base_element import UIElement
+from viztools.text_rendering import GlyphAtlas, color_key
+from viztools.utils import RenderContext, Color, LRUCache
+
+# number of rendered rows, that are cached
+ROW_CACHE_SIZE = 256
+# space between the border of a cell and its text in pixels
+CELL_PADDING = 4
+# number of rows scrolled by one step of the mouse wheel
+SCROLL_ROWS = 3
+# fraction of the remaining scroll distance, that is scrolled every frame
+SCROLL_SMOOTHING = 0.35
+SCROLLBAR_WIDTH = 6
+
+ColumnData = Union[np.ndarray, Sequence[Any]]
+
+
+def format_cell(value: Any) -> str:
+    """
+    Converts the value of a cell into the displayed text.
+    """
+    if isinstance(value, (float, np.floating)):
+        return f'{value:.6g}'
+    return str(value)
+
+
+class Table(UIElement):
+    def __init__(
+            self, rect: pg.Rect, columns: Dict[str, ColumnData], column_widths: Optional[Sequence[int]] = None,
+            bg_color: Color = (30, 30, 30), alternate_color: Color = (38, 38, 38), header_color: Color = (60, 60, 60),
+            selected_color: Color = (70, 100, 140), border_color: Color = (100, 100, 100),
+            text_color: Color = (200, 200, 200), font_name: Optional[str] = None, font_size: int = -1,
+    ):
+        """
+        Table of column data, that is virtualized: only the visible rows are rendered, so the cost per frame does not
+        depend on the number of rows. Rendered rows are cached. Clicking a header sorts the table by that column,
+        clicking it again reverses the order. Clicking a row selects it.
+
+        :param rect: The rect of the table.
+        :param columns: Maps the name of every column to its values as numpy array or sequence. All columns must have
+            the same length.
+        :param column_widths: The widths of the columns in pixels. If None, the columns share the width of the table.
+        :param bg_color: The background color of the rows.
+        :param alternate_color: The background color of every second row.
+        :param header_color: The background color of the header.
+        :param selected_color: The background color of the selected row.
+        :param border_color: The color of the border and the scrollbar.
+        :param text_color: The color of the text.
+        :param font_name: The font to use. Defaults to the default font.
+        :param font_size: The size of the font. Defaults to the default font size.
+        """
+        super().__init__(rect)
+        self.bg_color = bg_color
+        self.alternate_color = alternate_color
+        self.header_color = header_color
+        self.selected_color = selected_color
+        self.border_color = border_color
+        self.text_color = text_color
+        self.border_width = 2
+        self.font_name = font_name
+        self.font_size = font_size
+
+        self.column_names: List[str] = []
+        self.columns: List[ColumnData] = []
+        self.column_widths = column_widths
+        self.order: np.ndarray = np.arange(0)  # data index of every displayed row
+        self.sort_column: Optional[int] = None
+        self.sort_descending: bool = False
+        self.selected_index: Optional[int] = None  # data index of the selected row
+        self.row_height: int = 0
+
+        self._scroll_offset: float = 0.0  # in pixels
+        self._scroll_target: float = 0.0
+        self._glyph_atlas: Optional[GlyphAtlas] = None
+        self._rows = LRUCache(max_items=ROW_CACHE_SIZE)
+        self._rows_key = None
+        self._version = 0
+        self.set_columns(columns)
+
+    def __len__(self):
+        return len(self.order)
+
+    def set_columns(self, columns: Dict[str, ColumnData]):
+        """
+        Replaces the data of the table. Sorting is kept, if there is a column with the same index.
+        """
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f'all columns must have the same length, got lengths {sorted(lengths)}.')
+        self.column_names = list(columns.keys())
+        self.columns = list(columns.values())
+        self.order = np.arange(lengths.pop() if lengths else 0)
+        self.selected_index = None
+        self._rows.clear()
+        self._version += 1
+        if self.sort_column is not None and self.sort_column < len(self.columns):
+            self.sort_by(self.sort_column, self.sort_descending)
+        else:
+            self.sort_column = None
+        self.scroll_to(self._scroll_target)
+
+    def sort_by(self, column: int, descending: bool = False):
+        """
+        Sorts the rows by the values of the given column. Sorting is stable.
+
+        :param column: The index of the column.
+        :param descending: If True, rows with bigger values are shown first.
+        """
+        values = np.asarray(self.columns[column])
+        if values.dtype == object:
+            values = np.array([format_cell(value) for value in values])
+        if descending:
+            # sorting the reversed values and reversing the result keeps equal values in their original order
+            self.order = np.flip(len(values) - 1 - np.argsort(np.flip(values), kind='stable'))
+        else:
+            self.order = np.argsort(values, kind='stable')
+        self.sort_column = column
+        self.sort_descending = descending
+        self._version += 1
+
+    def scroll_to(self, offset: float, smooth: bool = False):
+        """
+        Scrolls to the given offset in pixels, which is clamped to the height of the rows.
+
+        :param offset: The distance between the top of the first row and the top of the visible rows.
+        :param smooth: If True, the table scrolls to the offset over the next frames.
+        """
+        max_offset = max(len(self) * self.row_height - self._body_rect().height, 0)
+        self._scroll_target = max(0.0, min(float(offset), max_offset))
+        if not smooth:
+            self._scroll_offset = self._scroll_target
+
+    def _ensure_init(self, render_context: RenderContext):
+        if self._glyph_atlas is None:
+            self._glyph_atlas = render_context.get_glyph_atlas(self.font_name, self.font_size)
+            self.row_height = self._glyph_atlas.height + 2 * CELL_PADDING
+            self.scroll_to(self._scroll_target)
+
+    def _get_column_widths(self) -> List[int]:
+        if self.column_widths is not None:
+            return list(self.column_widths)
+        num_columns = max(len(self.columns), 1)
+        width = (self.rect.width - SCROLLBAR_WIDTH) // num_columns
+        return [width] * len(self.columns)
+
+    def _header_rect(self) -> pg.Rect:
+        return pg.Rect(self.rect.left, self.rect.top, self.rect.width, self.row_height)
+
+    def _body_rect(self) -> pg.Rect:
+        return pg.Rect(
+            self.rect.left, self.rect.top + self.row_height, self.rect.width, self.rect.height - self.row_height
+        )
+
+    def _column_at(self, x: int) -> Optional[int]:
+        column_x = self.rect.left
+        for column, width in enumerate(self._get_column_widths()):
+            if column_x <= x < column_x + width:
+                return column
+            column_x += width
+        return None
+
+    def handle_event(self, event: pg.event.Event, render_context: RenderContext):
+        super().handle_event(event, render_context)
+        self._ensure_init(render_context)
+
+        if event.type == pg.MOUSEWHEEL and self.is_hovered:
+            self.scroll_to(self._scroll_target - event.y * SCROLL_ROWS * self.row_height, smooth=True)
+
+        if event.type == pg.MOUSEBUTTONDOWN and event.button == 1 and self.rect.collidepoint(event.pos):
+            if self._header_rect().collidepoint(event.pos):
+                column = self._column_at(event.pos[0])
+                if column is not None:
+                    descending = column == self.sort_column and not self.sort_descending
+                    self.sort_by(column, descending)
+            else:
+                position = int((event.pos[1] - self._body_rect().top + self._scroll_offset) // self.row_height)
+                if 0 <= position < len(self):
+                    self.selected_index = int(self.order[position])
+
+    def update(self, render_context: RenderContext):
+        distance = self._scroll_target - self._scroll_offset
+        if abs(distance) < 0.5:
+            self._scroll_offset = self._scroll_target
+        else:
+            self._scroll_offset += distance * SCROLL_SMOOTHING
+
+    def render_state(self):
+        return round(self._scroll_offset), self._version, self.selected_index
+
+    def is_opaque(self) -> bool:
+        return True
+
+    def _get_row_surface(self, index: int) -> pg.Surface:
+        """
+        Returns the rendered texts of the row with the given data index on a transparent surface.
+        """
+        column_widths = self._get_column_widths()
+        rows_key = (tuple(column_widths), self._glyph_atlas, color_key(self.text_color))
+        if rows_key != self._rows_key:
+            self._rows.clear()
+            self._rows_key = rows_key
+        surface = self._rows.get(index)
+        if surface is None:
+            surface = pg.Surface((sum(column_widths), self.row_height), pg.SRCALPHA)
+            x = 0
+            for values, width in zip(self.columns, column_widths):
+                text_surface = self._glyph_atlas.render(format_cell(values[index]), self.text_color)
+                area = pg.Rect(0, 0, width - 2 * CELL_PADDING, self.row_height)
+                surface.blit(text_surface, (x + CELL_PADDING, CELL_PADDING), area)
+                x += width
+            self._rows.put(index, surface)
+        return surface
+
+    def draw(self, screen: pg.Surface, render_context: RenderContext):
+        self._ensure_init(render_context)
+        pg.draw.rect(screen, self.bg_color, self.rect)
+        clip_rect = screen.get_clip()
+
+        # visible rows
+        body_rect = self._body_rect()
+        screen.set_clip(clip_rect.clip(body_rect))
+        scroll_offset = round(self._scroll_offset)
+        first_position = scroll_offset // self.row_height
+        num_visible = body_rect.height // self.row_height + 2
+        y = body_rect.top - scroll_offset % self.row_height
+        blits = []
+        for position in range(first_position, min(first_position + num_visible, len(self))):
+            index = int(self.order[position])
+            row_rect = pg.Rect(body_rect.left, y, body_rect.width, self.row_height)
+            if index == self.selected_index:
+                pg.draw.rect(screen, self.selected_color, row_rect)
+            elif position % 2 == 1:
+                pg.draw.rect(screen, self.alternate_color, row_rect)
+            blits.append((self._get_row_surface(index), row_rect.topleft))
+            y += self.row_height
+        screen.blits(blits, doreturn=False)
+
+        # scrollbar
+        content_height = len(self) * self.row_height
+        if content_height > body_rect.height > 0:
+            thumb_height = max(body_rect.height * body_rect.height // content_height, SCROLLBAR_WIDTH)
+            thumb_top = body_rect.top + (body_rect.height - thumb_height) * scroll_offset // max(
+                content_height - body_rect.height, 1
+            )
+            thumb_rect = pg.Rect(body_rect.right - SCROLLBAR_WIDTH - 2, thumb_top, SCROLLBAR_WIDTH, thumb_height)
+            pg.draw.rect(screen, self.border_color, thumb_rect)
+
+        # header
+        header_rect = self._header_rect()
+        screen.set_clip(clip_rect.clip(header_rect))
+        pg.draw.rect(screen, self.header_color, header_rect)
+        x = header_rect.left
+        for column, (name, width) in enumerate(zip(self.column_names, self._get_column_widths())):
+            text_surface = render_context.render_text(name, self.text_color, self.font_name, self.font_size)
+            area = pg.Rect(0, 0, width - 3 * CELL_PADDING - self.row_height // 3, self.row_height)
+            screen.blit(text_surface, (x + CELL_PADDING, header_rect.top + CELL_PADDING), area)
+            if column == self.sort_column:
+                self._draw_sort_marker(screen, x + width - CELL_PADDING - self.row_height // 3, header_rect.centery)
+            x += width
+            pg.draw.line(screen, self.border_color, (x - 1, header_rect.top), (x - 1, header_rect.bottom - 1))
+
+        screen.set_clip(clip_rect)
+        pg.draw.rect(screen, self.border_color, self.rect, self.border_width)
+
+    def _draw_sort_marker(self, screen: pg.Surface, left: int, center_y: int):
+        """
+        Draws a triangle pointing up for ascending and down for descending sorting.
+        """
+        size = self.row_height // 3
+        base_y, tip_y = center_y + size // 2, center_y - size // 2
+        if self.sort_descending:
+            base_y, tip_y = tip_y, base_y
+        pg.draw.polygon(screen, self.text_color, [(left, base_y), (left + size, base_y), (left + size // 2, tip_y)])
@@ -1,11 +1,22 @@
-from typing import Optional, Tuple, List, Union, Iterable
+import itertools
+from typing import Optional, Tuple, List, Union, Iterable, Iterator
 
 import pygame as pg
 
 from ..base_element import UIElement
-from viztools.utils import RenderContext, Color
+from ..edit_history import EditHistory, TextEdit, TextPosition
+from ..line_index import LineIndex
+import numpy as np
+
+from viztools.render_scheduler import PRIORITY_VISIBLE
+from viztools.text_rendering import GlyphAtlas, char_index_at
+from viztools.utils import RenderContext, Color, LRUCache
 
 SCRAP_TEXT = 'text/plain;charset=utf-8'
+# number of paragraphs, whose character positions are cached
+PREFIX_WIDTHS_CACHE_SIZE = 1024
+# number of lines read from the stream in one step of load_text()
+LOAD_STEP_LINES = 256
 
 
 '''
@@ -71,25 +82,34 @@ class Line:
         # return f'Line({len(self.paragraphs)} paragraphs, {self.num_chars()} chars)'
         return str(self.paragraphs)
 
+    def text(self) -> str:
+        """
+        Returns the text of the line without wrapping.
+        """
+        return ' '.join(self.paragraphs)
+
     def get_line_char_index(self, paragraph_index: int, char_index: int) -> int:
         """
         Returns the character index, if all paragraphs would be in a single string.
         """
         return sum(len(p) + 1 for p in self.paragraphs[:paragraph_index]) + char_index
 
-    def auto_wrap_and_norm_cursor(self, font: pg.font.Font, max_width: int, cursor: Cursor):
+    def auto_wrap_and_norm_cursor(
+            self, glyph_atlas: GlyphAtlas, max_width: int, cursor: Cursor, edited_paragraph_index: Optional[int] = None
+    ):
         """
         Wraps the line to fit within the given max width.
 
-        :param font: The font to use for wrapping.
+        :param glyph_atlas: The glyph atlas of the font to use for wrapping.
         :param max_width: The maximum width to wrap the line to.
         :param cursor: A cursor object, that will be handled correctly, if wrapping occurs at the cursor position. It is
             assumed, that the cursor points to the current line.
+        :param edited_paragraph_index: The only paragraph, that changed since the last wrap (see auto_wrap()).
         :returns: The given cursor. If a wrap happens the returned cursor will point to the same character possibly in
             a different paragraph.
         """
         line_char_index = self.get_line_char_index(cursor.paragraph_index, cursor.char_index)
-        self.auto_wrap(font, max_width)
+        self.auto_wrap(glyph_atlas, max_width, edited_paragraph_index)
         new_cursor = Cursor(cursor.line_index, cursor.paragraph_index, line_char_index)
         new_cursor.paragraph_index, new_cursor.char_index = self.get_paragraph_char_index(line_char_index)
         return new_cursor
@@ -109,33 +129,53 @@ class Line:
             word_list.extend(p.split(' '))
         return word_list
 
-    def auto_wrap(self, font: pg.font.Font, max_width: int):
-        words = self.word_list()
-        current_line = ''
-        new_paragraphs = []
+    def auto_wrap(self, glyph_atlas: GlyphAtlas, max_width: int, edited_paragraph_index: Optional[int] = None):
+        """
+        Wraps the line at word boundaries, so that every paragraph fits within the given max width. The width of a
+        paragraph is computed from the cached widths of its words.
 
-        for word in words:
-            # Test if adding this word would exceed max width
-            test_line = current_line + (" " if current_line else "") + word
-            test_width = font.size(test_line)[0]
+        :param glyph_atlas: The glyph atlas of the font to use for wrapping.
+        :param max_width: The maximum width to wrap the line to.
+        :param edited_paragraph_index: If given, the line is assumed to be wrapped already except for this paragraph.
+            Wrapping then starts at the paragraph before the edited one and stops at the first paragraph after it, that
+            starts with the same word as before, because all following paragraphs would be wrapped the same way again.
+        """
+        first_index = 0 if edited_paragraph_index is None else max(edited_paragraph_index - 1, 0)
+        space_width = glyph_atlas.word_widths([' '])[0]
+        new_paragraphs = self.paragraphs[:first_index]
+        current_words: List[str] = []
+        current_width = 0
+
+        for paragraph_index in range(first_index, len(self.paragraphs)):
+            words = self.paragraphs[paragraph_index].split(' ')
+            can_stop = edited_paragraph_index is not None and paragraph_index > edited_paragraph_index
+            for word_index, (word, word_width) in enumerate(zip(words, glyph_atlas.word_widths(words))):
+                if current_words:
+                    if current_width + space_width + word_width <= max_width:
+                        # Word fits on current line
+                        current_words.append(word)
+                        current_width += space_width + word_width
+                        continue
+                    # Word doesn't fit, save current line and start new one
+                    new_paragraphs.append(' '.join(current_words))
+                    current_words = []
+
+                if can_stop and word_index == 0:
+                    # the new paragraph starts where an unchanged paragraph started before
+                    new_paragraphs.extend(self.paragraphs[paragraph_index:])
+                    self.paragraphs = new_paragraphs
+                    return
 
-            if test_width <= max_width:
-                # Word fits on current line
-                current_line = test_line
-            else:
-                # Word doesn't fit
-                if current_line:
-                    # Save current line and start new one
-                    new_paragraphs.append(current_line)
-                    current_line = word
+                if word_width <= max_width:
+                    current_words = [word]
+                    current_width = word_width
                 else:
                     # Single word is too long, force it on its own line
                     new_paragraphs.append(word)
-                    current_line = ""
 
         # Add the last line of this paragraph
-        if current_line:
-            new_paragraphs.append(current_line)
+        if current_words:
+            new_paragraphs.append(' '.join(current_words))
 
         self.paragraphs = new_paragraphs
         self.ensure_paragraph()
@@ -153,14 +193,9 @@ class Line:
         """
         Splits the current line at the given paragraph and character index. Returns the two resulting lines.
         """
-        left_paragraphs = self.paragraphs[:paragraph_index]
-        right_paragraphs = self.paragraphs[paragraph_index+1:]
-        middle_paragraph = self.paragraphs[paragraph_index]
-        left_part = ' ' + middle_paragraph[:split_index]
-        right_part = middle_paragraph[split_index:] + ' '
-        left_paragraphs.append(left_part)
-        right_paragraphs.insert(0, right_part)
-        return Line(''.join(left_paragraphs)), Line(''.join(right_paragraphs))
+        text = self.text()
+        line_char_index = self.get_line_char_index(paragraph_index, split_index)
+        return Line(text[:line_char_index]), Line(text[line_char_index:])
 
     @staticmethod
     def _remove_from_paragraph(paragraph: str, start: int, end: int) -> str:
@@ -185,9 +220,8 @@ class Line:
             after_end = self.paragraphs[end.paragraph_index+1:]
 
         new_paragraphs = before_start
-        middle_paragraph = last_after_start[:start.char_index] + first_before_end[end.char_index:]
-        if middle_paragraph:
-            new_paragraphs.append(middle_paragraph)
+        # the middle paragraph is kept, even if it is empty, to keep the space in front of it
+        new_paragraphs.append(last_after_start[:start.char_index] + first_before_end[end.char_index:])
         new_paragraphs.extend(after_end)
         self.paragraphs = new_paragraphs
         self.ensure_paragraph()
@@ -211,6 +245,8 @@ class TextField(UIElement):
     ):
         super().__init__(rect)
         self.lines: List[Line] = []
+        # number of paragraphs of every line, has to be updated, whenever lines are wrapped, added or removed
+        self._line_index = LineIndex()
         self.placeholder = placeholder
 
         self.bg_color = bg_color
@@ -226,22 +262,77 @@ class TextField(UIElement):
         self.is_focused: bool = False  # Whether the field is focused
         self.mouse_down: bool = False  # For tracking drag selection
         self.scroll_offset: int = 0  # Vertical scroll offset (in lines)
+        self.history = EditHistory()
+        self._record_edits: bool = True  # False while undoing or redoing
 
         self.font: Optional[pg.font.Font] = None
+        self.glyph_atlas: Optional[GlyphAtlas] = None
+        self._prefix_widths = LRUCache(max_items=PREFIX_WIDTHS_CACHE_SIZE)
         self.font_name = font_name
         self.font_size = font_size
         self.line_height = None
         self._start_text = text
+        self._load_stream: Optional[Iterator[str]] = None
 
     def _ensure_init(self, render_context: RenderContext):
         if self.font is None:
             self.font = render_context.get_font(self.font_name, self.font_size)
+            self.glyph_atlas = render_context.get_glyph_atlas(self.font_name, self.font_size)
             self.line_height = self.font.get_height()
-            self.set_text(self._start_text)
+            self._set_lines(self._start_text)
 
     def set_text(self, text: str):
+        """
+        Replaces the text of the text field. Stops loading text started by load_text().
+        """
+        self._set_lines(text)
+        self._load_stream = None
+
+    def _set_lines(self, text: str):
         self.lines = [Line(l) for l in text.split('\n')]
         self._wrap_text()
+        self.cursor = self._clamp_cursor(self.cursor)
+        self.selection_start = None
+        self.history.clear()
+
+    def load_text(self, stream: Iterable[str]):
+        """
+        Replaces the text of the text field with the text of the given stream. The stream is read incrementally as
+        progressive work of the render scheduler, so loading big files does not block the frame. The text field can be
+        used, while the text is loaded.
+
+        :param stream: An iterable over the lines of the text, for example an opened text file. Lines contain their
+            line endings.
+        """
+        self._start_text = ''
+        if self.font is not None:
+            self._set_lines('')
+        self._load_stream = iter(stream)
+
+    def is_loading(self) -> bool:
+        """
+        Returns True, if text of load_text() is still being loaded.
+        """
+        return self._load_stream is not None
+
+    def _load_step(self) -> Optional[float]:
+        """
+        Appends the next lines of the loaded stream to the text. The cursor and the selection keep their positions.
+        """
+        if self._load_stream is None:
+            return None
+        text = ''.join(itertools.islice(self._load_stream, LOAD_STEP_LINES))
+        if not text:
+            self._load_stream = None
+            return None
+        cursor_position = self._get_text_position(self.cursor)
+        selection_position = None if self.selection_start is None else self._get_text_position(self.selection_start)
+        end_line_index = len(self.lines) - 1
+        self._splice_text((end_line_index, len(self.lines[end_line_index].text())), text.replace('\r\n', '\n'))
+        self.cursor = self._cursor_from_text_position(cursor_position)
+        if selection_position is not None:
+            self.selection_start = self._cursor_from_text_position(selection_position)
+        return PRIORITY_VISIBLE
 
     def get_text(self) -> str:
         paragraphs = []
@@ -265,11 +356,19 @@ class TextField(UIElement):
         Wrap text to fit within max_width, breaking at word boundaries.
         """
         max_width = self.rect.width - 2 * self.padding
+        self._measure_words(self.lines)
         for line_index, line in enumerate(self.lines):
             if line_index == self.cursor.line_index:
-                self.cursor = line.auto_wrap_and_norm_cursor(self.font, max_width, self.cursor)
+                self.cursor = line.auto_wrap_and_norm_cursor(self.glyph_atlas, max_width, self.cursor)
             else:
-                line.auto_wrap(self.font, max_width)
+                line.auto_wrap(self.glyph_atlas, max_width)
+        self._line_index.rebuild(line.num_paragraphs() for line in self.lines)
+
+    def _measure_words(self, lines: List[Line]):
+        """
+        Measures the words of all given lines in one batch, so wrapping the lines only looks up cached word widths.
+        """
+        self.glyph_atlas.word_widths([word for line in lines for word in line.word_list()])
 
     def _cursor_from_mouse_pos(self, mouse_pos: Tuple[int, int]) -> Optional[Cursor]:
         """Calculate the character index in text based on mouse position."""
@@ -291,39 +390,57 @@ class TextField(UIElement):
         line = self.lines[line_index]
         paragraph = line.paragraphs[paragraph_index]
 
-        # Find which paragraph the click is in based on X position
-        for num_chars in range(len(paragraph) + 1):
-            text = paragraph[:num_chars]
-            paragraph_width = self.font.size(text)[0]
-            if paragraph_width > rel_x:
-                # TODO: num_chars + 1?
-                return Cursor(line_index, paragraph_index, num_chars)
+        # Find the character boundary closest to the X position
+        char_index = char_index_at(self._get_prefix_widths(paragraph), rel_x)
+        return Cursor(line_index, paragraph_index, char_index)
 
-        # If click is past all paragraphs, return end of last paragraph
-        return Cursor(line_index, paragraph_index, len(paragraph))
+    def _get_prefix_widths(self, paragraph: str) -> np.ndarray:
+        """
+        Returns the x-positions of all characters of the given paragraph (see GlyphAtlas.prefix_widths()). Positions
+        are cached by the content of the paragraph, so they are computed again after the paragraph was edited.
+        """
+        prefix_widths = self._prefix_widths.get(paragraph)
+        if prefix_widths is None:
+            prefix_widths = self.glyph_atlas.prefix_widths(paragraph)
+            self._prefix_widths.put(paragraph, prefix_widths)
+        return prefix_widths
 
     def _get_view_line_pos(self, cursor: Cursor) -> int:
-        view_line_pos = 0
-        for line in self.lines[:cursor.line_index]:
-            view_line_pos += line.num_paragraphs()
-        return view_line_pos + cursor.paragraph_index
+        return self._line_index.prefix_sum(cursor.line_index) + cursor.paragraph_index
 
     def _get_num_paragraphs(self) -> int:
-        return sum(l.num_paragraphs() for l in self.lines)
+        return self._line_index.total()
+
+    def _iter_visible_paragraphs(self, visible_height: int) -> Iterable[Tuple[int, int]]:
+        """
+        Iterates over (line_index, paragraph_index) of the paragraphs, that are visible from the scroll offset on.
+
+        :param visible_height: The height of the visible area in pixels.
+        """
+        start = self._get_line_and_paragraph_by_y(0)
+        if start is None:
+            return
+        line_index, paragraph_index = start
+        num_visible = -(-visible_height // self.line_height)
+        while num_visible > 0 and line_index < len(self.lines):
+            yield line_index, paragraph_index
+            num_visible -= 1
+            paragraph_index += 1
+            if paragraph_index >= self.lines[line_index].num_paragraphs():
+                line_index += 1
+                paragraph_index = 0
 
     def _get_line_and_paragraph_by_y(self, ypos: int) -> Optional[Tuple[int, int]]:
-        view_line_index = self.scroll_offset + ypos // self.line_height
+        view_line_index = max(self.scroll_offset + ypos // self.line_height, 0)
 
-        start_line_index = 0
-        for line_index, line in enumerate(self.lines):
-            end_line_index = start_line_index + line.num_paragraphs()
-            if view_line_index < end_line_index:
-                paragraph_index = view_line_index - start_line_index
-                return line_index, paragraph_index
-            start_line_index = end_line_index
+        line_index, paragraph_index = self._line_index.find(view_line_index)
+        if line_index >= len(self.lines):
+            # out of region
+            return None
+        return line_index, paragraph_index
 
-        # out of region
-        return None
+    def has_focus(self) -> bool:
+        return self.is_focused
 
     def handle_event(self, event: pg.event.Event, render_context: RenderContext):
         super().handle_event(event, render_context)
@@ -334,6 +451,8 @@ class TextField(UIElement):
         if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
             if self.is_hovered:
                 self.is_focused = True
+                # typing after a click starts a new undo step
+                self.history.break_coalescing()
                 cursor = self._cursor_from_mouse_pos(event.pos)
                 if cursor is not None:
                     self.cursor = cursor
@@ -395,6 +514,13 @@ class TextField(UIElement):
                     self._paste_from_clipboard()
                 elif event.key == pg.K_x and ctrl_pressed:
                     self._cut_to_clipboard()
+                elif event.key == pg.K_z and ctrl_pressed:
+                    if shift_pressed:
+                        self.redo()
+                    else:
+                        self.undo()
+                elif event.key == pg.K_y and ctrl_pressed:
+                    self.redo()
                 elif event.unicode and event.unicode.isprintable():
                     self._insert_text(event.unicode)
 
@@ -409,18 +535,80 @@ class TextField(UIElement):
         else:
             raise ValueError(f"Invalid cursor type: {type(cursor)}")
 
+    def _get_text_position(self, cursor: Cursor) -> TextPosition:
+        """
+        Returns the position of the cursor as (line_index, char_index), that does not depend on wrapping.
+        """
+        return cursor.line_index, self._get_line(cursor).get_line_char_index(cursor.paragraph_index, cursor.char_index)
+
+    def _cursor_from_text_position(self, position: TextPosition) -> Cursor:
+        line_index, line_char_index = position
+        return Cursor(line_index, *self.lines[line_index].get_paragraph_char_index(line_char_index))
+
+    def _get_text_range(self, start: TextPosition, end: TextPosition) -> str:
+        """
+        Returns the text between both positions. Lines are separated by newlines.
+        """
+        if start[0] == end[0]:
+            return self.lines[start[0]].text()[start[1]:end[1]]
+        texts = [self.lines[start[0]].text()[start[1]:]]
+        texts.extend(line.text() for line in self.lines[start[0] + 1:end[0]])
+        texts.append(self.lines[end[0]].text()[:end[1]])
+        return '\n'.join(texts)
+
+    def _record_edit(self, edit: TextEdit):
+        if self._record_edits and edit.text:
+            self.history.record(edit)
+
+    def undo(self):
+        """
+        Reverts the last edit.
+        """
+        self._apply_edit(self.history.undo())
+
+    def redo(self):
+        """
+        Applies the last reverted edit again.
+        """
+        self._apply_edit(self.history.redo())
+
+    def _apply_edit(self, edit: Optional[TextEdit]):
+        """
+        Applies the given edit without recording it and places the cursor at the end of the edit.
+        """
+        if edit is None:
+            return
+        self._record_edits = False
+        self.selection_start = None
+        try:
+            if edit.is_insertion:
+                self.cursor = self._cursor_from_text_position(edit.position)
+                self._insert_lines(edit.text)
+            else:
+                self._delete(
+                    self._cursor_from_text_position(edit.position), self._cursor_from_text_position(edit.end())
+                )
+        finally:
+            self._record_edits = True
+        self._update_scroll()
+
     def _create_newline(self):
-        """Split a line into two."""
+        """Replace the selection with a line break, that splits the line into two."""
+        self._delete_selection()
+        self.selection_start = None
         line_index = self.cursor.line_index
+        self._record_edit(TextEdit(self._get_text_position(self.cursor), '\n', is_insertion=True))
         orig_line = self.lines[line_index]
         left_line, right_line = orig_line.split(self.cursor.paragraph_index, self.cursor.char_index)
 
         max_width = self.rect.width - 2 * self.padding
-        left_line.auto_wrap(self.font, max_width)
-        right_line.auto_wrap(self.font, max_width)
+        left_line.auto_wrap(self.glyph_atlas, max_width)
+        right_line.auto_wrap(self.glyph_atlas, max_width)
 
         self.lines[line_index] = left_line
         self.lines.insert(line_index + 1, right_line)
+        self._line_index.set(line_index, left_line.num_paragraphs())
+        self._line_index.insert(line_index + 1, [right_line.num_paragraphs()])
 
         self.cursor = Cursor(line_index + 1, 0, 0)
 
@@ -517,19 +705,62 @@ class TextField(UIElement):
         self._delete_selection()
 
         # insert text
+        self._record_edit(TextEdit(self._get_text_position(self.cursor), char, is_insertion=True))
         paragraph = self._get_paragraph(self.cursor)
         paragraph = paragraph[:self.cursor.char_index] + char + paragraph[self.cursor.char_index:]
         line = self.lines[self.cursor.line_index]
         line.paragraphs[self.cursor.paragraph_index] = paragraph
+        self.cursor.char_index += len(char)
 
-        # wrap line
-        self._wrap_text()
+        # wrap only the edited line
+        max_width = self.rect.width - 2 * self.padding
+        self.cursor = line.auto_wrap_and_norm_cursor(
+            self.glyph_atlas, max_width, self.cursor, edited_paragraph_index=self.cursor.paragraph_index
+        )
+        self._line_index.set(self.cursor.line_index, line.num_paragraphs())
+        self.selection_start = None
+        self._update_scroll()
 
-        # handle cursor
-        self.cursor.char_index += len(char)
+    def _insert_lines(self, text: str):
+        """
+        Insert text, that can contain newlines, at the cursor position. All new lines are inserted at once and wrapped
+        in one batch.
+        """
+        if '\n' not in text:
+            self._insert_text(text)
+            return
+        self._delete_selection()
+        position = self._get_text_position(self.cursor)
+        self._record_edit(TextEdit(position, text, is_insertion=True))
+        self.cursor = self._cursor_from_text_position(self._splice_text(position, text))
         self.selection_start = None
         self._update_scroll()
 
+    def _splice_text(self, position: TextPosition, text: str) -> TextPosition:
+        """
+        Inserts text, that can contain newlines, at the given position without recording it in the history. The line at
+        the position is replaced by all new lines at once.
+
+        :return: The position after the inserted text.
+        """
+        line_index, line_char_index = position
+        line_text = self.lines[line_index].text()
+        texts = text.split('\n')
+        end_char_index = len(texts[-1])
+        texts[0] = line_text[:line_char_index] + texts[0]
+        texts[-1] += line_text[line_char_index:]
+        new_lines = [Line(t) for t in texts]
+
+        max_width = self.rect.width - 2 * self.padding
+        self._measure_words(new_lines)
+        for line in new_lines:
+            line.auto_wrap(self.glyph_atlas, max_width)
+
+        self.lines[line_index:line_index + 1] = new_lines
+        self._line_index.set(line_index, new_lines[0].num_paragraphs())
+        self._line_index.insert(line_index + 1, [line.num_paragraphs() for line in new_lines[1:]])
+        return line_index + len(new_lines) - 1, end_char_index
+
     def _move_my_cursor_vertical(self, direction: int, select: bool = False):
         """Move the cursor vertically in the direction given by the given direction."""
         self._save_selection_start(select)
@@ -573,6 +804,8 @@ class TextField(UIElement):
         self._update_scroll()
 
     def _save_selection_start(self, select: bool):
+        # called before every cursor movement, typing after moving the cursor starts a new undo step
+        self.history.break_coalescing()
         if select:
             if self.selection_start is None:
                 self.selection_start = self.cursor.copy()
@@ -615,7 +848,6 @@ class TextField(UIElement):
             target_cursor = self.cursor.copy()
             self._move_cursor(target_cursor, direction, jump_words)
             self._delete(self.cursor, target_cursor)
-            self.cursor = min(target_cursor, self.cursor)
 
     def _get_selection_range(self) -> Tuple[Cursor, Cursor]:
         """Get the start and end of the current selection (ordered)."""
@@ -628,7 +860,6 @@ class TextField(UIElement):
         start, end = self._get_selection_range()
         if start != end:
             self._delete(start, end)
-            self.cursor = start
             self.selection_start = None
             return True
         return False
@@ -638,31 +869,37 @@ class TextField(UIElement):
         if end < start:
             start, end = end, start
         max_width = self.rect.width - 2 * self.padding
+        start_position = self._get_text_position(start)
+        end_position = self._get_text_position(end)
+        self._record_edit(
+            TextEdit(start_position, self._get_text_range(start_position, end_position), is_insertion=False)
+        )
 
         if start.line_index == end.line_index:
             line = self._get_line(start)
             line.delete(start, end)
-            line.auto_wrap(self.font, max_width)
+            line.auto_wrap(self.glyph_atlas, max_width, edited_paragraph_index=start.paragraph_index)
+            self._line_index.set(start.line_index, line.num_paragraphs())
         else:
             new_lines = self.lines[:start.line_index].copy()
 
-            last_start_line = self.lines[start.line_index]
-            last_start_line.delete(start, last_start_line.end())
-
-            first_end_line = self.lines[end.line_index]
-            first_end_line.delete((0, 0), end)
-
-            middle_line = Line(last_start_line.paragraphs + first_end_line.paragraphs)
-            middle_line.ensure_paragraph()
-            middle_line.auto_wrap(self.font, max_width)
+            # join the text before the start and the text after the end without a space in between
+            start_text = self.lines[start.line_index].text()[:start_position[1]]
+            end_text = self.lines[end.line_index].text()[end_position[1]:]
+            middle_line = Line(start_text + end_text)
+            middle_line.auto_wrap(self.glyph_atlas, max_width)
             new_lines.append(middle_line)
 
             new_lines.extend(self.lines[end.line_index + 1:])
             self.lines = new_lines
-        self.cursor = self._clamp_cursor(start)
+            self._line_index.delete(start.line_index + 1, end.line_index + 1)
+            self._line_index.set(start.line_index, middle_line.num_paragraphs())
+        # wrapping can move the start into another paragraph
+        self.cursor = self._cursor_from_text_position(start_position)
 
     def _select_all(self):
         """Select all text."""
+        self.history.break_coalescing()
         self.selection_start = Cursor(0, 0, 0)
         self.cursor = self.end_cursor()
 
@@ -693,20 +930,19 @@ class TextField(UIElement):
         try:
             clipboard_text = pg.scrap.get(SCRAP_TEXT).decode('utf-8')
             if clipboard_text:
-                clipboard_text = clipboard_text.split('\n')
-                for i, line in enumerate(clipboard_text):
-                    if i == 0:
-                        self._insert_text(clipboard_text[0])
-                    elif i == len(clipboard_text) - 1:
-                        self._create_newline()
-                        self._insert_text(line)
+                # a paste is an undo step of its own
+                self.history.break_coalescing()
+                self._insert_lines(clipboard_text)
+                self.history.break_coalescing()
         except pg.error:
             pass
 
     def _cut_to_clipboard(self):
         """Cut selected text to clipboard."""
         self._copy_to_clipboard()
+        self.history.break_coalescing()
         self._delete_selection()
+        self.history.break_coalescing()
 
     def draw(self, screen: pg.Surface, render_context: RenderContext):
         self._ensure_init(render_context)
@@ -734,23 +970,25 @@ class TextField(UIElement):
 
         # Set clipping region
         clip_rect = screen.get_clip()
-        screen.set_clip(text_area)
+        screen.set_clip(clip_rect.clip(text_area))
 
-        # Draw text or placeholder
+        # Draw only the paragraphs in the visible area, starting at the scroll offset. Rendered paragraphs are cached
+        # in the text cache by their content, so edited paragraphs are rendered again.
         y_pos = text_area.top + self.padding
         selection_start, selection_end = self._get_selection_range()
-        for line_index, line in enumerate(self.lines):
-            for paragraph_index, paragraph in enumerate(line.paragraphs):
-                self._draw_selection(
-                    line_index, paragraph, paragraph_index, screen, selection_end, selection_start, text_area, y_pos
-                )
-
-                text_surface = self.font.render(paragraph, True, self.text_color)
+        for line_index, paragraph_index in self._iter_visible_paragraphs(text_area.bottom - y_pos):
+            paragraph = self.lines[line_index].paragraphs[paragraph_index]
+            self._draw_selection(
+                line_index, paragraph, paragraph_index, screen, selection_end, selection_start, text_area, y_pos
+            )
+
+            if paragraph:
+                text_surface = render_context.render_text(paragraph, self.text_color, self.font_name, self.font_size)
                 screen.blit(text_surface, (text_area.left, y_pos))
 
-                self.draw_cursor(screen, line_index, paragraph, paragraph_index, y_pos, text_area)
+            self.draw_cursor(screen, line_index, paragraph, paragraph_index, y_pos, text_area)
 
-                y_pos += self.line_height
+            y_pos += self.line_height
 
         # Restore clip rect
         screen.set_clip(clip_rect)
@@ -775,8 +1013,9 @@ class TextField(UIElement):
         if selection_end.line_index == line_index and selection_end.paragraph_index == paragraph_index:
             end_char_index = selection_end.char_index
 
-        highlight_offset = self.font.size(paragraph[:start_char_index])[0]
-        highlight_width = self.font.size(paragraph[start_char_index:end_char_index])[0]
+        prefix_widths = self._get_prefix_widths(paragraph)
+        highlight_offset = int(prefix_widths[start_char_index])
+        highlight_width = int(prefix_widths[end_char_index]) - highlight_offset
         selection_rect = pg.Rect(
             text_area.left + highlight_offset, y_pos,
             highlight_width, self.line_height
@@ -791,8 +1030,10 @@ class TextField(UIElement):
             cursor_visible = (pg.time.get_ticks() // 500) % 2 == 0
             if cursor_visible:
                 if self.cursor.line_index == line_index and self.cursor.paragraph_index == paragraph_index:
-                    x_pos = text_area.left + self.font.size(paragraph[:self.cursor.char_index])[0]
+                    x_pos = text_area.left + int(self._get_prefix_widths(paragraph)[self.cursor.char_index])
                     pg.draw.line(screen, self.text_color, (x_pos, y_pos), (x_pos, y_pos + self.line_height), 2)
 
     def update(self, render_context: RenderContext):
-        pass
+        if self._load_stream is not None:
+            self._ensure_init(render_context)
+            render_context.scheduler.schedule_progressive(self._load_step, PRIORITY_VISIBLE)
@@ -0,0 +1,114 @@
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+
+class LineIndex:
+    """
+    Prefix sums over the number of wrapped paragraphs of every line in a TextField, stored in a Fenwick tree. Maps
+    between line indices and the position of a paragraph in the view in O(log n). Changing the count of a line is
+    O(log n), inserting or removing lines rebuilds the tree in O(n) with numpy. Only appending lines is O(log n).
+    """
+    def __init__(self, counts: Iterable[int] = ()):
+        """
+        Creates a new LineIndex.
+
+        :param counts: The number of paragraphs of every line.
+        """
+        self._counts: List[int] = []
+        self._tree: List[int] = [0]
+        self.rebuild(counts)
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def rebuild(self, counts: Iterable[int]):
+        """
+        Replaces all counts.
+        """
+        counts = np.fromiter(counts, dtype=np.int64)
+        prefix_sums = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=prefix_sums[1:])
+        # node i of the tree holds the sum of the counts in (i - lowbit(i), i]
+        nodes = np.arange(1, len(counts) + 1)
+        tree = prefix_sums[nodes] - prefix_sums[nodes - (nodes & -nodes)]
+        self._counts = counts.tolist()
+        self._tree = [0] + tree.tolist()
+        self._total = int(prefix_sums[-1])
+
+    def total(self) -> int:
+        """
+        The sum of all counts.
+        """
+        return self._total
+
+    def get(self, index: int) -> int:
+        return self._counts[index]
+
+    def set(self, index: int, count: int):
+        """
+        Sets the count of the line at the given index.
+        """
+        difference = count - self._counts[index]
+        if difference == 0:
+            return
+        self._counts[index] = count
+        self._total += difference
+        tree = self._tree
+        node = index + 1
+        while node < len(tree):
+            tree[node] += difference
+            node += node & -node
+
+    def insert(self, index: int, counts: Iterable[int]):
+        """
+        Inserts lines with the given counts before the given index. Appending lines at the end is O(log n) per line.
+        """
+        if index == len(self._counts):
+            for count in counts:
+                # the new node holds the sum of the counts in (node - lowbit(node), node]
+                node = len(self._counts) + 1
+                self._tree.append(self.prefix_sum(node - 1) - self.prefix_sum(node - (node & -node)) + count)
+                self._counts.append(count)
+                self._total += count
+            return
+        self.rebuild(self._counts[:index] + list(counts) + self._counts[index:])
+
+    def delete(self, start: int, end: int):
+        """
+        Removes the lines from start to end (exclusive).
+        """
+        self.rebuild(self._counts[:start] + self._counts[end:])
+
+    def prefix_sum(self, index: int) -> int:
+        """
+        Returns the sum of the counts of all lines before the given index.
+        """
+        tree = self._tree
+        result = 0
+        node = min(index, len(self._counts))
+        while node > 0:
+            result += tree[node]
+            node -= node & -node
+        return result
+
+    def find(self, position: int) -> Tuple[int, int]:
+        """
+        Finds the line containing the given position.
+
+        :param position: A position between 0 and total() (exclusive).
+        :return: The index of the line and the position relative to the first paragraph of that line. If position is
+            out of range, (len(self), position - total()) is returned.
+        """
+        if position < 0 or position >= self._total:
+            return len(self._counts), position - self._total
+        tree = self._tree
+        node = 0
+        step = 1 << (len(self._counts).bit_length() - 1)
+        while step > 0:
+            next_node = node + step
+            if next_node < len(tree) and tree[next_node] <= position:
+                node = next_node
+                position -= tree[next_node]
+            step >>= 1
+        return node, position
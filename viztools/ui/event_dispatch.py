@@ -0,0 +1,145 @@
+from typing import List, Sequence, Dict, Tuple, Set, Optional
+
+import pygame as pg
+
+from viztools.ui.elements.base_element import UIElement
+from viztools.utils import RenderContext
+
+# size of the grid cells used to find the elements at a position in pixels
+DEFAULT_CELL_SIZE = 64
+
+POINTER_EVENTS = (pg.MOUSEMOTION, pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP, pg.MOUSEWHEEL)
+KEYBOARD_EVENTS = (pg.KEYDOWN, pg.KEYUP, pg.TEXTINPUT, pg.TEXTEDITING)
+# position passed to elements instead of pointer positions outside the clip rect, it is outside of every element
+OUTSIDE_POS = (-1_000_000, -1_000_000)
+
+
+def coalesce_mouse_motion(events: List[pg.event.Event]) -> List[pg.event.Event]:
+    """
+    Replaces consecutive MOUSEMOTION events by a single event with the last position and the summed relative motion.
+    """
+    result = []
+    for event in events:
+        if event.type == pg.MOUSEMOTION and result and result[-1].type == pg.MOUSEMOTION:
+            last_event = result[-1]
+            rel = (last_event.rel[0] + event.rel[0], last_event.rel[1] + event.rel[1])
+            result[-1] = pg.event.Event(pg.MOUSEMOTION, {**event.dict, 'rel': rel})
+        else:
+            result.append(event)
+    return result
+
+
+class EventDispatcher:
+    """
+    Passes events only to the UI elements, that are affected by them, instead of passing every event to every element.
+
+    - Pointer events are passed to the elements containing the position of the pointer. Elements are found with a grid
+      of buckets over their rects, that is built again, when rects change.
+    - MOUSEMOTION is also passed to the elements, that contained the pointer before, so they can stop hovering.
+    - After a MOUSEBUTTONDOWN, all pointer events are also passed to the pressed elements until the next MOUSEBUTTONUP,
+      so elements can be dragged.
+    - Keyboard events are only passed to elements, whose has_focus() returns True. MOUSEBUTTONDOWN is also passed to
+      these elements, so they can lose focus.
+    - Consecutive MOUSEMOTION events of one frame are merged.
+    - Other events are passed to all elements.
+    - If a clip rect is given, pointer positions outside of it do not hit any element. Elements, that are not pressed,
+      get these events with OUTSIDE_POS as position, so they stop hovering. Pressed elements get the real position,
+      so they can still be dragged.
+
+    The update() method of every visible element is still called every frame.
+    """
+    def __init__(self, cell_size: int = DEFAULT_CELL_SIZE):
+        """
+        :param cell_size: The size of the grid cells in pixels.
+        """
+        self.cell_size = cell_size
+        self._elements: List[UIElement] = []
+        self._rects: List[Tuple[int, int, int, int]] = []
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        self._hovered: Set[UIElement] = set()
+        self._pressed: Set[UIElement] = set()
+        self._mouse_pos: Tuple[int, int] = (-1, -1)
+
+    def dispatch(
+            self, events: List[pg.event.Event], elements: Sequence[UIElement], render_context: RenderContext,
+            clip_rect: Optional[pg.Rect] = None
+    ):
+        """
+        Passes the events to the given elements and updates them.
+
+        :param events: The events of this frame.
+        :param elements: The elements to pass the events to. Invisible elements are skipped.
+        :param render_context: The render context passed to the elements.
+        :param clip_rect: The area of the screen, in which the elements are visible. If None, the whole screen.
+        """
+        elements = [element for element in elements if element.visible]
+        self._update_index(elements)
+
+        routed_events: Dict[UIElement, List[pg.event.Event]] = {element: [] for element in elements}
+        focused: Optional[Set[UIElement]] = None
+        for event in coalesce_mouse_motion(events):
+            clipped_event = None
+            if event.type in POINTER_EVENTS:
+                if event.type != pg.MOUSEWHEEL:
+                    self._mouse_pos = event.pos
+                if clip_rect is None or clip_rect.collidepoint(self._mouse_pos):
+                    targets = self._find(self._mouse_pos)
+                else:
+                    targets = set()
+                    if event.type != pg.MOUSEWHEEL:
+                        clipped_event = pg.event.Event(event.type, {**event.dict, 'pos': OUTSIDE_POS})
+                if event.type == pg.MOUSEMOTION:
+                    targets, self._hovered = targets | self._hovered, targets
+                elif event.type == pg.MOUSEBUTTONDOWN:
+                    if focused is None:
+                        focused = {element for element in elements if element.has_focus()}
+                    self._pressed |= targets
+                    targets = targets | focused
+                pressed = self._pressed
+                targets |= pressed
+                if event.type == pg.MOUSEBUTTONUP:
+                    self._pressed = set()
+            elif event.type in KEYBOARD_EVENTS:
+                if focused is None:
+                    focused = {element for element in elements if element.has_focus()}
+                targets = focused
+            else:
+                targets = elements
+            for element in targets:
+                element_events = routed_events.get(element)
+                # hovered or pressed elements can be removed or hidden in the meantime
+                if element_events is not None:
+                    if clipped_event is not None and element not in pressed:
+                        element_events.append(clipped_event)
+                    else:
+                        element_events.append(event)
+            if event.type == pg.MOUSEBUTTONDOWN:
+                # focus can change with every click
+                focused = None
+
+        for element, element_events in routed_events.items():
+            element.handle_events(element_events, render_context)
+
+    def _update_index(self, elements: List[UIElement]):
+        """
+        Builds the grid again, if elements were added, removed or moved.
+        """
+        rects = [tuple(element.rect) for element in elements]
+        if rects == self._rects and all(a is b for a, b in zip(elements, self._elements)):
+            return
+        self._elements = elements
+        self._rects = rects
+        self._grid = {}
+        cell_size = self.cell_size
+        for index, (x, y, width, height) in enumerate(rects):
+            for cell_x in range(x // cell_size, (x + max(width, 1) - 1) // cell_size + 1):
+                for cell_y in range(y // cell_size, (y + max(height, 1) - 1) // cell_size + 1):
+                    self._grid.setdefault((cell_x, cell_y), []).append(index)
+
+    def _find(self, pos: Tuple[int, int]) -> Set[UIElement]:
+        """
+        Returns the elements containing the given position.
+        """
+        x, y = pos
+        candidates = self._grid.get((int(x) // self.cell_size, int(y) // self.cell_size), ())
+        return {self._elements[index] for index in candidates if self._elements[index].rect.collidepoint(x, y)}
@@ -1,11 +1,17 @@
 import enum
 import warnings
-from typing import Union, Tuple, Optional, Dict
+from collections import OrderedDict
+from typing import Union, Tuple, Optional, Dict, Callable, Any, Hashable
 
 import pygame as pg
 import numpy as np
 
+from viztools.render_scheduler import RenderScheduler
+from viztools.text_rendering import GlyphAtlas, text_key
+
 DEFAULT_FONT_SIZE = 16
+DEFAULT_SURFACE_CACHE_BYTES = 512 * 2 ** 20
+DEFAULT_TEXT_CACHE_BYTES = 64 * 2 ** 20
 
 
 def to_np_array(p):
@@ -26,25 +32,72 @@ def normalize_color(color: Color) -> np.ndarray:
 
 
 class RenderContext:
-    def __init__(self, default_font_name: Optional[str] = None, default_font_size: int = DEFAULT_FONT_SIZE):
+    def __init__(
+            self, default_font_name: Optional[str] = None, default_font_size: int = DEFAULT_FONT_SIZE,
+            scheduler: Optional[RenderScheduler] = None, surface_cache_bytes: int = DEFAULT_SURFACE_CACHE_BYTES
+    ):
         if default_font_name is None:
             default_font_name = pg.font.get_default_font()
         self.default_font_name = default_font_name
         self.default_font_size = default_font_size
         self.font_cache: Dict[Tuple[str, int], pg.font.Font] = {}
+        self.glyph_atlases: Dict[Tuple[str, int], GlyphAtlas] = {}
         self.mouse_pressed = False
+        self.scheduler = scheduler if scheduler is not None else RenderScheduler()
+        # surfaces shared by all drawables with a common memory budget, for example decoded and scaled images
+        self.surface_cache = LRUCache(max_bytes=surface_cache_bytes, size_func=surface_bytes)
+        # rendered texts shared by all drawables and ui elements, see viztools.text_rendering.text_key()
+        self.text_cache = LRUCache(max_bytes=DEFAULT_TEXT_CACHE_BYTES, size_func=surface_bytes)
 
     def get_font(self, font_name: Optional[str] = None, font_size: int = -1) -> pg.font.Font:
+        key = self._get_font_key(font_name, font_size)
+
+        if key not in self.font_cache:
+            self.font_cache[key] = pg.font.Font(*key)
+        return self.font_cache[key]
+
+    def get_glyph_atlas(self, font_name: Optional[str] = None, font_size: int = -1) -> GlyphAtlas:
+        """
+        Returns the glyph atlas of the given font, which is shared by all drawables and ui elements.
+        """
+        key = self._get_font_key(font_name, font_size)
+        atlas = self.glyph_atlases.get(key)
+        if atlas is None:
+            atlas = GlyphAtlas(self.get_font(*key))
+            self.glyph_atlases[key] = atlas
+        return atlas
+
+    def text_width(self, text: str, font_name: Optional[str] = None, font_size: int = -1) -> int:
+        """
+        Returns the width of a single line of text in pixels, computed from the cached advances of the glyph atlas.
+        """
+        return self.get_glyph_atlas(font_name, font_size).text_width(text)
+
+    def render_text(self, text: str, color, font_name: Optional[str] = None, font_size: int = -1) -> pg.Surface:
+        """
+        Renders a single line of text with the glyph atlas. The result is cached in the text cache.
+
+        :param text: The text to render.
+        :param color: The color of the text.
+        :param font_name: The font to use. Defaults to the default font.
+        :param font_size: The font size to use. Defaults to the default font size.
+        :return: A surface with per pixel alpha containing the text.
+        """
+        font_name, font_size = self._get_font_key(font_name, font_size)
+        # texts rendered by the glyph atlas differ slightly from texts rendered by font.render(), so they get own keys
+        key = (GlyphAtlas, text_key(text, font_name, font_size, color))
+        surface = self.text_cache.get(key)
+        if surface is None:
+            surface = self.get_glyph_atlas(font_name, font_size).render(text, color)
+            self.text_cache.put(key, surface)
+        return surface
+
+    def _get_font_key(self, font_name: Optional[str], font_size: int) -> Tuple[str, int]:
         if font_name is None:
             font_name = self.default_font_name
         if font_size == -1:
             font_size = self.default_font_size
-
-        key = (font_name, font_size)
-
-        if key not in self.font_cache:
-            self.font_cache[key] = pg.font.Font(font_name, font_size)
-        return self.font_cache[key]
+        return font_name, font_size
 
 
 class Align(enum.StrEnum):
@@ -102,6 +155,12 @@ class Align(enum.StrEnum):
         else:
             raise ValueError(f'unknown anker type: {self}')
 
+    def get_anker_fraction(self) -> Tuple[float, float]:
+        """
+        Returns the position of the anker relative to the size of a rect, for example (0.5, 0.5) for CENTER.
+        """
+        return _ANKER_FRACTIONS[self]
+
     def arrange_by_anker(self, rect: pg.Rect, anker: Union[np.ndarray, Tuple[int, int]]) -> pg.Rect:
         new_rect = rect.copy()
         self.set_rect(new_rect, anker)
@@ -113,6 +172,19 @@ class Align(enum.StrEnum):
         return new_rect
 
 
+_ANKER_FRACTIONS = {
+    Align.CENTER: (0.5, 0.5),
+    Align.LEFT: (0.0, 0.5),
+    Align.RIGHT: (1.0, 0.5),
+    Align.TOP: (0.5, 0.0),
+    Align.BOTTOM: (0.5, 1.0),
+    Align.TOP_LEFT: (0.0, 0.0),
+    Align.TOP_RIGHT: (1.0, 0.0),
+    Align.BOTTOM_LEFT: (0.0, 1.0),
+    Align.BOTTOM_RIGHT: (1.0, 1.0),
+}
+
+
 def load_font(font_name: Optional[str] = None, font_size: int = DEFAULT_FONT_SIZE) -> pg.font.Font:
     """
     Helper function to load the default font.
@@ -128,3 +200,83 @@ def load_font(font_name: Optional[str] = None, font_size: int = DEFAULT_FONT_SIZ
 
 def clamp(n, minn, maxn):
     return max(min(maxn, n), minn)
+
+
+def surface_bytes(surface: pg.Surface) -> int:
+    """
+    Returns the number of bytes used by the pixels of the given surface.
+    """
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+class LRUCache:
+    """
+    A mapping with a limited capacity. If the capacity is exceeded, the least recently used entries are evicted first.
+    """
+    def __init__(
+            self, max_items: Optional[int] = None, max_bytes: Optional[int] = None,
+            size_func: Optional[Callable[[Any], int]] = None
+    ):
+        """
+        Creates a new LRUCache.
+
+        :param max_items: The maximal number of entries. If None, the number of entries is not limited.
+        :param max_bytes: The maximal sum of sizes of all entries. If None, the size is not limited.
+        :param size_func: Function returning the size of a value in bytes. Required, if max_bytes is given.
+        """
+        if max_bytes is not None and size_func is None:
+            raise ValueError('size_func must be given, if max_bytes is set.')
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.size_func = size_func
+        self.num_bytes = 0
+        self._entries: OrderedDict[Hashable, Tuple[Any, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the value for the given key and marks it as most recently used.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Inserts the given value and evicts the least recently used entries, if the capacity is exceeded.
+        """
+        self.pop(key)
+        size = self.size_func(value) if self.size_func is not None else 0
+        self._entries[key] = (value, size)
+        self.num_bytes += size
+        self._evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Removes the given key and returns its value.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        self.num_bytes -= entry[1]
+        return entry[0]
+
+    def clear(self):
+        self._entries.clear()
+        self.num_bytes = 0
+
+    def _evict(self):
+        # the most recently inserted entry is kept, even if it exceeds the capacity on its own
+        while len(self._entries) > 1 and (
+                (self.max_items is not None and len(self._entries) > self.max_items) or
+                (self.max_bytes is not None and self.num_bytes > self.max_bytes)
+        ):
+            _key, (_value, size) = self._entries.popitem(last=False)
+            self.num_bytes -= size
@@ -4,17 +4,25 @@ from typing import Tuple, Optional, List, Union, Iterable
 import numpy as np
 import pygame as pg
 
+from viztools.registry import Registry, RegistryOwner
+from viztools.render_scheduler import RenderScheduler
 from viztools.ui.container.base_container import UIContainer
 from viztools.ui.elements.base_element import UIElement
+from viztools.ui.event_dispatch import EventDispatcher
 from viztools.utils import RenderContext, DEFAULT_FONT_SIZE, Color
 
 
-class UIViewer(ABC):
+class UIViewer(RegistryOwner, ABC):
+    _registry_names = ('_ui_elements',)
+
     def __init__(
             self, screen_size: Optional[Tuple[int, int]] = None, title: str = "Visualization", framerate: float = 60.0,
             default_font_name: Optional[str] = None, default_font_size: int = DEFAULT_FONT_SIZE,
             background_color: Color = (20, 20, 20)
     ):
+        # ui elements assigned to attributes are registered automatically
+        self._ui_elements = Registry((UIElement, UIContainer), self.__dict__.values())
+
         pg.init()
         pg.scrap.init()
         pg.key.set_repeat(130, 25)
@@ -31,22 +39,30 @@ class UIViewer(ABC):
         self.framerate = framerate
         self.mouse_pos = np.array(pg.mouse.get_pos(), dtype=np.int32)
 
-        self.render_context = RenderContext(default_font_name, default_font_size)
+        self.render_scheduler = RenderScheduler(framerate)
+        self.render_context = RenderContext(default_font_name, default_font_size, scheduler=self.render_scheduler)
         self.background_color = background_color
 
-        self._ui_element_cache: Optional[List[Union[UIContainer, UIElement]]] = None
+        self._event_dispatcher = EventDispatcher()
 
-    def iter_ui_elements(self) -> Iterable[Union[UIElement, UIContainer]]:
+    def add_ui_element(self, ui_element: Union[UIElement, UIContainer], layer: Optional[int] = None):
         """
-        Iter over all elements in the container.
-        :return: Iterable of BaseElement objects.
+        Adds an ui element or container, that is not assigned to an attribute, for example one stored in a list.
+
+        :param ui_element: The element to add.
+        :param layer: Elements with a higher layer are drawn on top. Defaults to 0.
         """
-        if self._ui_element_cache is None:
-            self._ui_element_cache = [
-                elem for elem in self.__dict__.values() if isinstance(elem, (UIElement, UIContainer))
-            ]
+        self._ui_elements.add(ui_element, layer)
 
-        yield from self._ui_element_cache
+    def remove_ui_element(self, ui_element: Union[UIElement, UIContainer]):
+        self._ui_elements.remove(ui_element)
+
+    def iter_ui_elements(self) -> Iterable[Union[UIElement, UIContainer]]:
+        """
+        Iter over all registered ui elements and containers ordered by layer.
+        :return: Iterable of UIElement and UIContainer objects.
+        """
+        yield from self._ui_elements.items()
 
     def run(self):
         while self.running:
@@ -54,6 +70,7 @@ class UIViewer(ABC):
             self.update()
             self.render()
             self.clock.tick(self.framerate)
+        self.render_scheduler.shutdown()
         pg.quit()
 
     def render_ui(self):
@@ -67,13 +84,29 @@ class UIViewer(ABC):
         self.screen.fill(self.background_color)
         self.render_ui()
         pg.display.flip()
+        self.render_scheduler.end_frame()
 
     def handle_events(self):
+        self.render_scheduler.begin_frame(self.framerate)
         events = pg.event.get()
         for event in events:
             self.handle_event(event)
+        self.handle_ui_events(events)
+        # progressive work of all ui elements shares the remaining time of this frame
+        self.render_scheduler.run()
+
+    def handle_ui_events(self, events: List[pg.event.Event]):
+        """
+        Passes the events to the ui elements. Elements only receive the events, that affect them (see EventDispatcher),
+        containers route the events to their elements themselves.
+        """
+        ui_elements = []
         for ui_element in self.iter_ui_elements():
-            ui_element.handle_events(events, self.render_context)
+            if isinstance(ui_element, UIContainer):
+                ui_element.handle_events(events, self.render_context)
+            else:
+                ui_elements.append(ui_element)
+        self._event_dispatcher.dispatch(events, ui_elements, self.render_context)
 
     def handle_event(self, event: pg.event.Event):
         if event.type == pg.MOUSEMOTION:
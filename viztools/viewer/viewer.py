@@ -7,17 +7,26 @@ import pygame as pg
 from viztools.controller.coordinate_system_controller import CoordinateSystemController
 from viztools.coordinate_system import CoordinateSystem, draw_coordinate_system
 from viztools.drawable import Drawable
+from viztools.registry import Registry, RegistryOwner
+from viztools.render_scheduler import RenderScheduler
 from viztools.ui.container.base_container import UIContainer
 from viztools.ui.elements.base_element import UIElement
+from viztools.ui.event_dispatch import EventDispatcher
 from viztools.utils import RenderContext, DEFAULT_FONT_SIZE
 
 
-class Viewer(ABC):
+class Viewer(RegistryOwner, ABC):
+    _registry_names = ('_drawables', '_ui_elements')
+
     def __init__(
             self, screen_size: Optional[Tuple[int, int]] = None, title: str = "Visualization", framerate: float = 60.0,
             default_font_name: Optional[str] = None, default_font_size: int = DEFAULT_FONT_SIZE,
             drag_mouse_button: Union[int, Container[int]] = (2, 3)
     ):
+        # drawables and ui elements assigned to attributes are registered automatically
+        self._drawables = Registry((Drawable,), self.__dict__.values())
+        self._ui_elements = Registry((UIElement, UIContainer), self.__dict__.values())
+
         pg.init()
         pg.scrap.init()
         pg.key.set_repeat(130, 25)
@@ -42,38 +51,60 @@ class Viewer(ABC):
             focus_point=np.array([0, 0], dtype=np.float32), screen_size=self.screen.get_size()
         )
 
-        self.render_context = RenderContext(default_font_name, default_font_size)
+        self.render_scheduler = RenderScheduler(framerate)
+        self.render_context = RenderContext(default_font_name, default_font_size, scheduler=self.render_scheduler)
+
+        self._event_dispatcher = EventDispatcher()
+
+    def add_ui_element(self, ui_element: Union[UIElement, UIContainer], layer: Optional[int] = None):
+        """
+        Adds an ui element or container, that is not assigned to an attribute, for example one stored in a list.
+
+        :param ui_element: The element to add.
+        :param layer: Elements with a higher layer are drawn on top. Defaults to 0.
+        """
+        self._ui_elements.add(ui_element, layer)
 
-        self._drawable_cache: Optional[List[Drawable]] = None
-        self._ui_element_cache: Optional[List[Union[UIContainer, UIElement]]] = None
+    def remove_ui_element(self, ui_element: Union[UIElement, UIContainer]):
+        self._ui_elements.remove(ui_element)
 
     def update_ui_elements(self):
-        self._ui_element_cache = None
+        """
+        Does nothing. UI elements are registered, when they are assigned to attributes or added with add_ui_element().
+        """
+        pass
 
     def iter_ui_elements(self) -> Iterable[Union[UIElement, UIContainer]]:
         """
-        Iter over all elements in the container.
-        :return: Iterable of BaseElement objects.
+        Iter over all registered ui elements and containers ordered by layer.
+        :return: Iterable of UIElement and UIContainer objects.
         """
-        if self._ui_element_cache is None:
-            self._ui_element_cache = [
-                elem for elem in self.__dict__.values() if isinstance(elem, (UIElement, UIContainer))
-            ]
+        yield from self._ui_elements.items()
 
-        yield from self._ui_element_cache
+    def add_drawable(self, drawable: Drawable, layer: Optional[int] = None):
+        """
+        Adds a drawable, that is not assigned to an attribute, for example one stored in a list.
+
+        :param drawable: The drawable to add.
+        :param layer: Drawables with a higher layer are drawn on top. Defaults to 0.
+        """
+        self._drawables.add(drawable, layer)
+
+    def remove_drawable(self, drawable: Drawable):
+        self._drawables.remove(drawable)
 
     def update_drawables(self):
-        self._drawable_cache = None
+        """
+        Does nothing. Drawables are registered, when they are assigned to attributes or added with add_drawable().
+        """
+        pass
 
     def iter_drawables(self) -> Iterable[Drawable]:
         """
-        Iter over all elements in the container.
-        :return: Iterable of BaseElement objects.
+        Iter over all registered drawables ordered by layer.
+        :return: Iterable of Drawable objects.
         """
-        if self._drawable_cache is None:
-            self._drawable_cache = [elem for elem in self.__dict__.values() if isinstance(elem, Drawable)]
-
-        yield from self._drawable_cache
+        yield from self._drawables.items()
 
     def run(self):
         while self.running:
@@ -81,6 +112,7 @@ class Viewer(ABC):
             self.update()
             self.render()
             self.clock.tick(self.framerate)
+        self.render_scheduler.shutdown()
         pg.quit()
 
     def render_content(self):
@@ -99,7 +131,7 @@ class Viewer(ABC):
 
     def render_coordinate_system(self, draw_numbers=True):
         draw_coordinate_system(
-            self.screen, self.coordinate_system, self.render_context.get_font(), draw_numbers=draw_numbers
+            self.screen, self.coordinate_system, self.render_context, draw_numbers=draw_numbers
         )
 
     def render(self):
@@ -107,15 +139,31 @@ class Viewer(ABC):
         self.render_content()
         self.render_ui()
         pg.display.flip()
+        self.render_scheduler.end_frame()
 
     def handle_events(self):
+        self.render_scheduler.begin_frame(self.framerate)
         events = pg.event.get()
         for event in events:
             self.handle_event(event)
-        for ui_element in self.iter_ui_elements():
-            ui_element.handle_events(events, self.render_context)
+        self.handle_ui_events(events)
         for drawable in self.iter_drawables():
             drawable.handle_events(events, self.screen, self.coordinate_system, self.render_context)
+        # progressive work of all drawables shares the remaining time of this frame
+        self.render_scheduler.run()
+
+    def handle_ui_events(self, events: List[pg.event.Event]):
+        """
+        Passes the events to the ui elements. Elements only receive the events, that affect them (see EventDispatcher),
+        containers route the events to their elements themselves.
+        """
+        ui_elements = []
+        for ui_element in self.iter_ui_elements():
+            if isinstance(ui_element, UIContainer):
+                ui_element.handle_events(events, self.render_context)
+            else:
+                ui_elements.append(ui_element)
+        self._event_dispatcher.dispatch(events, ui_elements, self.render_context)
 
     def handle_event(self, event: pg.event.Event):
         self.coordinate_system_controller.handle_event(event)